@@ -1,44 +1,66 @@
+"""
+Federated evaluation client: scores the global model on this hospital's
+held-out notes and uploads the sums to the server aggregator, which weights
+the sites (see fed_eval.CollectEvaluationUploads).
+
+Run as a module from federated_theta/, so fed_eval resolves:
+    python -m client.eval_client --client_id hospital_a \
+        --data client/hospital_a_test.csv --server_addr localhost:8080
+"""
 import argparse
+
 import pandas as pd
-from transformers import AutoTokenizer, AutoModelForCausalLM, Trainer, TrainingArguments
+from transformers import AutoTokenizer, AutoModelForCausalLM
 from fedml import FedMLClient
+from fedml.core import ClientTrainer
 
-def load_data(path, tokenizer):
+from fed_eval import eval_loader, evaluate_lm, evaluation_upload, finalize
+
+def load_data(path, tokenizer, batch_size, max_length):
     df = pd.read_csv(path)
-    enc = tokenizer(df["text"].tolist(), truncation=True, padding=True)
-    class SimpleDataset:
-        def __init__(self, enc): self.enc = enc
-        def __len__(self): return len(self.enc["input_ids"])
-        def __getitem__(self, i):
-            return {
-                "input_ids": self.enc["input_ids"][i],
-                "attention_mask": self.enc["attention_mask"][i],
-                "labels": self.enc["input_ids"][i],
-            }
-    return SimpleDataset(enc)
+    return eval_loader(df["text"].tolist(), tokenizer, batch_size=batch_size, max_length=max_length)
+
+class EvaluationTrainer(ClientTrainer):
+    """Scores each global model it is sent on `loader` instead of training it;
+    its upload is the resulting sums, not model parameters."""
+
+    def __init__(self, model, args, site, loader):
+        super().__init__(model, args)
+        self.site = site
+        self.loader = loader
+        self.sums = None
+
+    def get_model_params(self):
+        return evaluation_upload(self.site, self.sums)
+
+    def set_model_params(self, model_parameters):
+        self.model.load_state_dict(model_parameters)
+
+    def train(self, train_data, device, args):
+        self.model.to(device)
+        # sums, not averages: the server weights every site by its token count
+        self.sums = evaluate_lm(self.model, self.loader, device, bf16=args.bf16)
+        print(f"[Eval {self.site}] Local metrics: {finalize(self.sums)}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--client_id", type=str, required=True)
     parser.add_argument("--data", type=str, required=True)
     parser.add_argument("--server_addr", type=str, required=True)
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--max_length", type=int, default=512)
+    parser.add_argument("--bf16", action="store_true", help="bf16 autocast for the forward pass")
     args = parser.parse_args()
 
     model_name = "sshleifer/tiny-gpt2"
     tokenizer = AutoTokenizer.from_pretrained(model_name)
-    dataset = load_data(args.data, tokenizer)
+    loader = load_data(args.data, tokenizer, args.batch_size, args.max_length)
 
     model = AutoModelForCausalLM.from_pretrained(model_name)
 
-    training_args = TrainingArguments(
-        output_dir=f"/tmp/{args.client_id}_eval",
-        per_device_eval_batch_size=2,
-    )
-    trainer = Trainer(model=model, args=training_args, eval_dataset=dataset)
-
-    fed_client = FedMLClient(server_addr=args.server_addr, client_id=args.client_id)
-    print(f"[Eval {args.client_id}] Downloading global model from server...")
-    fed_client.wait_for_global_model(model)
-    metrics = trainer.evaluate()
-    print(f"[Eval {args.client_id}] Local metrics: {metrics}")
-    fed_client.send_evaluation_metrics(metrics)
+    # the runtime loads the global model, calls train() and uploads get_model_params()
+    trainer = EvaluationTrainer(model, args, args.client_id, loader)
+    fed_client = FedMLClient(server_addr=args.server_addr, client_id=args.client_id,
+                             client_trainer=trainer)
+    print(f"[Eval {args.client_id}] Waiting for the global model...")
+    fed_client.start()
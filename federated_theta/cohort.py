@@ -0,0 +1,128 @@
+"""
+Chunked, non-IID synthetic hospital cohorts for load testing.
+
+Every hospital gets a profile (cohort size, age and comorbidity shift, outcome
+prevalence shift). Rows are generated chunk by chunk from a seed derived from
+(seed, hospital, split, chunk index), so a cohort of tens of millions of rows
+is reproducible, never materialised as a whole, and can be split across
+DataLoader workers without coordination.
+
+Example:
+  profiles = hospital_profiles(10, rows_per_hospital=1_000_000, size_skew=1.0, age_skew=8.0)
+  loader = hospital_loader(profiles[3], batch_size=256)
+  for X, y in loader: ...
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+SEED = 42
+N_FEATURES = 6  # age, sbp, dbp, glucose, comorbidity, lab marker
+
+
+def clinical_rows(rng, n, age_shift=0.0, comorb_shift=0.0, label_shift=0.0):
+    """n synthetic patients -> (X float32 (n, 6), y int64 (n,)).
+
+    `rng` is a numpy Generator, or the legacy `np.random` module (which keeps
+    make_clinical_data's historical draws). Shifts of 0 give the original
+    IID distribution.
+    """
+    randint = rng.integers if hasattr(rng, "integers") else rng.randint
+    age = np.clip(randint(20, 90, size=n) + age_shift, 18, 100)
+    sbp = rng.normal(120 + (age - 50) * 0.2, 15, size=n)
+    dbp = rng.normal(80, 10, size=n)
+    glucose = rng.normal(100 + (age - 50) * 0.3, 20, size=n)
+    comorb = rng.binomial(1, p=np.clip(0.2 + (age - 40) / 200 + comorb_shift, 0, 1), size=n)
+    lab = rng.normal(0, 1, size=n)
+    logits = -5 + label_shift + 0.03*(age) + 0.02*(sbp) + 0.04*(comorb*20) + 0.5*lab + 0.01*(glucose-100)
+    prob = 1 / (1 + np.exp(-logits))
+    y = rng.binomial(1, prob)
+    X = np.vstack([age, sbp, dbp, glucose, comorb, lab]).T.astype(np.float32)
+    return X, y.astype(np.int64)
+
+
+@dataclass
+class HospitalProfile:
+    hospital_id: int
+    n_rows: int
+    age_shift: float = 0.0     # years added to every patient's age
+    comorb_shift: float = 0.0  # added to the comorbidity probability
+    label_shift: float = 0.0   # added to the outcome logit (prevalence skew)
+
+
+def hospital_profiles(n_hospitals, rows_per_hospital, size_skew=0.0, age_skew=0.0,
+                      comorb_skew=0.0, label_skew=0.0, seed=SEED):
+    """Profiles for a federation of hospitals.
+
+    size_skew:   0 = equal cohorts; larger = more unequal (Dirichlet with
+                 concentration 1/size_skew), total stays n * rows_per_hospital
+    age_skew:    std (years) of the per-hospital age shift
+    comorb_skew: std of the per-hospital comorbidity-probability shift
+    label_skew:  std of the per-hospital outcome-logit shift
+    """
+    rng = np.random.default_rng(seed)
+    total = n_hospitals * rows_per_hospital
+    if size_skew > 0:
+        shares = rng.dirichlet(np.full(n_hospitals, 1.0 / size_skew))
+        sizes = np.maximum(np.floor(shares * total).astype(np.int64), 1)
+    else:
+        sizes = np.full(n_hospitals, rows_per_hospital, dtype=np.int64)
+    return [
+        HospitalProfile(hospital_id=h, n_rows=int(sizes[h]),
+                        age_shift=float(rng.normal(0, age_skew)) if age_skew else 0.0,
+                        comorb_shift=float(rng.normal(0, comorb_skew)) if comorb_skew else 0.0,
+                        label_shift=float(rng.normal(0, label_skew)) if label_skew else 0.0)
+        for h in range(n_hospitals)
+    ]
+
+
+class HospitalStream(IterableDataset):
+    """Yields (X, y) minibatches of one hospital's cohort, one chunk at a time.
+
+    Rows are IID within a hospital, so no shuffle buffer is needed; each pass
+    regenerates the same rows. With several DataLoader workers, chunk i is
+    produced by worker i % num_workers. Memory is bounded by chunk_size.
+    """
+
+    def __init__(self, profile, batch_size=256, chunk_size=1 << 16, split="train", seed=SEED):
+        self.profile = profile
+        self.batch_size = batch_size
+        self.chunk_size = max(chunk_size - chunk_size % batch_size, batch_size)
+        self.split = split
+        self.seed = seed
+
+    @property
+    def num_rows(self):
+        return self.profile.n_rows
+
+    def chunks(self, worker_id=0, num_workers=1):
+        p = self.profile
+        split_id = {"train": 0, "test": 1}[self.split]
+        n_chunks = (p.n_rows + self.chunk_size - 1) // self.chunk_size
+        for c in range(worker_id, n_chunks, num_workers):
+            rng = np.random.default_rng([self.seed, p.hospital_id, split_id, c])
+            n = min(self.chunk_size, p.n_rows - c * self.chunk_size)
+            yield clinical_rows(rng, n, p.age_shift, p.comorb_shift, p.label_shift)
+
+    def __iter__(self):
+        info = get_worker_info()
+        worker_id, num_workers = (info.id, info.num_workers) if info else (0, 1)
+        for X, y in self.chunks(worker_id, num_workers):
+            X, y = torch.from_numpy(X), torch.from_numpy(y)
+            for start in range(0, len(y), self.batch_size):
+                yield X[start:start + self.batch_size], y[start:start + self.batch_size]
+
+    def __len__(self):
+        # batches never straddle chunks, and chunk_size is a multiple of batch_size
+        return (self.profile.n_rows + self.batch_size - 1) // self.batch_size
+
+
+def hospital_loader(profile, batch_size=256, chunk_size=1 << 16, split="train",
+                    num_workers=0, seed=SEED):
+    """Minibatch DataLoader over one hospital's streamed cohort."""
+    stream = HospitalStream(profile, batch_size, chunk_size, split, seed)
+    return DataLoader(stream, batch_size=None, num_workers=num_workers,
+                      persistent_workers=num_workers > 0)
@@ -0,0 +1,194 @@
+"""
+Model-update codecs for client -> aggregator traffic.
+
+Selected by the `compression:` key of client/client_config.yaml
+(communication.compression) and server/server_config.yaml
+(strategy.compression). Accepted values:
+
+  none                      raw float32
+  qsgd | qsgd:<levels>      QSGD stochastic quantisation (unbiased), int8 levels
+  topk | topk:<ratio>       top-k sparsification, client-side error feedback
+  <codec>+zstd              any of the above, framed with zstd
+
+or the mapping form {codec: topk, ratio: 0.01, levels: 16, zstd: true}.
+
+Every codec turns a flat float32 update into `bytes` and back, so the payload
+length is exactly the bytes on the wire.
+"""
+
+import struct
+
+import numpy as np
+
+_HEADER = struct.Struct("<4sBI")  # magic, codec id, number of elements
+_MAGIC = b"FTUP"
+_IDS = {"none": 0, "qsgd": 1, "topk": 2}
+
+
+class Codec:
+    name = "none"
+
+    def encode(self, update, residual=None):
+        update = np.ascontiguousarray(update, dtype=np.float32)
+        return _HEADER.pack(_MAGIC, _IDS[self.name], update.size) + update.tobytes()
+
+    def decode(self, payload):
+        n = self._check(payload)
+        return np.frombuffer(payload, dtype=np.float32, count=n, offset=_HEADER.size).copy()
+
+    def _check(self, payload):
+        magic, codec_id, n = _HEADER.unpack_from(payload)
+        if magic != _MAGIC or codec_id != _IDS[self.name]:
+            raise ValueError(f"payload was not produced by the '{self.name}' codec")
+        return n
+
+
+class QSGDCodec(Codec):
+    """QSGD: |v_i| / ||v|| is stochastically rounded to one of `levels` levels,
+    so E[decode(encode(v))] = v. Ships one float32 norm plus one int8 per entry.
+    """
+    name = "qsgd"
+
+    def __init__(self, levels=127, seed=None):
+        assert 1 <= levels <= 127, "QSGD levels must fit in int8"
+        self.levels = levels
+        self.rng = np.random.default_rng(seed)
+
+    def encode(self, update, residual=None):
+        v = np.asarray(update, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(v))
+        if norm == 0.0:
+            q = np.zeros(v.size, dtype=np.int8)
+        else:
+            scaled = np.abs(v) * (self.levels / norm)
+            lower = np.floor(scaled)
+            level = lower + (self.rng.random(v.size) < (scaled - lower))
+            q = (np.sign(v) * level).astype(np.int8)
+        return (_HEADER.pack(_MAGIC, _IDS[self.name], v.size)
+                + struct.pack("<fB", norm, self.levels) + q.tobytes())
+
+    def decode(self, payload):
+        n = self._check(payload)
+        norm, levels = struct.unpack_from("<fB", payload, _HEADER.size)
+        q = np.frombuffer(payload, dtype=np.int8, count=n, offset=_HEADER.size + 5)
+        return q.astype(np.float32) * (norm / levels)
+
+
+class TopKCodec(Codec):
+    """Ships the k largest-magnitude entries (uint32 index + float32 value).
+
+    What is not sent is kept as a residual and added to the next update, so
+    every coordinate is eventually transmitted. Pass a per-client `residual`
+    array to encode() to keep that state outside the codec (it is updated in
+    place); otherwise the codec keeps it itself.
+    """
+    name = "topk"
+
+    def __init__(self, ratio=0.01, error_feedback=True):
+        assert 0 < ratio <= 1, "top-k ratio must be in (0, 1]"
+        self.ratio = ratio
+        self.error_feedback = error_feedback
+        self.residual = None
+
+    def encode(self, update, residual=None):
+        v = np.asarray(update, dtype=np.float32).ravel()
+        if self.error_feedback:
+            if residual is None:
+                if self.residual is None:
+                    self.residual = np.zeros_like(v)
+                residual = self.residual
+            v = v + residual
+        k = max(1, int(v.size * self.ratio))
+        idx = np.argpartition(np.abs(v), v.size - k)[v.size - k:].astype(np.uint32)
+        idx.sort()
+        val = v[idx]
+        if self.error_feedback:
+            residual[:] = v
+            residual[idx] = 0
+        return (_HEADER.pack(_MAGIC, _IDS[self.name], v.size)
+                + struct.pack("<I", k) + idx.tobytes() + val.tobytes())
+
+    def decode(self, payload):
+        n = self._check(payload)
+        (k,) = struct.unpack_from("<I", payload, _HEADER.size)
+        offset = _HEADER.size + 4
+        idx = np.frombuffer(payload, dtype=np.uint32, count=k, offset=offset)
+        val = np.frombuffer(payload, dtype=np.float32, count=k, offset=offset + 4 * k)
+        out = np.zeros(n, dtype=np.float32)
+        out[idx] = val
+        return out
+
+
+class ZstdFraming(Codec):
+    """Wraps another codec's payload in a zstd frame (needs `zstandard`)."""
+
+    def __init__(self, inner, level=3):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("zstd framing needs `pip install zstandard`") from e
+        self.inner = inner
+        self.name = f"{inner.name}+zstd"
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def encode(self, update, residual=None):
+        return self._compressor.compress(self.inner.encode(update, residual))
+
+    def decode(self, payload):
+        return self.inner.decode(self._decompressor.decompress(payload))
+
+
+def build_codec(spec):
+    """Codec from a config value (see module docstring)."""
+    if spec is None:
+        spec = "none"
+    if isinstance(spec, dict):
+        name = str(spec.get("codec", "none")).lower()
+        zstd = bool(spec.get("zstd", False))
+        param = spec.get("ratio", spec.get("levels"))
+    else:
+        name, _, framing = str(spec).lower().partition("+")
+        if framing not in ("", "zstd"):
+            raise ValueError(f"unknown framing '{framing}' in compression spec '{spec}'")
+        zstd = framing == "zstd"
+        name, _, param = name.partition(":")
+        param = param or None
+
+    if name == "none":
+        codec = Codec()
+    elif name == "qsgd":
+        codec = QSGDCodec(int(param) if param is not None else 127)
+    elif name == "topk":
+        codec = TopKCodec(float(param) if param is not None else 0.01)
+    else:
+        raise ValueError(f"unknown compression codec '{name}'")
+    return ZstdFraming(codec) if zstd else codec
+
+
+def compression_from_config(path, role="client"):
+    """The `compression` value of a client or server YAML config."""
+    import yaml
+    with open(path) as f:
+        config = yaml.safe_load(f) or {}
+    section = config.get("communication" if role == "client" else "strategy") or {}
+    return section.get("compression", "none")
+
+
+class WireMeter:
+    """Bytes-on-wire bookkeeping for one direction of update traffic."""
+
+    def __init__(self):
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self.messages = 0
+
+    def record(self, n_elements, payload):
+        self.raw_bytes += 4 * n_elements
+        self.wire_bytes += len(payload)
+        self.messages += 1
+
+    def summary(self):
+        ratio = self.raw_bytes / max(self.wire_bytes, 1)
+        return (f"{self.messages} updates, {self.wire_bytes / 2**20:.3f} MiB on wire "
+                f"vs {self.raw_bytes / 2**20:.3f} MiB raw (x{ratio:.1f})")
@@ -0,0 +1,237 @@
+"""
+Federated evaluation: batched site scoring and sample-weighted aggregation.
+
+Each site scores its held-out set in large batches padded only to the longest
+row of the batch (rows are length-sorted first), under torch.inference_mode
+and optionally bf16 autocast. Sites report *sums* (loss_sum, tokens/correct,
+samples), never averages, so the server can combine them exactly:
+
+    site = evaluate_lm(model, eval_loader(texts, tokenizer), device, bf16=True)
+    overall = aggregate_metrics({"hospital_a": site_a, "hospital_b": site_b})
+
+ConcurrentEvaluator scores global-model snapshots on a background thread, so
+a driver that owns its round loop can start training round r+1 while round r
+is being evaluated. EvaluationCollector is the server side: it takes each
+site's reported sums and, once every expected site is in, the weighted report.
+
+Sums reach the server the way everything a FedML client sends does: as the
+client's upload to the server aggregator. An evaluation client uploads
+evaluation_upload(site, sums) instead of model weights, and an aggregator with
+the CollectEvaluationUploads mixin hands those to its collector in
+on_before_aggregation, before the model uploads are averaged.
+"""
+
+import math
+import queue
+import threading
+from contextlib import nullcontext
+
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader
+
+
+def eval_loader(texts, tokenizer, batch_size=64, max_length=512):
+    """Length-sorted, dynamically padded batches of a list of texts."""
+    enc = tokenizer(list(texts), truncation=True, max_length=max_length)
+    rows = sorted(enc["input_ids"], key=len)
+    pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+    def collate(batch):
+        width = max(len(ids) for ids in batch)
+        input_ids = torch.full((len(batch), width), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(batch), width), dtype=torch.long)
+        for i, ids in enumerate(batch):
+            input_ids[i, :len(ids)] = torch.tensor(ids)
+            attention_mask[i, :len(ids)] = 1
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+    return DataLoader(rows, batch_size=batch_size, shuffle=False, collate_fn=collate)
+
+
+def _autocast(device, bf16):
+    device = torch.device(device)
+    return torch.autocast(device.type, dtype=torch.bfloat16) if bf16 else nullcontext()
+
+
+def evaluate_lm(model, loader, device="cpu", bf16=False):
+    """Causal-LM sums over a loader: {"loss_sum", "tokens", "samples"}."""
+    model.eval()
+    loss_sum, tokens, samples = 0.0, 0, 0
+    with torch.inference_mode(), _autocast(device, bf16):
+        for batch in loader:
+            input_ids = batch["input_ids"].to(device, non_blocking=True)
+            attention_mask = batch["attention_mask"].to(device, non_blocking=True)
+            logits = model(input_ids=input_ids, attention_mask=attention_mask).logits[:, :-1]
+            labels = input_ids[:, 1:].masked_fill(attention_mask[:, 1:] == 0, -100)
+            loss_sum += F.cross_entropy(logits.float().reshape(-1, logits.size(-1)), labels.reshape(-1),
+                                        ignore_index=-100, reduction="sum").item()
+            tokens += int(attention_mask[:, 1:].sum())
+            samples += input_ids.size(0)
+    return {"loss_sum": loss_sum, "tokens": tokens, "samples": samples}
+
+
+def evaluate_binary(model, loader, device="cpu", bf16=False):
+    """Binary-classifier sums over (x, y) batches: {"loss_sum", "correct", "samples"}."""
+    model.eval()
+    loss_sum, correct, samples = 0.0, 0, 0
+    with torch.inference_mode(), _autocast(device, bf16):
+        for x, y in loader:
+            x, y = x.to(device), y.to(device)
+            logits = model(x).float()
+            loss_sum += F.binary_cross_entropy_with_logits(logits, y.float(), reduction="sum").item()
+            correct += int(((logits > 0).long() == y).sum())
+            samples += y.size(0)
+    return {"loss_sum": loss_sum, "correct": correct, "samples": samples}
+
+
+def finalize(sums):
+    """Averages from one site's (or the federation's) sums."""
+    out = {"samples": sums["samples"]}
+    if "tokens" in sums:
+        out["loss"] = sums["loss_sum"] / max(sums["tokens"], 1)
+        out["perplexity"] = math.exp(min(out["loss"], 50.0))
+    else:
+        out["loss"] = sums["loss_sum"] / max(sums["samples"], 1)
+    if "correct" in sums:
+        out["accuracy"] = sums["correct"] / max(sums["samples"], 1)
+    return out
+
+
+def aggregate_metrics(site_sums):
+    """{site: sums} -> {"overall": ..., site: ...}, each finalized.
+
+    Summing the sums weights every site by its sample (or token) count.
+    """
+    total = {}
+    for sums in site_sums.values():
+        for key, value in sums.items():
+            total[key] = total.get(key, 0) + value
+    report = {site: finalize(sums) for site, sums in site_sums.items()}
+    report["overall"] = finalize(total)
+    return report
+
+
+class EvaluationCollector:
+    """Server side of federated evaluation: per-site sums in, one weighted report out.
+
+    add(site, sums) validates and stores a site's sums (a site reporting again
+    replaces its earlier sums). When every site in `expected_sites` has
+    reported, `on_report` is called with aggregate_metrics of all of them.
+    """
+
+    def __init__(self, expected_sites=(), on_report=None):
+        self.expected_sites = set(expected_sites)
+        self.on_report = on_report
+        self.site_sums = {}
+        self._lock = threading.Lock()
+
+    def add(self, site, sums):
+        """Store `sums` for `site`; True once every expected site has reported."""
+        if not isinstance(sums, dict) or "loss_sum" not in sums or "samples" not in sums:
+            raise ValueError(f"{site}: expected loss_sum and samples sums, got {sums!r}")
+        if any(not isinstance(v, (int, float)) or v < 0 or v != v for v in sums.values()):
+            raise ValueError(f"{site}: sums must be non-negative numbers, got {sums!r}")
+        with self._lock:
+            other = next((s for name, s in self.site_sums.items() if name != site), None)
+            if other is not None and set(other) != set(sums):
+                raise ValueError(f"{site}: reported {sorted(sums)}, other sites {sorted(other)}")
+            self.site_sums[site] = dict(sums)
+            complete = bool(self.expected_sites) and self.expected_sites <= set(self.site_sums)
+            report = aggregate_metrics(dict(self.site_sums)) if complete else None
+        if complete and self.on_report:
+            self.on_report(report)
+        return complete
+
+    def report(self):
+        """Weighted report over the sites that have reported so far."""
+        with self._lock:
+            return aggregate_metrics(dict(self.site_sums)) if self.site_sums else {}
+
+
+EVALUATION_KEY = "__fed_eval__"
+
+
+def evaluation_upload(site, sums):
+    """What an evaluation-only client uploads in place of its model parameters."""
+    return {EVALUATION_KEY: {"site": site, "sums": dict(sums)}}
+
+
+class CollectEvaluationUploads:
+    """Mixin for a FedML ServerAggregator with a `collector` (EvaluationCollector).
+
+    on_before_aggregation takes the (sample_num, params) uploads of a round,
+    passes the evaluation uploads to the collector and returns only the model
+    uploads, so evaluation sites never enter the weighted model average.
+    """
+
+    collector = None
+
+    def on_before_aggregation(self, raw_client_model_or_grad_list):
+        models = []
+        for sample_num, params in raw_client_model_or_grad_list:
+            upload = params.get(EVALUATION_KEY) if isinstance(params, dict) else None
+            if upload is None:
+                models.append((sample_num, params))
+            else:
+                self.collector.add(upload["site"], upload["sums"])
+        return super().on_before_aggregation(models)
+
+
+class ConcurrentEvaluator:
+    """Evaluates global-model snapshots on a background thread.
+
+    `evaluate_fn(model, loader)` returns a sums dict (evaluate_lm,
+    evaluate_binary, ...); `sites` maps a site name to its held-out loader.
+    `model` is a dedicated copy that only this thread touches.
+    """
+
+    def __init__(self, model, sites, evaluate_fn, on_result=None):
+        self.model = model
+        self.sites = sites
+        self.evaluate_fn = evaluate_fn
+        self.on_result = on_result
+        self.results = {}
+        self._error = None
+        self._queue = queue.Queue(maxsize=1)
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def submit(self, round_idx, state_dict):
+        """Queue a snapshot; blocks only if the previous one is still waiting."""
+        self._raise_pending()
+        snapshot = {k: v.detach().to("cpu", copy=True) for k, v in state_dict.items()}
+        self._queue.put((round_idx, snapshot))
+
+    def wait(self):
+        self._queue.join()
+        self._raise_pending()
+        return self.results
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_pending()
+
+    def _raise_pending(self):
+        if self._error is not None:
+            err, self._error = self._error, None
+            raise RuntimeError("background evaluation failed") from err
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                round_idx, snapshot = item
+                self.model.load_state_dict(snapshot)
+                report = aggregate_metrics({site: self.evaluate_fn(self.model, loader)
+                                            for site, loader in self.sites.items()})
+                self.results[round_idx] = report
+                if self.on_result:
+                    self.on_result(round_idx, report)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
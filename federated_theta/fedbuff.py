@@ -0,0 +1,69 @@
+"""
+Buffered asynchronous aggregation (FedBuff, Nguyen et al. 2022).
+
+Clients train against whatever global version they last pulled and push the
+delta (local - global) tagged with that version. The server buffers deltas
+and, once K of them have arrived, applies
+
+    global += server_lr * sum(n_i * s(tau_i) * delta_i) / sum(n_i)
+
+where tau_i = current version - version the client trained on, and
+s(tau) = (1 + tau) ** -staleness_exponent. No round ever waits for the
+slowest hospital; a slow one just contributes staler, down-weighted updates.
+"""
+
+import numpy as np
+
+
+def staleness_weight(staleness, exponent=0.5):
+    return (1.0 + staleness) ** -exponent
+
+
+class BufferedAsyncAggregator:
+    """Server state for FedBuff over a flat float32 parameter vector.
+
+    `params` is updated in place (it may be a shared-memory array).
+    """
+
+    def __init__(self, params, buffer_size, server_lr=1.0, staleness_exponent=0.5, max_staleness=None):
+        self.params = params
+        self.buffer_size = buffer_size
+        self.server_lr = server_lr
+        self.staleness_exponent = staleness_exponent
+        self.max_staleness = max_staleness
+        self.version = 0
+        self._sum = np.zeros_like(params, dtype=np.float64)
+        self._weight = 0.0
+        self._count = 0
+        self.applied = 0
+        self.dropped = 0
+        self.staleness = []
+
+    def snapshot(self):
+        """(version, copy of the global parameters) for a client to train on."""
+        return self.version, self.params.copy()
+
+    def submit(self, delta, base_version, n_samples=1):
+        """Buffer one client delta; returns True if it triggered a server step."""
+        tau = self.version - base_version
+        if self.max_staleness is not None and tau > self.max_staleness:
+            self.dropped += 1
+            return False
+        self.staleness.append(tau)
+        self._sum += (n_samples * staleness_weight(tau, self.staleness_exponent)) * np.asarray(delta, dtype=np.float64)
+        self._weight += n_samples
+        self._count += 1
+        if self._count < self.buffer_size:
+            return False
+        self.params += (self.server_lr * self._sum / self._weight).astype(self.params.dtype)
+        self._sum.fill(0)
+        self._weight = 0.0
+        self._count = 0
+        self.version += 1
+        self.applied += 1
+        return True
+
+    def summary(self):
+        stale = np.asarray(self.staleness or [0])
+        return (f"{self.applied} server steps (K={self.buffer_size}), {len(self.staleness)} updates, "
+                f"staleness mean {stale.mean():.2f} / max {stale.max()}, {self.dropped} dropped")
@@ -14,41 +14,49 @@ Usage:
   python federated_theta_agent.py --mode run --role client --rank 1 --run_id test_run
   python federated_theta_agent.py --mode run --role client --rank 2 --run_id test_run
 
+  # In-process shared-memory simulation (no MPI), and its 2..200 client scaling benchmark
+  python fedml_test.py --mode simulate --clients 50 --workers 8
+  python fedml_test.py --mode bench
+
+  # Compressed uplinks (default: the `compression:` key of client/client_config.yaml)
+  python fedml_test.py --mode simulate --clients 50 --compression topk:0.01+zstd
+
+  # Pairwise-masked secure aggregation (default: strategy.secure_aggregation of server_config.yaml)
+  python fedml_test.py --mode simulate --clients 50 --secure_aggregation on
+
+  # Buffered async aggregation (FedBuff) with 20% of hospitals 10x slower
+  python fedml_test.py --mode simulate --clients 20 --aggregation async --buffer_size 5 \
+      --secure_aggregation off --stragglers 0.2 --straggler_delay 10
+
 Dependencies:
-  pip install fedml torch scikit-learn
+  pip install fedml torch      # fedml only for --mode run / launch
 
 Note: This scaffold uses FedML’s distributed runner. The launcher spawns multiple processes
 on a single machine to simulate server + clients for quick testing.
 """
 
 import argparse
+from dataclasses import replace
 import numpy as np
 import torch
 import torch.nn as nn
-from sklearn.model_selection import train_test_split
+import os
 import subprocess
 import sys
 
-import fedml
-from fedml.core import ClientTrainer, ServerAggregator
-from fedml.simulation import mpi_init
+from torch.nn.utils import parameters_to_vector
+
+from cohort import clinical_rows, hospital_profiles, hospital_loader
+from compression import compression_from_config
+
+# fedml is imported in run_fedml only: simulate/bench (shm_sim) run without it
 
 SEED = 42
 np.random.seed(SEED)
 torch.manual_seed(SEED)
 
 def make_clinical_data(n):
-    age = np.random.randint(20, 90, size=n)
-    sbp = np.random.normal(120 + (age - 50) * 0.2, 15, size=n)
-    dbp = np.random.normal(80, 10, size=n)
-    glucose = np.random.normal(100 + (age - 50) * 0.3, 20, size=n)
-    comorb = np.random.binomial(1, p=0.2 + (age-40)/200, size=n)
-    lab = np.random.normal(0, 1, size=n)
-    logits = -5 + 0.03*(age) + 0.02*(sbp) + 0.04*(comorb*20) + 0.5*lab + 0.01*(glucose-100)
-    prob = 1 / (1 + np.exp(-logits))
-    y = np.random.binomial(1, prob)
-    X = np.vstack([age, sbp, dbp, glucose, comorb, lab]).T.astype(np.float32)
-    return X, y.astype(np.int64)
+    return clinical_rows(np.random, n)
 
 class SimpleMLP(nn.Module):
     def __init__(self, in_dim=6, hidden=64):
@@ -63,13 +71,30 @@ class SimpleMLP(nn.Module):
     def forward(self, x):
         return self.net(x).squeeze(-1)
 
-class ClinicalTrainer(ClientTrainer):
+class ClinicalTrainer:
+    """Local training of one hospital. Plain class with FedML's ClientTrainer
+    interface; run_fedml mixes in the real ClientTrainer."""
+
+    def __init__(self, model, args=None):
+        self.model = model
+        self.id = 0
+        self.args = args
+
+    def set_id(self, trainer_id):
+        self.id = trainer_id
+
     def get_model_params(self):
         return {k: v.cpu() for k, v in self.model.state_dict().items()}
 
     def set_model_params(self, model_parameters):
         self.model.load_state_dict(model_parameters)
 
+    def encode_update(self, global_params, codec, residual=None):
+        """This client's update (local minus global parameters) as wire bytes."""
+        with torch.no_grad():
+            local = parameters_to_vector(self.model.parameters()).cpu().numpy()
+        return codec.encode(local - global_params, residual)
+
     def train(self, train_data, device, args):
         self.model.train()
         criterion = nn.BCEWithLogitsLoss()
@@ -97,28 +122,75 @@ class ClinicalTrainer(ClientTrainer):
         return 0, correct/total, correct/total, 0  # loss, acc, precision, recall
 
 def load_data(args):
-    X, y = make_clinical_data(args.samples)
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=SEED, stratify=y)
-    X_train, y_train = torch.tensor(X_train), torch.tensor(y_train)
-    X_test, y_test = torch.tensor(X_test), torch.tensor(y_test)
+    """Minibatch loaders over this rank's hospital cohort: client rank r trains
+    on hospital (r - 1) % clients; the server, rank 0, holds no cohort of its
+    own and evaluates on hospital 0's held-out split.
 
-    train_data = [(X_train, y_train)]
-    test_data = [(X_test, y_test)]
+    Cohorts are streamed chunk by chunk with the configured non-IID skew, so
+    --samples can go to tens of millions of rows per hospital.
+    """
+    profiles = hospital_profiles(max(args.clients, 1), args.samples,
+                                 size_skew=args.size_skew, age_skew=args.age_skew,
+                                 comorb_skew=args.comorb_skew, label_skew=args.label_skew,
+                                 seed=SEED)
+    if args.rank == 0:
+        profile = profiles[0]
+    else:
+        profile = profiles[(args.rank - 1) % len(profiles)]
+    test_profile = replace(profile, n_rows=max(int(profile.n_rows * 0.2), 1))
+    train_data = hospital_loader(profile, args.batch_size, args.chunk_size, split="train")
+    test_data = hospital_loader(test_profile, args.batch_size, args.chunk_size, split="test")
     return train_data, test_data
 
+def load_client_data(args, client_id):
+    """Cohort of one client (rank) without going through the FedML runtime."""
+    return load_data(argparse.Namespace(**{**vars(args), "rank": client_id}))
+
 def run_fedml(args):
+    import fedml
+    from fedml.core import ClientTrainer, ServerAggregator
+    from fedml.simulation import mpi_init
+
+    class FedMLClinicalTrainer(ClinicalTrainer, ClientTrainer):
+        def __init__(self, model, args):
+            ClientTrainer.__init__(self, model, args)
+
     mpi_init.init(args)
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
     model = SimpleMLP()
     train_data, test_data = load_data(args)
 
-    trainer = ClinicalTrainer(model, train_data, test_data, device, args)
+    trainer = FedMLClinicalTrainer(model, args)
     aggregator = ServerAggregator(model, train_data, test_data, device, args)
 
     fedml_runner = fedml.FedMLRunner(args, device, model, train_data, test_data, trainer, aggregator)
     fedml_runner.run()
 
+def resolve_compression(args):
+    """--compression if given, else the client config's; the server config must agree."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    client_spec = compression_from_config(os.path.join(here, "client", "client_config.yaml"), "client")
+    server_spec = compression_from_config(os.path.join(here, "server", "server_config.yaml"), "server")
+    if args.compression is None:
+        if str(client_spec) != str(server_spec):
+            raise ValueError(f"client compression '{client_spec}' does not match server '{server_spec}'")
+        return client_spec
+    return args.compression
+
+def resolve_secure_aggregation(args):
+    """--secure_aggregation if given, else the server config's strategy flag."""
+    if args.secure_aggregation is not None:
+        enabled = args.secure_aggregation == "on"
+    else:
+        import yaml
+        here = os.path.dirname(os.path.abspath(__file__))
+        with open(os.path.join(here, "server", "server_config.yaml")) as f:
+            enabled = bool(((yaml.safe_load(f) or {}).get("strategy") or {}).get("secure_aggregation", False))
+    if enabled and str(args.compression).lower() != "none":
+        raise ValueError("secure aggregation needs dense updates; set compression to none")
+    return enabled
+
 def launch_local_test(args):
     processes = []
     run_id = "local_test"
@@ -137,7 +209,7 @@ def launch_local_test(args):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--mode", type=str, choices=["run", "launch"], required=True)
+    parser.add_argument("--mode", type=str, choices=["run", "launch", "simulate", "bench"], required=True)
     parser.add_argument("--role", type=str, choices=["server", "client"], default="client")
     parser.add_argument("--rank", type=int, default=1)
     parser.add_argument("--run_id", type=str, default="fedml_test")
@@ -145,11 +217,41 @@ if __name__ == "__main__":
     parser.add_argument("--clients", type=int, default=2)
     parser.add_argument("--local_epochs", type=int, default=2)
     parser.add_argument("--lr", type=float, default=1e-3)
-    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=1000, help="mean training rows per hospital")
+    parser.add_argument("--batch_size", type=int, default=64)
+    parser.add_argument("--chunk_size", type=int, default=1 << 16, help="rows generated at a time")
+    parser.add_argument("--size_skew", type=float, default=0.0, help="0 = equal hospital sizes")
+    parser.add_argument("--age_skew", type=float, default=0.0, help="std of per-hospital age shift (years)")
+    parser.add_argument("--comorb_skew", type=float, default=0.0, help="std of comorbidity-rate shift")
+    parser.add_argument("--label_skew", type=float, default=0.0, help="std of outcome-logit shift")
+    parser.add_argument("--workers", type=int, default=None, help="simulate/bench: pool size (default: cores)")
+    parser.add_argument("--compression", type=str, default=None,
+                        help="update codec: none | qsgd[:levels] | topk[:ratio], optionally +zstd")
+    parser.add_argument("--secure_aggregation", choices=["on", "off"], default=None)
+    parser.add_argument("--secagg_neighbours", type=int, default=None,
+                        help="masking neighbours per client (default: all clients)")
+    parser.add_argument("--aggregation", choices=["sync", "async"], default="sync",
+                        help="simulate: synchronous FedAvg rounds or buffered async (FedBuff)")
+    parser.add_argument("--buffer_size", type=int, default=4, help="async: client updates per server step")
+    parser.add_argument("--server_lr", type=float, default=1.0, help="async: server step size")
+    parser.add_argument("--staleness_exponent", type=float, default=0.5,
+                        help="async: updates weighted by (1 + staleness) ** -exponent")
+    parser.add_argument("--stragglers", type=float, default=0.0, help="fraction of slow hospitals")
+    parser.add_argument("--straggler_delay", type=float, default=10.0, help="slowdown of a slow hospital")
     args = parser.parse_args()
+    args.compression = resolve_compression(args)
+    args.secure_aggregation = resolve_secure_aggregation(args)
+    if args.aggregation == "async" and (args.secure_aggregation or str(args.compression).lower() != "none"):
+        parser.error("--aggregation async needs --secure_aggregation off and --compression none")
 
     if args.mode == "run":
         run_fedml(args)
     elif args.mode == "launch":
         launch_local_test(args)
+    elif args.mode == "simulate":
+        import shm_sim
+        shm_sim.simulate(args)
+    elif args.mode == "bench":
+        import shm_sim
+        shm_sim.benchmark(args)
 
@@ -1,5 +1,45 @@
 import argparse
+import json
+
+import yaml
 from fedml import FedMLServer
+from fedml.core import ServerAggregator
+from transformers import AutoModelForCausalLM
+
+from fed_eval import CollectEvaluationUploads, EvaluationCollector
+
+
+def evaluation_collector(config_file):
+    """Collector for the evaluation sums eval_client.py uploads; the weighted
+    report is logged and written to evaluation.report of the server config."""
+    with open(config_file) as f:
+        evaluation = (yaml.safe_load(f) or {}).get("evaluation") or {}
+    report_path = evaluation.get("report", "evaluation_report.json")
+
+    def on_report(report):
+        print(f"[Server] Federated evaluation: {json.dumps(report['overall'])}")
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return EvaluationCollector(evaluation.get("sites", []), on_report)
+
+
+class EvaluatingAggregator(CollectEvaluationUploads, ServerAggregator):
+    """FedAvg aggregator that also receives the eval clients' uploaded sums."""
+
+    def __init__(self, model, args, collector):
+        super().__init__(model, args)
+        self.collector = collector
+
+    def get_model_params(self):
+        return self.model.cpu().state_dict()
+
+    def set_model_params(self, model_parameters):
+        self.model.load_state_dict(model_parameters)
+
+    def test(self, test_data, device, args):
+        pass  # evaluation runs on the sites, see client/eval_client.py
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -7,10 +47,13 @@ if __name__ == "__main__":
     parser.add_argument("--config", type=str, default="server/server_config.yaml")
     args = parser.parse_args()
 
+    model = AutoModelForCausalLM.from_pretrained("sshleifer/tiny-gpt2")
+    aggregator = EvaluatingAggregator(model, args, evaluation_collector(args.config))
     server = FedMLServer(
         host="0.0.0.0",
         port=args.port,
-        config_file=args.config
+        config_file=args.config,
+        server_aggregator=aggregator
     )
     print(f"[Server] Starting on port {args.port} with config {args.config}...")
     server.start()
@@ -0,0 +1,334 @@
+"""
+In-process shared-memory simulation backend for fedml_test.
+
+Runs the server and N ClinicalTrainer clients inside one process pool instead of
+one OS process (plus MPI/FedML plumbing) per role. Model weights never get
+pickled: the global model lives in a flat float32 shared-memory buffer, every
+pool worker owns one row of a shared accumulator into which it adds the
+sample-weighted parameters of each client it trains, and the server reduces the
+rows into the next global model.
+
+With a `compression` codec other than `none`, clients instead send their
+encoded update (trained minus global parameters) back as bytes, which is what
+a hospital would put on the wire; the server decodes and averages the updates
+and reports bytes-on-wire per round. Top-k error-feedback residuals live in a
+shared (clients x params) buffer, so a client keeps its residual whichever
+worker trains it.
+
+With secure aggregation on, the server only ever sees pairwise-masked uint64
+updates (secagg.py): key agreement and secret sharing run in the server
+process on the clients' behalf, workers mask the weighted update they trained,
+and the masks cancel in the server's sum.
+
+With --aggregation async the server runs FedBuff (fedbuff.py) instead of
+rounds: every client is retrained as soon as it reports, against the newest
+global version, and the server steps after every K updates. --stragglers
+makes a fraction of hospitals --straggler_delay times slower, in both modes.
+
+Usage:
+  python fedml_test.py --mode simulate --clients 20 --rounds 5
+  python fedml_test.py --mode bench                      # 2 .. 200 clients
+"""
+
+import os
+import queue
+import time
+import argparse
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+import torch
+from torch.nn.utils import parameters_to_vector, vector_to_parameters
+
+import fed_eval
+import fedml_test
+import secagg
+from fedbuff import BufferedAsyncAggregator
+from compression import TopKCodec, WireMeter, build_codec
+
+# per-worker state, set up once by _init_worker
+_W = {}
+
+
+def _num_params():
+    return sum(p.numel() for p in fedml_test.SimpleMLP().parameters())
+
+
+def _attach(name, shape):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+
+
+def _init_worker(global_name, acc_name, weight_name, residual_name, n_slots, n_params,
+                 slot_counter, ready, args):
+    torch.set_num_threads(1)  # one core per worker; the pool provides the parallelism
+    with slot_counter.get_lock():
+        slot = slot_counter.value
+        slot_counter.value += 1
+    _W["shm"] = [
+        _attach(global_name, (n_params,)),
+        _attach(acc_name, (n_slots, n_params)),
+        _attach(weight_name, (n_slots,)),
+    ]
+    _W["global"] = _W["shm"][0][1]
+    _W["acc"] = _W["shm"][1][1][slot]
+    _W["weight"] = _W["shm"][2][1][slot:slot + 1]
+    if residual_name is not None:
+        _W["shm"].append(_attach(residual_name, (args.clients + 1, n_params)))
+        _W["residual"] = _W["shm"][3][1]
+    _W["args"] = args
+    _W["codec"] = build_codec(args.compression) if _compressed(args) else None
+    model = fedml_test.SimpleMLP()
+    _W["model"] = model
+    _W["trainer"] = fedml_test.ClinicalTrainer(model, args)
+    # pay torch's one-off first-step cost here, not inside a client's timing
+    _W["trainer"].train([(torch.zeros(2, 6), torch.zeros(2, dtype=torch.long))], torch.device("cpu"), args)
+    ready.wait()
+
+
+def _compressed(args):
+    return str(getattr(args, "compression", None) or "none").lower() != "none"
+
+
+def _error_feedback(codec):
+    codec = getattr(codec, "inner", codec)
+    return isinstance(codec, TopKCodec) and codec.error_feedback
+
+
+def _is_straggler(client_id, args):
+    frac = getattr(args, "stragglers", 0.0)
+    return frac > 0 and np.random.default_rng([fedml_test.SEED, client_id]).random() < frac
+
+
+def _straggle(client_id, start):
+    """Stretch a straggler's wall time to straggler_delay x its training time."""
+    args = _W["args"]
+    if _is_straggler(client_id, args):
+        time.sleep((args.straggler_delay - 1) * (time.perf_counter() - start))
+
+
+def _train_client(client_id, mask_seeds=None):
+    """Train one client from the current global model; fold its weighted
+    parameters into this worker's accumulator row, or return its encoded
+    (codec) or masked (secure aggregation) update."""
+    model, args = _W["model"], _W["args"]
+    start = time.perf_counter()
+    with torch.no_grad():
+        # clone: vector_to_parameters makes the parameters views of its input
+        vector_to_parameters(torch.from_numpy(_W["global"]).clone(), model.parameters())
+    train_data, _ = fedml_test.load_client_data(args, client_id)
+    _W["trainer"].train(train_data, torch.device("cpu"), args)
+    _straggle(client_id, start)
+    n = train_data.dataset.num_rows
+    if _W["codec"] is not None:
+        residual = _W["residual"][client_id] if "residual" in _W else None
+        payload = _W["trainer"].encode_update(_W["global"], _W["codec"], residual)
+        return client_id, n, time.perf_counter() - start, payload
+    if mask_seeds is not None:
+        with torch.no_grad():
+            delta = parameters_to_vector(model.parameters()).numpy() - _W["global"]
+        masked = secagg.apply_masks(secagg.encode_fixed(delta, n), *mask_seeds)
+        return client_id, n, time.perf_counter() - start, masked
+    with torch.no_grad():
+        _W["acc"] += n * parameters_to_vector(model.parameters()).numpy()
+    _W["weight"][0] += n
+    return client_id, n, time.perf_counter() - start
+
+
+def _train_client_async(client_id, version, params):
+    """Train one client from global `version`; return its delta."""
+    model, args = _W["model"], _W["args"]
+    start = time.perf_counter()
+    with torch.no_grad():
+        vector_to_parameters(torch.from_numpy(params).clone(), model.parameters())
+    train_data, _ = fedml_test.load_client_data(args, client_id)
+    _W["trainer"].train(train_data, torch.device("cpu"), args)
+    _straggle(client_id, start)
+    with torch.no_grad():
+        delta = parameters_to_vector(model.parameters()).numpy() - params
+    return client_id, version, train_data.dataset.num_rows, time.perf_counter() - start, delta
+
+
+class SharedMemorySimulation:
+    """Server + N clients over a process pool and shared-memory buffers."""
+
+    def __init__(self, args, workers=None):
+        self.args = args
+        self.workers = workers or min(os.cpu_count() or 1, args.clients)
+        self.n_params = _num_params()
+        self.codec = build_codec(args.compression) if _compressed(args) else None
+        self.meter = WireMeter()
+        self.secure = bool(getattr(args, "secure_aggregation", False))
+        self.round = 0
+
+        def alloc(shape):
+            shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 4)
+            return shm, np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+
+        self._global_shm, self.global_params = alloc((self.n_params,))
+        self._acc_shm, self.acc = alloc((self.workers, self.n_params))
+        self._weight_shm, self.weights = alloc((self.workers,))
+        self._residual_shm = None
+        if _error_feedback(self.codec):
+            self._residual_shm, residual = alloc((args.clients + 1, self.n_params))
+            residual.fill(0)
+
+        torch.manual_seed(fedml_test.SEED)
+        self.model = fedml_test.SimpleMLP()
+        self.global_params[:] = parameters_to_vector(self.model.parameters()).detach().numpy()
+
+        ctx = mp.get_context("fork" if "fork" in mp.get_all_start_methods() else "spawn")
+        slot_counter = ctx.Value("i", 0)
+        ready = ctx.Barrier(self.workers + 1)
+        self.pool = ctx.Pool(self.workers, initializer=_init_worker,
+                             initargs=(self._global_shm.name, self._acc_shm.name, self._weight_shm.name,
+                                       self._residual_shm and self._residual_shm.name,
+                                       self.workers, self.n_params, slot_counter, ready, args))
+        ready.wait()  # workers are set up before the first round is timed
+
+    def run_round(self):
+        self.round += 1
+        if self.secure:
+            return self._run_secure_round()
+        self.acc.fill(0)
+        self.weights.fill(0)
+        results = self.pool.map(_train_client, range(1, self.args.clients + 1), chunksize=1)
+        if self.codec is not None:
+            # FedAvg over decoded updates: global += sum(n_i * delta_i) / sum(n_i)
+            delta = np.zeros(self.n_params, dtype=np.float32)
+            total = 0
+            for _, n, _, payload in results:
+                self.meter.record(self.n_params, payload)
+                delta += n * self.codec.decode(payload)
+                total += n
+            self.global_params += delta / total
+            return results
+        # FedAvg: one reduction over W worker rows, weighted by sample counts
+        self.global_params[:] = self.acc.sum(axis=0) / self.weights.sum()
+        return results
+
+    def _run_secure_round(self):
+        ids = list(range(1, self.args.clients + 1))
+        server, clients = secagg.setup_round(ids, getattr(self.args, "secagg_neighbours", None),
+                                             round_idx=self.round)
+        server.n_params = self.n_params
+        tasks = [(i, clients[i].mask_seeds(server.public_keys)) for i in ids]
+        results = self.pool.starmap(_train_client, tasks, chunksize=1)
+        masked = {cid: vector for cid, _, _, vector in results}
+        reveals = {i: clients[i].reveal(set(masked)) for i in masked}
+        total = sum(n for _, n, _, _ in results)
+        self.global_params += (server.unmask(masked, reveals) / total).astype(np.float32)
+        return results
+
+    def run(self, rounds=None, on_round=None):
+        """Synchronous rounds; on_round(round, global params copy) after each."""
+        latencies = []
+        run_start = time.perf_counter()
+        for rnd in range(rounds or self.args.rounds):
+            start = time.perf_counter()
+            self.run_round()
+            latencies.append(time.perf_counter() - start)
+            print(f"[shm-sim] round {rnd + 1}: {self.args.clients} clients, {latencies[-1]:.3f}s")
+            if on_round is not None:
+                on_round(rnd + 1, self.global_params.copy())
+        print(f"[shm-sim] sync: {len(latencies)} rounds, {time.perf_counter() - run_start:.3f}s")
+        if self.secure:
+            print("[shm-sim] secure aggregation: server saw masked updates only")
+        if self.codec is not None:
+            print(f"[shm-sim] uplink ({self.codec.name}): {self.meter.summary()}")
+        with torch.no_grad():
+            vector_to_parameters(torch.from_numpy(self.global_params.copy()), self.model.parameters())
+        return latencies
+
+    def run_async(self, server_steps=None):
+        """FedBuff until `server_steps` global versions (default: as many
+        client updates as args.rounds synchronous rounds)."""
+        args = self.args
+        k = args.buffer_size
+        server_steps = server_steps or max(args.rounds * args.clients // k, 1)
+        agg = BufferedAsyncAggregator(self.global_params, k, args.server_lr, args.staleness_exponent)
+        done = queue.SimpleQueue()
+
+        def launch(client_id):
+            version, params = agg.snapshot()
+            self.pool.apply_async(_train_client_async, (client_id, version, params),
+                                  callback=done.put, error_callback=done.put)
+
+        start = time.perf_counter()
+        for client_id in range(1, args.clients + 1):
+            launch(client_id)
+        in_flight = args.clients
+        while agg.version < server_steps:
+            result = done.get()
+            in_flight -= 1
+            if isinstance(result, BaseException):
+                raise result
+            client_id, version, n, _, delta = result
+            if agg.submit(delta, version, n):
+                print(f"[shm-sim] version {agg.version}: {time.perf_counter() - start:.3f}s")
+            if agg.version < server_steps:
+                launch(client_id)
+                in_flight += 1
+        elapsed = time.perf_counter() - start
+        print(f"[shm-sim] async: {agg.summary()}, {elapsed:.3f}s")
+        for _ in range(in_flight):  # let outstanding stragglers finish before teardown
+            done.get()
+        with torch.no_grad():
+            vector_to_parameters(torch.from_numpy(self.global_params.copy()), self.model.parameters())
+        return elapsed
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+        for shm in (self._global_shm, self._acc_shm, self._weight_shm, self._residual_shm):
+            if shm is None:
+                continue
+            shm.close()
+            shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def simulate(args):
+    # every hospital's held-out split, scored on a thread while the next round trains
+    sites = {f"hospital_{i}": fedml_test.load_client_data(args, i)[1] for i in range(1, args.clients + 1)}
+    evaluator = fed_eval.ConcurrentEvaluator(
+        fedml_test.SimpleMLP(), sites, fed_eval.evaluate_binary,
+        on_result=lambda rnd, report: print(
+            f"[shm-sim] round {rnd} eval: accuracy {report['overall']['accuracy']:.3f}, "
+            f"loss {report['overall']['loss']:.4f} over {report['overall']['samples']} held-out rows"))
+
+    def evaluate_round(rnd, params):
+        snapshot = fedml_test.SimpleMLP()
+        vector_to_parameters(torch.from_numpy(params), snapshot.parameters())
+        evaluator.submit(rnd, snapshot.state_dict())
+
+    with SharedMemorySimulation(args, workers=args.workers) as sim:
+        if getattr(args, "aggregation", "sync") == "async":
+            sim.run_async()
+        else:
+            sim.run(on_round=evaluate_round)
+        evaluator.close()
+        _, test_data = fedml_test.load_client_data(args, 0)
+        trainer = fedml_test.ClinicalTrainer(sim.model, args)
+        _, acc, _, _ = trainer.test(test_data, torch.device("cpu"), args)
+        print(f"[shm-sim] global model accuracy on held-out data: {acc:.3f}")
+
+
+def benchmark(args, client_counts=(2, 5, 10, 20, 50, 100, 200), rounds=3):
+    """Mean round latency (first round excluded as warm-up) per client count."""
+    report = {}
+    for n in client_counts:
+        bench_args = argparse.Namespace(**{**vars(args), "clients": n})
+        with SharedMemorySimulation(bench_args, workers=args.workers) as sim:
+            latencies = sim.run(rounds + 1)[1:]
+        report[n] = float(np.mean(latencies))
+    print(f"\n{'clients':>8} {'round latency (s)':>18} {'per client (ms)':>16}")
+    for n, latency in report.items():
+        print(f"{n:>8} {latency:>18.3f} {1000 * latency / n:>16.1f}")
+    return report
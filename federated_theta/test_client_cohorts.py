@@ -0,0 +1,34 @@
+"""Each client rank trains on its own hospital; the server evaluates on
+hospital 0's held-out split.
+
+    cd federated_theta && python -m pytest -q test_client_cohorts.py
+"""
+import argparse
+
+import fedml_test
+
+
+def _args(clients, rank):
+    return argparse.Namespace(rank=rank, clients=clients, samples=40, batch_size=8, chunk_size=64,
+                              size_skew=0.0, age_skew=5.0, comorb_skew=0.1, label_skew=0.5)
+
+
+def _hospital(loader):
+    return loader.dataset.profile.hospital_id
+
+
+def test_distinct_clients_get_distinct_hospitals():
+    train = [fedml_test.load_client_data(_args(4, 0), rank)[0] for rank in range(1, 5)]
+    assert [_hospital(loader) for loader in train] == [0, 1, 2, 3]
+    first, second = (next(iter(loader))[0] for loader in train[:2])
+    assert not (first == second).all()
+
+
+def test_server_evaluates_on_hospital_zero_test_split():
+    train, test = fedml_test.load_data(_args(4, 0))
+    assert _hospital(train) == _hospital(test) == 0
+    assert test.dataset.split == "test"
+
+
+def test_ranks_beyond_the_cohort_wrap_around():
+    assert _hospital(fedml_test.load_data(_args(3, 4))[0]) == 0
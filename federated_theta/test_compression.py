@@ -0,0 +1,108 @@
+"""Update codecs: exact round trips, QSGD is unbiased with bounded error,
+top-k error feedback loses nothing, zstd framing is transparent, and
+WireMeter counts what goes on the wire.
+
+    cd federated_theta && python -m pytest -q test_compression.py
+"""
+import numpy as np
+import pytest
+
+from compression import Codec, QSGDCodec, TopKCodec, WireMeter, ZstdFraming, build_codec
+
+
+def _update(n=1000, seed=0):
+    return np.random.default_rng(seed).normal(0, 1e-2, n).astype(np.float32)
+
+
+def test_plain_codec_round_trips_exactly():
+    v = _update()
+    payload = Codec().encode(v)
+    assert np.array_equal(Codec().decode(payload), v)
+    with pytest.raises(ValueError, match="qsgd"):
+        QSGDCodec().decode(payload)
+
+
+@pytest.mark.parametrize("levels", [1, 16, 127])
+def test_qsgd_error_is_within_one_level(levels):
+    v = _update()
+    out = QSGDCodec(levels, seed=1).decode(QSGDCodec(levels, seed=1).encode(v))
+    step = np.linalg.norm(v) / levels
+    assert np.abs(out - v).max() <= step * (1 + 1e-5)
+    assert np.all((out == 0) | (np.sign(out) == np.sign(v)))
+
+
+def test_qsgd_is_unbiased_over_seeds():
+    v = _update(200)
+    levels, trials = 4, 4000
+    mean = sum(QSGDCodec(levels, seed=s).decode(QSGDCodec(levels, seed=s).encode(v))
+               for s in range(trials)) / trials
+    # per-entry variance is at most (norm / levels)^2 / 4
+    bound = 5 * (np.linalg.norm(v) / levels) / 2 / np.sqrt(trials)
+    assert np.abs(mean - v).max() < bound
+
+
+def test_qsgd_zero_update():
+    codec = QSGDCodec()
+    assert not codec.decode(codec.encode(np.zeros(10, dtype=np.float32))).any()
+
+
+def test_topk_sends_the_largest_entries():
+    v = _update()
+    codec = TopKCodec(ratio=0.05, error_feedback=False)
+    out = codec.decode(codec.encode(v))
+    kept = np.flatnonzero(out)
+    assert kept.size == 50 and np.array_equal(out[kept], v[kept])
+    assert np.abs(v[kept]).min() >= np.abs(np.delete(v, kept)).max()
+
+
+@pytest.mark.parametrize("external", [False, True], ids=["own", "per-client"])
+def test_topk_residual_accounts_for_everything_unsent(external):
+    codec = TopKCodec(ratio=0.1)
+    residual = np.zeros(1000, dtype=np.float32) if external else None
+    sent = np.zeros(1000, dtype=np.float64)
+    total = np.zeros(1000, dtype=np.float64)
+    for step in range(20):
+        v = _update(seed=step)
+        total += v
+        sent += codec.decode(codec.encode(v, residual))
+    left = residual if external else codec.residual
+    assert np.allclose(sent + left, total, atol=1e-5)
+    if external:
+        assert codec.residual is None
+
+
+@pytest.mark.parametrize("spec", ["none+zstd", "qsgd:16+zstd", "topk:0.1+zstd"])
+def test_zstd_framing_is_transparent(spec):
+    v = _update()
+    framed = build_codec(spec)
+    assert isinstance(framed, ZstdFraming)
+    payload = framed.encode(v)
+    inner = framed.inner.decode(framed._decompressor.decompress(payload))
+    assert np.array_equal(framed.decode(payload), inner)
+    if spec == "none+zstd":
+        assert np.array_equal(inner, v)
+
+
+def test_zstd_shrinks_sparse_payloads():
+    v = np.zeros(10000, dtype=np.float32)
+    v[::100] = 1.0
+    assert len(build_codec("none+zstd").encode(v)) < len(Codec().encode(v)) / 10
+
+
+def test_build_codec_specs():
+    assert isinstance(build_codec(None), Codec) and build_codec("qsgd:8").levels == 8
+    assert build_codec({"codec": "topk", "ratio": 0.2}).ratio == 0.2
+    with pytest.raises(ValueError, match="framing"):
+        build_codec("topk+gzip")
+    with pytest.raises(ValueError, match="codec"):
+        build_codec("fp8")
+
+
+def test_wire_meter_counts_payload_bytes():
+    meter, codec = WireMeter(), TopKCodec(ratio=0.01)
+    for seed in range(3):
+        v = _update(seed=seed)
+        meter.record(v.size, codec.encode(v))
+    assert meter.messages == 3 and meter.raw_bytes == 3 * 4000
+    assert meter.wire_bytes == 3 * (9 + 4 + 10 * 8)
+    assert "3 updates" in meter.summary() and "x" in meter.summary()
@@ -0,0 +1,89 @@
+"""Federated evaluation: site sums aggregate to exact sample-weighted metrics.
+
+    cd federated_theta && python -m pytest -q test_fed_eval.py
+"""
+import math
+
+import pytest
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from fed_eval import (CollectEvaluationUploads, EvaluationCollector, aggregate_metrics, evaluate_binary,
+                      evaluation_upload)
+
+
+def test_aggregate_weights_sites_by_samples():
+    report = aggregate_metrics({"a": {"loss_sum": 10.0, "correct": 90, "samples": 100},
+                                "b": {"loss_sum": 1.0, "correct": 1, "samples": 10}})
+    assert report["a"]["accuracy"] == 0.9 and report["b"]["accuracy"] == 0.1
+    assert report["overall"]["accuracy"] == pytest.approx(91 / 110)   # not (0.9 + 0.1) / 2
+    assert report["overall"]["loss"] == pytest.approx(11 / 110)
+
+
+def test_token_weighted_perplexity():
+    report = aggregate_metrics({"a": {"loss_sum": 20.0, "tokens": 10, "samples": 2},
+                                "b": {"loss_sum": 10.0, "tokens": 10, "samples": 5}})
+    assert report["overall"]["loss"] == pytest.approx(1.5)
+    assert report["overall"]["perplexity"] == pytest.approx(math.exp(1.5))
+
+
+def test_split_site_matches_pooled_evaluation():
+    torch.manual_seed(0)
+    model = torch.nn.Sequential(torch.nn.Linear(4, 1), torch.nn.Flatten(0))
+    x, y = torch.randn(50, 4), torch.randint(0, 2, (50,))
+    pooled = evaluate_binary(model, DataLoader(TensorDataset(x, y), batch_size=7))
+    sites = {"a": evaluate_binary(model, DataLoader(TensorDataset(x[:13], y[:13]), batch_size=5)),
+             "b": evaluate_binary(model, DataLoader(TensorDataset(x[13:], y[13:]), batch_size=16))}
+    overall = aggregate_metrics(sites)["overall"]
+    assert overall["samples"] == 50
+    assert overall["accuracy"] == pytest.approx(pooled["correct"] / 50)
+    assert overall["loss"] == pytest.approx(pooled["loss_sum"] / 50, rel=1e-5)
+
+
+def test_collector_reports_once_every_site_is_in():
+    reports = []
+    collector = EvaluationCollector(["a", "b"], reports.append)
+    assert not collector.add("a", {"loss_sum": 4.0, "correct": 3, "samples": 4})
+    assert reports == []
+    assert collector.add("b", {"loss_sum": 0.0, "correct": 0, "samples": 1})
+    assert reports[0]["overall"]["accuracy"] == pytest.approx(3 / 5)
+    assert collector.report() == reports[0]
+
+
+@pytest.mark.parametrize("sums", [{"loss_sum": 1.0}, {"loss_sum": -1.0, "samples": 3},
+                                  {"loss_sum": float("nan"), "samples": 3}, "0.5"])
+def test_collector_rejects_malformed_sums(sums):
+    with pytest.raises(ValueError):
+        EvaluationCollector(["a"]).add("a", sums)
+
+
+def test_collector_rejects_mixed_metric_kinds():
+    collector = EvaluationCollector(["a", "b"])
+    collector.add("a", {"loss_sum": 1.0, "tokens": 3, "samples": 1})
+    with pytest.raises(ValueError):
+        collector.add("b", {"loss_sum": 1.0, "correct": 1, "samples": 1})
+
+
+class _Aggregator:
+    """The part of fedml.core.ServerAggregator the mixin builds on."""
+
+    def on_before_aggregation(self, raw_client_model_or_grad_list):
+        return raw_client_model_or_grad_list
+
+
+class _EvaluatingAggregator(CollectEvaluationUploads, _Aggregator):
+    def __init__(self, collector):
+        self.collector = collector
+
+
+def test_uploaded_sums_reach_the_collector_and_skip_the_average():
+    reports = []
+    aggregator = _EvaluatingAggregator(EvaluationCollector(["a", "b"], reports.append))
+    weights = {"w": torch.ones(2)}
+    uploads = [(10, weights), (0, evaluation_upload("a", {"loss_sum": 6.0, "tokens": 4, "samples": 1}))]
+    assert aggregator.on_before_aggregation(uploads) == [(10, weights)]
+    assert reports == []
+    uploads = [(0, evaluation_upload("b", {"loss_sum": 2.0, "tokens": 4, "samples": 3}))]
+    assert aggregator.on_before_aggregation(uploads) == []
+    assert reports[0]["overall"]["loss"] == pytest.approx(1.0)
+    assert reports[0]["a"]["loss"] == pytest.approx(1.5)
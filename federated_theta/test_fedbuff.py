@@ -0,0 +1,72 @@
+"""FedBuff: a server step every K updates, staleness-weighted sample mean,
+stale updates dropped past the cap.
+
+    cd federated_theta && python -m pytest -q test_fedbuff.py
+"""
+import numpy as np
+import pytest
+
+from fedbuff import BufferedAsyncAggregator, staleness_weight
+
+
+def test_staleness_weight():
+    assert staleness_weight(0) == 1.0
+    assert staleness_weight(3) == pytest.approx(0.5)
+    assert staleness_weight(3, exponent=0.0) == 1.0
+    assert staleness_weight(1) > staleness_weight(2) > staleness_weight(10)
+
+
+def test_step_every_k_updates_with_the_fedbuff_rule():
+    params = np.zeros(4, dtype=np.float32)
+    agg = BufferedAsyncAggregator(params, buffer_size=2, server_lr=0.5)
+    d1, d2 = np.array([1, 2, 3, 4], np.float32), np.array([-1, 0, 1, 2], np.float32)
+    assert not agg.submit(d1, base_version=0, n_samples=10)
+    assert agg.params.sum() == 0 and agg.version == 0
+    assert agg.submit(d2, base_version=0, n_samples=30)
+    assert agg.version == 1 and agg.params is params
+    assert np.allclose(params, 0.5 * (10 * d1 + 30 * d2) / 40)
+
+    before = params.copy()
+    agg.submit(d1, base_version=0, n_samples=10)           # trained on version 0: tau = 1
+    agg.submit(d2, base_version=1, n_samples=10)
+    expected = 0.5 * (10 * staleness_weight(1) * d1 + 10 * d2) / 20
+    assert np.allclose(params - before, expected, atol=1e-6)
+    assert agg.staleness == [0, 0, 1, 0] and agg.applied == 2
+
+
+def test_updates_past_max_staleness_are_dropped():
+    params = np.zeros(2, dtype=np.float32)
+    agg = BufferedAsyncAggregator(params, buffer_size=1, max_staleness=1)
+    for _ in range(3):
+        agg.submit(np.ones(2), base_version=agg.version)
+    assert not agg.submit(np.full(2, 100.0), base_version=0)
+    assert agg.dropped == 1 and agg.version == 3 and np.allclose(params, 3.0)
+    assert "1 dropped" in agg.summary()
+
+
+def test_snapshot_is_a_copy():
+    params = np.ones(3, dtype=np.float32)
+    agg = BufferedAsyncAggregator(params, buffer_size=1)
+    version, local = agg.snapshot()
+    local += 1
+    assert version == 0 and np.allclose(params, 1.0)
+    agg.submit(local - params, version)
+    assert agg.snapshot()[0] == 1 and np.allclose(params, 2.0)
+
+
+def test_async_converges_to_the_mean_optimum():
+    # clients pull the model, step towards their own optimum and push; client 0
+    # is a straggler that pushes once for every three rounds of the others
+    rng = np.random.default_rng(0)
+    targets = rng.normal(size=(5, 8))
+    params = np.zeros(8, dtype=np.float32)
+    agg = BufferedAsyncAggregator(params, buffer_size=3, staleness_exponent=0.0)
+    pulled = {c: agg.snapshot() for c in range(5)}
+    for tick in range(3000):
+        for c in range(1, 5) if tick % 3 else range(5):
+            version, local = pulled[c]
+            agg.submit(0.1 * (targets[c] - local), version)
+            pulled[c] = agg.snapshot()
+    weights = np.array([1, 3, 3, 3, 3]) / 13               # how often each client pushes
+    assert np.abs(params - weights @ targets).max() < 0.05
+    assert max(agg.staleness) > 0
@@ -0,0 +1,95 @@
+"""Secure aggregation: the unmasked sum equals the plain weighted mean, with
+and without dropouts, and nothing less than the protocol recovers it.
+
+    cd federated_theta && python -m pytest -q test_secagg.py
+"""
+import hashlib
+
+import numpy as np
+import pytest
+
+from secagg import (SCALE_BITS, ModpAgreement, decode_fixed, encode_fixed, key_agreement, neighbour_graph, prg_mask,
+                    secure_aggregate, setup_round, shamir_combine, shamir_split)
+
+N_PARAMS = 257
+
+
+def _round(n, seed=0):
+    rng = np.random.default_rng(seed)
+    updates = {i: rng.normal(0, 1e-2, N_PARAMS).astype(np.float32) for i in range(n)}
+    weights = {i: int(rng.integers(10, 500)) for i in range(n)}
+    return updates, weights
+
+
+def _plain(updates, weights, survivors):
+    total = sum(weights[i] * updates[i].astype(np.float64) for i in survivors)
+    return total / sum(weights[i] for i in survivors)
+
+
+@pytest.mark.parametrize("agreement", [None, ModpAgreement()], ids=["default", "modp2048"])
+@pytest.mark.parametrize("k, dropped", [(None, ()), (None, (2, 5)), (4, ()), (4, (7,))])
+def test_matches_plain_weighted_mean(agreement, k, dropped):
+    updates, weights = _round(12)
+    mean = secure_aggregate(updates, weights, k=k, dropped=dropped, round_idx=3, agreement=agreement)
+    expected = _plain(updates, weights, set(updates) - set(dropped))
+    assert np.abs(mean - expected).max() < 1e-6
+
+
+def test_masked_update_hides_the_update():
+    updates, weights = _round(4)
+    server, clients = setup_round(list(updates))
+    masked = clients[0].mask(updates[0], weights[0], server.public_keys)
+    plain = encode_fixed(updates[0], weights[0])
+    assert masked.dtype == np.uint64 and np.count_nonzero(masked == plain) < 3
+    assert np.abs(decode_fixed(masked)).max() > 1e6
+
+
+def test_too_many_dropouts_cannot_be_unmasked():
+    updates, weights = _round(6)
+    server, clients = setup_round(list(updates))
+    server.n_params = N_PARAMS
+    survivors = {0, 1}                                  # fewer than the threshold of 3
+    masked = {i: clients[i].mask(updates[i], weights[i], server.public_keys) for i in survivors}
+    reveals = {i: clients[i].reveal(survivors) for i in survivors}
+    with pytest.raises(RuntimeError, match="need 3"):
+        server.unmask(masked, reveals)
+
+
+def test_shamir_threshold():
+    secret = 2 ** 255 + 12345
+    shares = shamir_split(secret, range(1, 8), threshold=4)
+    assert shamir_combine({x: shares[x] for x in (2, 3, 5, 7)}) == secret
+    assert shamir_combine({x: shares[x] for x in (1, 2, 3)}) != secret
+
+
+def test_neighbour_graph_is_symmetric_and_sparse():
+    graph = neighbour_graph(range(40), k=6)
+    assert all(i not in nbrs and all(i in graph[j] for j in nbrs) for i, nbrs in graph.items())
+    assert {len(nbrs) for nbrs in graph.values()} == {6}
+    assert neighbour_graph(range(5), k=None) == {i: set(range(5)) - {i} for i in range(5)}
+
+
+def test_key_agreement_is_symmetric():
+    for agreement in (key_agreement(), ModpAgreement()):
+        (a, pa), (b, pb) = agreement.generate(), agreement.generate()
+        assert agreement.agree(a, pb) == agreement.agree(b, pa)
+
+
+def test_prg_mask_is_shake256():
+    mask = prg_mask(b"seed" * 8, 5)
+    assert mask.dtype == np.uint64 and mask.shape == (5,)
+    assert mask.tobytes() == np.frombuffer(hashlib.shake_256(b"seed" * 8).digest(40), "<u8").tobytes()
+    assert np.array_equal(prg_mask(b"seed" * 8, 9)[:5], mask)
+    assert not np.array_equal(prg_mask(b"seed" * 8 + b"!", 5), mask)
+
+
+def test_encode_fixed_refuses_to_overflow():
+    limit = 2.0 ** (63 - SCALE_BITS)
+    assert decode_fixed(encode_fixed(np.array([-1.5, 2.25]), 4)).tolist() == [-6.0, 9.0]
+    encode_fixed(np.array([limit / 2 - 1]), 2)
+    with pytest.raises(OverflowError):
+        encode_fixed(np.array([limit / 2]), 2)
+    with pytest.raises(OverflowError):
+        encode_fixed(np.array([1e-3, -limit]))
+    with pytest.raises(OverflowError):
+        encode_fixed(np.array([np.nan]))
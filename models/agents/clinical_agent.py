@@ -3,37 +3,52 @@ import pandas as pd
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from stats_cache import SiteStats, default_cache
+
 load_dotenv()
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
 class ClinicalDataAgent:
-    def __init__(self, data_paths):
+    """Federated analytics over any number of hospital CSVs.
+
+    Each site is reduced to sufficient statistics (moments plus a quantile
+    sketch per numeric column) in a single chunked pass, concurrently and
+    cached across calls. The global figures are the exact sample-weighted
+    merge of the sites, not an average of site averages.
+    """
+
+    def __init__(self, data_paths, stats=None, quantiles=(0.25, 0.5, 0.75), bins=10):
         self.data_paths = data_paths
+        self.stats = stats or default_cache()
+        self.quantiles = quantiles
+        self.bins = bins
         self.model = genai.GenerativeModel("models/gemini-1.5-pro-latest")
 
     def simulate_local_training(self, df):
-        return df.select_dtypes(include=["number"]).mean()
+        return SiteStats.of(df)
+
+    def local_statistics(self):
+        """One SiteStats per site, computed in parallel (cached per file)."""
+        return [s.stats for s in self.stats.summaries(self.data_paths)]
 
     def aggregate_models(self, local_results):
-        return pd.DataFrame(local_results).mean()
+        return SiteStats.combine(local_results)
 
     def analyze_data(self):
-        local_results = []
-        for path in self.data_paths:
-            df = pd.read_csv(path)
-            local_result = self.simulate_local_training(df)
-            local_results.append(local_result)
-
+        local_results = self.local_statistics()
         global_result = self.aggregate_models(local_results)
+        federated = global_result.describe(self.quantiles, self.bins)
 
-        prompt = f"""Based on this federated clinical data result: {global_result.to_dict()},
+        summary = {column: {k: v for k, v in row.items() if k != "histogram"} for column, row in federated.items()}
+        prompt = f"""Based on this federated clinical data result from {len(local_results)} hospitals \
+({global_result.rows} patients in total; per column count, mean, standard deviation and quantiles):
+{summary},
 please provide a summary analysis of the patients' condition trends."""
 
         response = self.model.generate_content([prompt])
 
-        return {
-            "Hospital_1_Result": local_results[0].to_dict(),
-            "Hospital_2_Result": local_results[1].to_dict(),
-            "Federated_Model": global_result.to_dict(),
-            "LLM_Analysis": response.text
-        }
+        result = {f"Hospital_{i}_Result": site.describe(self.quantiles, self.bins)
+                  for i, site in enumerate(local_results, 1)}
+        result["Federated_Model"] = federated
+        result["LLM_Analysis"] = response.text
+        return result
@@ -0,0 +1,104 @@
+"""
+DDSketch: a mergeable quantile sketch with relative-error guarantees
+(Masson, Rim & Lee, VLDB 2019).
+
+A value x > 0 goes to bucket ceil(log_gamma(x)), gamma = (1 + a) / (1 - a),
+so every quantile is returned within relative error a of a true sample.
+Negative values use a mirrored store and zeros are counted apart. Merging
+two sketches adds bucket counts, so per-site sketches combine into exactly
+the sketch of the pooled data.
+
+    sketch = DDSketch(0.01)
+    sketch.add(values)
+    sketch.merge(other).quantile(0.5)
+"""
+
+import math
+from collections import Counter
+
+import numpy as np
+
+
+class DDSketch:
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = Counter()
+        self.negative = Counter()
+        self.zeros = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _indices(self, magnitudes):
+        return np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+
+    def _value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add(self, values):
+        """Add an array of values; NaNs are skipped."""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return self
+        for store, part in ((self.positive, values[values > 0]), (self.negative, -values[values < 0])):
+            if part.size:
+                idx, counts = np.unique(self._indices(part), return_counts=True)
+                store.update(dict(zip(idx.tolist(), counts.tolist())))
+        self.zeros += int((values == 0).sum())
+        self.count += int(values.size)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other):
+        """A new sketch of the union of both inputs."""
+        if other.gamma != self.gamma:
+            raise ValueError("cannot merge sketches with different relative accuracy")
+        merged = DDSketch(self.relative_accuracy)
+        merged.positive = self.positive + other.positive
+        merged.negative = self.negative + other.negative
+        merged.zeros = self.zeros + other.zeros
+        merged.count = self.count + other.count
+        merged.min = min(self.min, other.min)
+        merged.max = max(self.max, other.max)
+        return merged
+
+    def _buckets(self):
+        """(representative value, count) in increasing value order."""
+        for index in sorted(self.negative, reverse=True):
+            yield -self._value(index), self.negative[index]
+        if self.zeros:
+            yield 0.0, self.zeros
+        for index in sorted(self.positive):
+            yield self._value(index), self.positive[index]
+
+    def quantile(self, q):
+        """Value at quantile q in [0, 1]; None for an empty sketch."""
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank, seen = q * (self.count - 1), 0
+        for value, count in self._buckets():
+            seen += count
+            if seen > rank:
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def histogram(self, bins=10):
+        """(edges, counts) over [min, max] with `bins` equal-width bins, each
+        sketch bucket counted at its representative value."""
+        if not self.count:
+            return [], []
+        if self.min == self.max:
+            return [self.min, self.max], [self.count]
+        edges = np.linspace(self.min, self.max, bins + 1)
+        counts = np.zeros(bins, dtype=np.int64)
+        for value, count in self._buckets():
+            counts[min(max(np.searchsorted(edges, value, side="right") - 1, 0), bins - 1)] += count
+        return edges.tolist(), counts.tolist()
@@ -1,13 +1,18 @@
+import json
 import os
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 import google.generativeai as genai
 from dotenv import load_dotenv
 
+from gemini_gateway import GeminiGateway
+
 # Load .env and configure Gemini
 load_dotenv()
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 model = genai.GenerativeModel("gemini-1.5-pro")
+gateway = GeminiGateway(model, ttl=float(os.getenv("GEMINI_CACHE_TTL", "300")))
 
 # FastAPI app
 app = FastAPI()
@@ -19,7 +24,25 @@ class PromptInput(BaseModel):
 @app.post("/generate")
 async def generate_response(data: PromptInput):
     try:
-        response = model.generate_content(data.prompt)
-        return {"response": response.text}
+        return {"response": await gateway.generate(data.prompt)}
     except Exception as e:
         return {"error": str(e)}
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.post("/generate/stream")
+async def stream_response(data: PromptInput):
+    """Server-sent events: `token` events with text chunks, then `done` (or `error`)."""
+    async def events():
+        try:
+            async for chunk in gateway.stream(data.prompt):
+                yield _sse("token", {"text": chunk})
+            yield _sse("done", {})
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/generate/stats")
+def gateway_stats():
+    return gateway.summary()
@@ -0,0 +1,192 @@
+"""
+Non-blocking Gemini gateway: async upstream calls, coalescing of identical
+in-flight prompts and a TTL response cache.
+
+    gateway = GeminiGateway(genai.GenerativeModel("gemini-1.5-pro"), ttl=300)
+    text = await gateway.generate(prompt)
+    async for chunk in gateway.stream(prompt):
+        ...
+
+generate(): a cached answer is returned straight away; a prompt that is
+already being answered waits on that one upstream request; only otherwise
+is a new request made (generate_content_async, or generate_content on a
+worker thread for models without it). Failures are not cached.
+
+stream(): yields text chunks as the model produces them. Identical
+concurrent streams share one upstream stream: a later caller is replayed
+the chunks so far and then follows the live ones. Cached prompts, and
+prompts already being answered by generate(), are served whole; a
+completed stream fills the cache for later callers (and answers generate()
+calls made while it runs).
+"""
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """LRU cache whose entries also expire `ttl` seconds after insertion."""
+
+    def __init__(self, ttl=300.0, max_entries=1024, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires, value)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= self.clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, value):
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _chunk_text(chunk):
+    """Text of a streamed chunk; "" for chunks without text parts (e.g. the
+    final or a blocked chunk, whose .text raises ValueError)."""
+    try:
+        return chunk.text or ""
+    except (AttributeError, ValueError):
+        return ""
+
+
+def _retrieve(task):
+    # failures reach stream subscribers through the feed; mark them handled
+    if not task.cancelled():
+        task.exception()
+
+
+class _Feed:
+    """Chunks of one upstream stream, replayed to every subscriber."""
+
+    def __init__(self):
+        self.parts = []
+        self.done = False
+        self.error = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, part):
+        async with self._changed:
+            self.parts.append(part)
+            self._changed.notify_all()
+
+    async def close(self, error=None):
+        async with self._changed:
+            self.done, self.error = True, error
+            self._changed.notify_all()
+
+    async def subscribe(self):
+        i = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda: i < len(self.parts) or self.done)
+                new, i, done = self.parts[i:], len(self.parts), self.done
+            for part in new:
+                yield part
+            if done:
+                if self.error is not None:
+                    raise self.error
+                return
+
+
+class GeminiGateway:
+    def __init__(self, model, ttl=300.0, max_entries=1024):
+        self.model = model
+        self.cache = TTLCache(ttl, max_entries)
+        self._inflight = {}  # key -> asyncio.Task (its result is the full text)
+        self._feeds = {}     # key -> _Feed, for in-flight streams
+        self.hits = 0
+        self.coalesced = 0
+        self.upstream = 0
+
+    def _key(self, prompt):
+        name = getattr(self.model, "model_name", "")
+        return hashlib.sha256(f"{name}\0{prompt}".encode()).hexdigest()
+
+    async def _call(self, prompt):
+        self.upstream += 1
+        if hasattr(self.model, "generate_content_async"):
+            response = await self.model.generate_content_async(prompt)
+        else:
+            response = await asyncio.to_thread(self.model.generate_content, prompt)
+        return response.text
+
+    async def _complete(self, key, prompt):
+        try:
+            text = await self._call(prompt)
+            self.cache.put(key, text)
+            return text
+        finally:
+            self._inflight.pop(key, None)
+
+    async def generate(self, prompt):
+        key = self._key(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._complete(key, prompt))
+        else:
+            self.coalesced += 1
+        # shielded: a caller that disconnects does not cancel the shared request
+        return await asyncio.shield(task)
+
+    async def _produce(self, key, prompt, feed):
+        try:
+            self.upstream += 1
+            response = await self.model.generate_content_async(prompt, stream=True)
+            async for chunk in response:
+                text = _chunk_text(chunk)
+                if text:
+                    await feed.publish(text)
+            text = "".join(feed.parts)
+            self.cache.put(key, text)
+            await feed.close()
+            return text
+        except BaseException as exc:
+            await feed.close(exc)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            self._feeds.pop(key, None)
+
+    async def stream(self, prompt):
+        key = self._key(prompt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            yield cached
+            return
+        feed = self._feeds.get(key)
+        if feed is not None:
+            self.coalesced += 1
+        elif key in self._inflight or not hasattr(self.model, "generate_content_async"):
+            yield await self.generate(prompt)
+            return
+        else:
+            # not tied to this caller: a disconnecting subscriber leaves the others (and the cache) served
+            feed = self._feeds[key] = _Feed()
+            task = self._inflight[key] = asyncio.create_task(self._produce(key, prompt, feed))
+            task.add_done_callback(_retrieve)
+        async for part in feed.subscribe():
+            yield part
+
+    def summary(self):
+        return {"cached": len(self.cache), "in_flight": len(self._inflight), "hits": self.hits,
+                "coalesced": self.coalesced, "upstream": self.upstream}
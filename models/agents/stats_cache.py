@@ -0,0 +1,222 @@
+"""
+Streaming, cached per-hospital statistics.
+
+Each hospital CSV is read once, in chunks, and reduced to mergeable
+sufficient statistics per numeric column: moments (count, mean, M2) and a
+DDSketch for quantiles and histograms. Chunks, files and sites are
+combined with the Chan et al. parallel update, so no file is ever held in
+memory whole and merged figures are weighted by sample count:
+
+    n = n_a + n_b
+    mean = mean_a + delta * n_b / n                  delta = mean_b - mean_a
+    M2 = M2_a + M2_b + delta**2 * n_a * n_b / n
+
+Summaries are cached per file under (path, size, mtime_ns). A repeat
+request only stats the files; changed files are recomputed, in parallel
+across hospitals.
+
+    cache = StatsCache()
+    summaries = cache.summaries(["data/hospital_1.csv", "data/hospital_2.csv"])
+    summaries[0].stats.moments.mean   # pd.Series, one entry per numeric column
+    SiteStats.combine(s.stats for s in summaries).describe()
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+from ddsketch import DDSketch
+
+CHUNKSIZE = 100_000
+RELATIVE_ACCURACY = 0.01
+
+
+@dataclass(frozen=True)
+class Moments:
+    """count / mean / M2 per numeric column (NaNs are skipped, as in pandas)."""
+    count: pd.Series
+    mean: pd.Series
+    m2: pd.Series
+
+    @classmethod
+    def empty(cls):
+        return cls(pd.Series(dtype="int64"), pd.Series(dtype="float64"), pd.Series(dtype="float64"))
+
+    @classmethod
+    def of(cls, frame):
+        numeric = frame.select_dtypes(include=["number"])
+        mean = numeric.mean()
+        return cls(numeric.count(), mean, ((numeric - mean) ** 2).sum())
+
+    def merge(self, other):
+        columns = self.count.index.union(other.count.index, sort=False)
+        na = self.count.reindex(columns, fill_value=0)
+        nb = other.count.reindex(columns, fill_value=0)
+        ma = self.mean.reindex(columns).fillna(0.0)
+        mb = other.mean.reindex(columns).fillna(0.0)
+        n = na + nb
+        safe = n.where(n > 0, 1)
+        delta = mb - ma
+        mean = (ma + delta * nb / safe).where(n > 0)
+        m2 = (self.m2.reindex(columns, fill_value=0.0) + other.m2.reindex(columns, fill_value=0.0)
+              + delta ** 2 * na * nb / safe)
+        return Moments(n, mean, m2)
+
+    def select(self, columns):
+        return Moments(self.count.reindex(columns), self.mean.reindex(columns), self.m2.reindex(columns))
+
+    @property
+    def variance(self):
+        """Sample variance (ddof=1), like DataFrame.var()."""
+        return (self.m2 / (self.count - 1)).where(self.count > 1)
+
+    @property
+    def std(self):
+        return self.variance ** 0.5
+
+
+def _clean(value):
+    """JSON-friendly float (NaN -> None)."""
+    return None if value is None or pd.isna(value) else float(value)
+
+
+@dataclass(frozen=True)
+class SiteStats:
+    """Everything one site contributes: row count, moments and a quantile
+    sketch per numeric column."""
+    rows: int
+    moments: Moments
+    sketches: dict
+
+    @classmethod
+    def empty(cls):
+        return cls(0, Moments.empty(), {})
+
+    @classmethod
+    def of(cls, frame, relative_accuracy=RELATIVE_ACCURACY):
+        moments = Moments.of(frame)
+        sketches = {c: DDSketch(relative_accuracy).add(frame[c].to_numpy(dtype="float64"))
+                    for c in moments.count.index}
+        return cls(len(frame), moments, sketches)
+
+    def merge(self, other):
+        sketches = dict(self.sketches)
+        for column, sketch in other.sketches.items():
+            sketches[column] = sketches[column].merge(sketch) if column in sketches else sketch
+        return SiteStats(self.rows + other.rows, self.moments.merge(other.moments), sketches)
+
+    @classmethod
+    def combine(cls, sites):
+        total = cls.empty()
+        for site in sites:
+            total = total.merge(site)
+        return total
+
+    def select(self, columns):
+        return SiteStats(self.rows, self.moments.select(columns), {c: self.sketches[c] for c in columns})
+
+    def describe(self, quantiles=(0.25, 0.5, 0.75), bins=10):
+        """{column: {count, mean, std, min, p25, ..., max, histogram}}."""
+        m = self.moments
+        out = {}
+        for column in m.count.index:
+            sketch = self.sketches[column]
+            row = {"count": int(m.count[column]), "mean": _clean(m.mean[column]), "std": _clean(m.std[column]),
+                   "min": _clean(sketch.quantile(0))}
+            row.update({f"p{round(100 * q)}": _clean(sketch.quantile(q)) for q in quantiles})
+            row["max"] = _clean(sketch.quantile(1))
+            edges, counts = sketch.histogram(bins)
+            row["histogram"] = {"edges": edges, "counts": counts}
+            out[column] = row
+        return out
+
+
+@dataclass(frozen=True)
+class FileSummary:
+    path: str
+    size: int
+    mtime_ns: int
+    stats: SiteStats
+
+
+def _file_key(path):
+    st = os.stat(path)
+    return path, st.st_size, st.st_mtime_ns
+
+
+def summarize_file(path, chunksize=CHUNKSIZE, key=None):
+    """Statistics of one CSV in a single pass, `chunksize` rows at a time. A
+    column counts as numeric only if it is numeric in every chunk, as in a
+    full read."""
+    key = key or _file_key(path)
+    stats, numeric = SiteStats.empty(), None
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        part = SiteStats.of(chunk)
+        columns = part.moments.count.index
+        numeric = list(columns) if numeric is None else [c for c in numeric if c in columns]
+        stats = stats.merge(part)
+    return FileSummary(*key, stats.select(numeric or []))
+
+
+class StatsCache:
+    """Per-file summaries, recomputed only when a file's size or mtime changes."""
+
+    def __init__(self, chunksize=CHUNKSIZE, workers=None):
+        self.chunksize = chunksize
+        self._entries = {}   # path -> FileSummary
+        self._inflight = {}  # (path, size, mtime_ns) -> Future
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(workers or os.cpu_count() or 1)
+        self.hits = 0
+        self.misses = 0
+
+    def _compute(self, key):
+        try:
+            summary = summarize_file(key[0], self.chunksize, key)
+            with self._lock:
+                self._entries[key[0]] = summary
+            return summary
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def summaries(self, paths):
+        """One FileSummary per path, in order. Misses are computed in
+        parallel; a file already being computed by another request is
+        waited on, not read twice."""
+        results = []
+        with self._lock:
+            for path in paths:
+                key = _file_key(path)
+                entry = self._entries.get(path)
+                if entry is not None and (entry.path, entry.size, entry.mtime_ns) == key:
+                    self.hits += 1
+                    results.append(entry)
+                    continue
+                self.misses += 1
+                if key not in self._inflight:
+                    self._inflight[key] = self._pool.submit(self._compute, key)
+                results.append(self._inflight[key])
+        return [r if isinstance(r, FileSummary) else r.result() for r in results]
+
+    def summary(self, path):
+        return self.summaries([path])[0]
+
+    def close(self):
+        self._pool.shutdown()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache():
+    """The process-wide cache shared by every agent instance."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = StatsCache()
+        return _default
@@ -0,0 +1,64 @@
+"""DDSketch: quantiles stay within the relative-error bound of the true
+sample, and merged site sketches equal the sketch of the pooled data.
+
+    cd models/agents && python -m pytest -q test_ddsketch.py
+"""
+import numpy as np
+import pytest
+
+from ddsketch import DDSketch
+
+QUANTILES = [0.001, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 0.999]
+
+
+def _samples(kind, n=20000, seed=0):
+    rng = np.random.default_rng(seed)
+    if kind == "lognormal":
+        return rng.lognormal(0, 3, n)
+    if kind == "negative":
+        return -rng.pareto(1.5, n) - 1e-3
+    values = rng.normal(0, 100, n)
+    values[rng.random(n) < 0.2] = 0.0
+    return values
+
+
+@pytest.mark.parametrize("accuracy", [0.01, 0.05])
+@pytest.mark.parametrize("kind", ["lognormal", "negative", "mixed"])
+def test_quantiles_are_within_the_relative_error(kind, accuracy):
+    values = _samples(kind)
+    sketch = DDSketch(accuracy).add(values)
+    ordered = np.sort(values)
+    for q in QUANTILES:
+        true = ordered[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - true) <= accuracy * abs(true) + 1e-12, q
+    assert sketch.quantile(0) == values.min() and sketch.quantile(1) == values.max()
+
+
+def test_merged_sketches_equal_the_pooled_sketch():
+    sites = [_samples("lognormal", 5000, seed) for seed in range(3)] + [_samples("mixed", 3000, 9)]
+    merged = DDSketch(0.02)
+    for values in sites:
+        merged = merged.merge(DDSketch(0.02).add(values))
+    pooled = DDSketch(0.02).add(np.concatenate(sites))
+    assert merged.count == pooled.count == 18000
+    assert (merged.positive, merged.negative, merged.zeros) == (pooled.positive, pooled.negative, pooled.zeros)
+    assert [merged.quantile(q) for q in QUANTILES] == [pooled.quantile(q) for q in QUANTILES]
+    with pytest.raises(ValueError):
+        merged.merge(DDSketch(0.01))
+
+
+def test_nans_and_empty_sketches():
+    sketch = DDSketch().add([np.nan, np.nan])
+    assert sketch.count == 0 and sketch.quantile(0.5) is None and sketch.histogram() == ([], [])
+    sketch.add([3.0, np.nan])
+    assert sketch.count == 1 and sketch.quantile(0.5) == 3.0
+    assert sketch.histogram(4) == ([3.0, 3.0], [1])
+
+
+def test_histogram_counts_every_value():
+    values = _samples("mixed", 5000)
+    edges, counts = DDSketch(0.01).add(values).histogram(8)
+    assert len(edges) == 9 and edges[0] == values.min() and edges[-1] == values.max()
+    assert sum(counts) == 5000
+    exact, _ = np.histogram(values, bins=edges)
+    assert np.abs(np.array(counts) - exact).sum() <= 0.05 * 5000
@@ -0,0 +1,120 @@
+"""Gateway coalescing: identical concurrent prompts, streamed or not, make
+one upstream call; chunks without text are skipped.
+
+    cd models/agents && python -m pytest -q test_gemini_gateway.py
+"""
+import asyncio
+
+from gemini_gateway import GeminiGateway, TTLCache
+
+
+class Chunk:
+    def __init__(self, text):
+        self._text = text
+
+    @property
+    def text(self):
+        if self._text is None:  # like a final / blocked chunk of the real client
+            raise ValueError("no text parts")
+        return self._text
+
+
+class FakeModel:
+    model_name = "fake"
+
+    def __init__(self, chunks=("Hel", "lo", None, "!"), fail=False):
+        self.chunks = chunks
+        self.fail = fail
+        self.calls = []
+
+    async def _stream(self):
+        for text in self.chunks:
+            await asyncio.sleep(0.01)
+            yield Chunk(text)
+        if self.fail:
+            raise RuntimeError("upstream failed")
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.calls.append((prompt, stream))
+        if stream:
+            return self._stream()
+        await asyncio.sleep(0.05)
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return Chunk("".join(c for c in self.chunks if c))
+
+
+async def _collect(gen):
+    return [part async for part in gen]
+
+
+def test_concurrent_identical_streams_share_one_upstream_call():
+    async def main():
+        model = FakeModel()
+        gateway = GeminiGateway(model)
+        first = asyncio.create_task(_collect(gateway.stream("q")))
+        await asyncio.sleep(0.015)                                  # one chunk already out
+        results = await asyncio.gather(first, _collect(gateway.stream("q")), _collect(gateway.stream("q")))
+        return model, gateway, results
+
+    model, gateway, results = asyncio.run(main())
+    assert results == [["Hel", "lo", "!"]] * 3
+    assert model.calls == [("q", True)]
+    assert gateway.summary() == {"cached": 1, "in_flight": 0, "hits": 0, "coalesced": 2, "upstream": 1}
+
+
+def test_generate_joins_an_in_flight_stream_and_cache_serves_later_calls():
+    async def main():
+        model = FakeModel()
+        gateway = GeminiGateway(model)
+        streamed, generated = await asyncio.gather(_collect(gateway.stream("q")), gateway.generate("q"))
+        return model, gateway, streamed, generated, await _collect(gateway.stream("q"))
+
+    model, gateway, streamed, generated, later = asyncio.run(main())
+    assert streamed == ["Hel", "lo", "!"] and generated == "Hello!" and later == ["Hello!"]
+    assert len(model.calls) == 1 and gateway.hits == 1
+
+
+def test_concurrent_generates_coalesce():
+    async def main():
+        model = FakeModel()
+        gateway = GeminiGateway(model)
+        return model, await asyncio.gather(*(gateway.generate("q") for _ in range(5)))
+
+    model, texts = asyncio.run(main())
+    assert texts == ["Hello!"] * 5 and model.calls == [("q", False)]
+
+
+def test_failed_stream_reaches_every_subscriber_and_is_not_cached():
+    async def main():
+        model = FakeModel(fail=True)
+        gateway = GeminiGateway(model)
+        results = await asyncio.gather(_collect(gateway.stream("q")), _collect(gateway.stream("q")),
+                                       return_exceptions=True)
+        return gateway, results
+
+    gateway, results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert len(gateway.cache) == 0 and gateway.summary()["in_flight"] == 0
+
+
+def test_ttl_cache_expires_and_evicts():
+    now = [0.0]
+    cache = TTLCache(ttl=10, max_entries=2, clock=lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)                                               # evicts the least recent, "b"
+    assert cache.get("b") is None and cache.get("a") == 1
+    now[0] = 10
+    assert cache.get("a") is None
+
+
+def test_different_prompts_are_not_coalesced():
+    async def main():
+        model = FakeModel()
+        gateway = GeminiGateway(model)
+        await asyncio.gather(_collect(gateway.stream("x")), _collect(gateway.stream("y")))
+        return model
+
+    assert len(asyncio.run(main()).calls) == 2
@@ -0,0 +1,86 @@
+"""Streaming statistics: Chan/Welford merges of chunks, files and sites give
+the moments of the pooled data, and the cache only rereads changed files.
+
+    cd models/agents && python -m pytest -q test_stats_cache.py
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stats_cache import Moments, SiteStats, StatsCache, summarize_file
+
+
+def _frame(n, seed, loc=0.0):
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({"age": rng.normal(50 + loc, 12, n), "bmi": rng.lognormal(3, 0.2, n),
+                          "site": [f"s{seed}"] * n})
+    frame.loc[rng.random(n) < 0.1, "bmi"] = np.nan
+    return frame
+
+
+@pytest.mark.parametrize("sizes", [[1000], [1, 999], [300, 1, 500, 199], [2, 2, 2]])
+def test_merged_moments_match_numpy(sizes):
+    frames = [_frame(n, seed, loc=10 * seed) for seed, n in enumerate(sizes)]
+    merged = Moments.empty()
+    for frame in frames:
+        merged = merged.merge(Moments.of(frame))
+    pooled = pd.concat(frames)
+    for column in ("age", "bmi"):
+        values = pooled[column].dropna().to_numpy()
+        assert merged.count[column] == values.size
+        assert merged.mean[column] == pytest.approx(values.mean(), rel=1e-12)
+        assert merged.variance[column] == pytest.approx(values.var(ddof=1), rel=1e-9)
+        assert merged.std[column] == pytest.approx(values.std(ddof=1), rel=1e-9)
+
+
+def test_columns_missing_from_one_side_keep_the_other_sides_moments():
+    a = Moments.of(pd.DataFrame({"x": [1.0, 2.0, 3.0]}))
+    b = Moments.of(pd.DataFrame({"x": [np.nan, np.nan], "y": [4.0, 8.0]}))
+    merged = a.merge(b)
+    assert merged.count.to_dict() == {"x": 3, "y": 2}
+    assert merged.mean.to_dict() == {"x": 2.0, "y": 6.0}
+    assert merged.variance.to_dict() == {"x": 1.0, "y": 8.0}
+    assert pd.isna(Moments.of(pd.DataFrame({"z": [5.0]})).variance["z"])
+
+
+def test_sites_combine_to_the_pooled_summary():
+    frames = [_frame(400, 0), _frame(50, 1, loc=30), _frame(900, 2, loc=-5)]
+    combined = SiteStats.combine(SiteStats.of(f) for f in frames).describe()
+    pooled = pd.concat(frames)
+    assert combined["age"]["count"] == 1350
+    assert combined["age"]["mean"] == pytest.approx(pooled["age"].mean())
+    assert combined["age"]["std"] == pytest.approx(pooled["age"].std())
+    assert combined["bmi"]["min"] == pooled["bmi"].min() and combined["bmi"]["max"] == pooled["bmi"].max()
+    assert combined["bmi"]["p50"] == pytest.approx(pooled["bmi"].median(), rel=0.02)
+    assert sum(combined["age"]["histogram"]["counts"]) == 1350
+    assert "site" not in combined
+
+
+def test_chunked_file_matches_a_full_read(tmp_path):
+    path = tmp_path / "hospital_1.csv"
+    _frame(2500, 3).to_csv(path, index=False)
+    full = pd.read_csv(path)
+    stats = summarize_file(str(path), chunksize=333).stats
+    assert stats.rows == 2500
+    assert stats.moments.mean.to_dict() == pytest.approx(full[["age", "bmi"]].mean().to_dict(), rel=1e-12)
+    assert stats.moments.variance.to_dict() == pytest.approx(full[["age", "bmi"]].var().to_dict(), rel=1e-9)
+
+
+def test_cache_recomputes_only_changed_files(tmp_path):
+    paths = [str(tmp_path / f"hospital_{i}.csv") for i in range(3)]
+    for i, path in enumerate(paths):
+        _frame(100, i).to_csv(path, index=False)
+    cache = StatsCache(chunksize=40, workers=2)
+    first = cache.summaries(paths)
+    assert (cache.hits, cache.misses) == (0, 3)
+    assert all(a is b for a, b in zip(cache.summaries(paths), first)) and cache.hits == 3
+
+    _frame(10, 9).to_csv(paths[1], index=False)
+    stat = os.stat(paths[1])
+    os.utime(paths[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    again = cache.summaries(paths)
+    assert (cache.hits, cache.misses) == (5, 4)
+    assert again[0] is first[0] and again[1].stats.rows == 10
+    cache.close()
@@ -5,10 +5,11 @@ import sys
 cwd_path = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(f'{cwd_path}/../../')
 
-from utils import match_name
+from utils import match_name, tool_data_dir
 
+data_path = tool_data_dir("drugbank")
 
-drugbank_df = pd.read_csv(f"{cwd_path}/data/drugbank.csv", sep='\t')
+drugbank_df = pd.read_csv(f"{data_path}/drugbank.csv", sep='\t')
 drug_names = drugbank_df['name'].str.lower().tolist()
 
 def retrieval_drugbank(drug_name):
@@ -13,7 +13,14 @@ import torch.nn as nn
 from torch.utils.data import Dataset, DataLoader
 from transformers import AutoTokenizer, AutoModel
 
+import sys
+
 current_file_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(f'{current_file_path}/../../')
+
+from utils import tool_data_dir
+
+data_path = tool_data_dir("enrollment")
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 class CriteriaModel(nn.Module):
@@ -74,7 +81,7 @@ def partition_criteria(criteria):
 
 
 def wrapper_get_sentence_embedding():
-    model_name = "dmis-lab/biobert-base-cased-v1.2"
+    model_name = os.getenv("CLINICAL_AGENT_EMBEDDING_MODEL", "dmis-lab/biobert-base-cased-v1.2")
     tokenizer = AutoTokenizer.from_pretrained(model_name)
     device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
     model = AutoModel.from_pretrained(model_name).to(device)
@@ -101,21 +108,21 @@ def wrapper_get_sentence_embedding():
 # Get the sentence embedding function
 get_sentence_embedding = wrapper_get_sentence_embedding()
 
-if os.path.exists(f"{current_file_path}/data/enrollment_model.pt"):
+if os.path.exists(f"{data_path}/enrollment_model.pt"):
     model = CriteriaModel().to(device)
-    model.load_state_dict(torch.load(f'{current_file_path}/data/enrollment_model.pt'))
+    model.load_state_dict(torch.load(f'{data_path}/enrollment_model.pt'))
 else:
-    trial_outcome_df = pd.read_csv(f'{current_file_path}/data/IQVIA_trial_outcomes.csv')
+    trial_outcome_df = pd.read_csv(f'{data_path}/IQVIA_trial_outcomes.csv')
 
     iqvia_nctid_set = set(trial_outcome_df['studyid'])
     poor_set = set(trial_outcome_df[trial_outcome_df['trialOutcome'] == 'Terminated, Poor enrollment']['studyid'])
 
 
 
-    if os.path.exists(f'{current_file_path}/data/trial_data.csv'):
-        trial_df = pd.read_csv(f'{current_file_path}/data/trial_data.csv', sep='\t')
+    if os.path.exists(f'{data_path}/trial_data.csv'):
+        trial_df = pd.read_csv(f'{data_path}/trial_data.csv', sep='\t')
     else:
-        with open(f'{current_file_path}/data/trials/all_xml.txt', 'r') as f:
+        with open(f'{data_path}/trials/all_xml.txt', 'r') as f:
             trials_file_list = [line.strip() for line in f]
 
         trial_data_list = []
@@ -126,7 +133,7 @@ else:
                 continue
 
             try:
-                root_xml = ET.parse(f"{current_file_path}/data/{trial_path}").getroot()
+                root_xml = ET.parse(f"{data_path}/{trial_path}").getroot()
                 criteria = root_xml.find('eligibility').find('criteria').find('textblock').text 
                 if len(criteria) == 0:
                     continue
@@ -155,7 +162,7 @@ else:
                 raise e
 
         trial_df = pd.DataFrame(trial_data_list, columns=['nctid', 'criteria', 'drugs', 'diseases', 'label'])
-        trial_df.to_csv(f'{current_file_path}/data/trial_data.csv', index=False, sep='\t')
+        trial_df.to_csv(f'{data_path}/trial_data.csv', index=False, sep='\t')
 
     trial_emb_list = []
     for row_idx, trial_row in tqdm(trial_df.iterrows(), total=len(trial_df)):
@@ -175,7 +182,7 @@ else:
         trial_emb_list.append(torch.cat((inclusion_criteria_emb, exclusion_criteria_emb, drugs_emb, diseases_emb), dim=0))
 
     trial_emb = torch.stack(trial_emb_list)
-    torch.save(trial_emb, f'{current_file_path}/data/trial_emb.pt')
+    torch.save(trial_emb, f'{data_path}/trial_emb.pt')
 
     print(trial_emb.shape)
 
@@ -249,9 +256,9 @@ else:
                 best_auc = auc_test
                 print(f"Epoch {epoch}\tBest AUC: {auc_test}, saving model...")
 
-                torch.save(model.state_dict(), f'{current_file_path}/data/enrollment_model.pt')
+                torch.save(model.state_dict(), f'{data_path}/enrollment_model.pt')
     # Final evaluation
-    model.load_state_dict(torch.load(f'{current_file_path}/data/enrollment_model.pt'))
+    model.load_state_dict(torch.load(f'{data_path}/enrollment_model.pt'))
 
     model.eval()
     with torch.no_grad():
@@ -10,77 +10,92 @@ import sys
 
 cwd_path = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(f'{cwd_path}/../../')
+sys.path.append(cwd_path)
 
-from utils import match_name, LOGGER, find_least_levenshtein_distance
+from utils import match_name, LOGGER, find_least_levenshtein_distance, tool_data_dir
+from compact_graph import CompactGraph
 
-# Generate NetworkX graph
-if os.path.exists(f'{cwd_path}/data/nx_graph.pkl'):
-    G = pickle.load(open(f'{cwd_path}/data/nx_graph.pkl', 'rb'))
-else:
-    LOGGER.log_with_depth("Data not found. Generating NetworkX graph...")
-    # Read Hetionet v1.0
-    fpath = 'data/hetionet-v1.0.json'
+data_path = tool_data_dir("hetionet")
+
+compact_dir = f'{data_path}/compact_graph'
 
-    with open(fpath, 'r') as f:
-        hetio_json = json.load(f)
+if CompactGraph.exists(compact_dir):
+    # int32 CSR arrays, memory-mapped: no networkx graph is kept in memory
+    G = CompactGraph.load(compact_dir)
+else:
+    # Generate NetworkX graph
+    if os.path.exists(f'{data_path}/nx_graph.pkl'):
+        G = pickle.load(open(f'{data_path}/nx_graph.pkl', 'rb'))
+    else:
+        LOGGER.log_with_depth("Data not found. Generating NetworkX graph...")
+        # Read Hetionet v1.0
+        fpath = f'{data_path}/hetionet-v1.0.json'
+
+        with open(fpath, 'r') as f:
+            hetio_json = json.load(f)
     
-    # Nodes
-    node_rows = []
-    for idx, node in enumerate(hetio_json['nodes']):
-        node_kind = node['kind'].lower()
-        node_id = node['identifier']
-        node_name = node['name'].lower()
+        # Nodes
+        node_rows = []
+        for idx, node in enumerate(hetio_json['nodes']):
+            node_kind = node['kind'].lower()
+            node_id = node['identifier']
+            node_name = node['name'].lower()
         
-        node_rows.append([node_kind, node_id, node_name])
+            node_rows.append([node_kind, node_id, node_name])
 
-    node_df = pd.DataFrame(node_rows, columns=['kind', 'id', 'name'])
+        node_df = pd.DataFrame(node_rows, columns=['kind', 'id', 'name'])
 
-    LOGGER.log_with_depth(node_df)
-    node_df.to_csv(f"{cwd_path}/data/nodes.csv", sep='\t', index=False)
+        LOGGER.log_with_depth(node_df)
+        node_df.to_csv(f"{data_path}/nodes.csv", sep='\t', index=False)
 
-    LOGGER.log_with_depth(f"Node Kind: {node_df['kind'].value_counts()}")
+        LOGGER.log_with_depth(f"Node Kind: {node_df['kind'].value_counts()}")
 
-    # Edges
-    edge_rows = []
-    filter_kind = ['Side Effect', 'Compound', 'Symptom', 'Anatomy', 'Pharmacologic Class', 'Disease']
+        # Edges
+        edge_rows = []
+        filter_kind = ['Side Effect', 'Compound', 'Symptom', 'Anatomy', 'Pharmacologic Class', 'Disease']
 
-    for idx, edge in enumerate(hetio_json['edges']):
-        edge_kind = edge['kind'].lower()
-        edge_source_kind, edge_source_id = edge['source_id']
-        edge_target_kind, edge_target_id = edge['target_id']
-        edge_direction = edge['direction']
+        for idx, edge in enumerate(hetio_json['edges']):
+            edge_kind = edge['kind'].lower()
+            edge_source_kind, edge_source_id = edge['source_id']
+            edge_target_kind, edge_target_id = edge['target_id']
+            edge_direction = edge['direction']
 
-        if edge_source_kind not in filter_kind or edge_target_kind not in filter_kind:
-            continue
+            if edge_source_kind not in filter_kind or edge_target_kind not in filter_kind:
+                continue
 
-        edge_source_kind, edge_target_kind = edge_source_kind.lower(), edge_target_kind.lower()
+            edge_source_kind, edge_target_kind = edge_source_kind.lower(), edge_target_kind.lower()
         
-        edge_rows.append([edge_kind, edge_source_kind, edge_source_id, edge_target_kind, edge_target_id, edge_direction])
+            edge_rows.append([edge_kind, edge_source_kind, edge_source_id, edge_target_kind, edge_target_id, edge_direction])
 
-    edge_df = pd.DataFrame(edge_rows, columns=['kind', 'source_kind', 'source_id', 'target_kind', 'target_id', 'direction'])
-    LOGGER.log_with_depth(edge_df)
-    edge_df.to_csv(f"{cwd_path}/data/edges.csv", sep='\t', index=False)
+        edge_df = pd.DataFrame(edge_rows, columns=['kind', 'source_kind', 'source_id', 'target_kind', 'target_id', 'direction'])
+        LOGGER.log_with_depth(edge_df)
+        edge_df.to_csv(f"{data_path}/edges.csv", sep='\t', index=False)
 
-    # Original: 2250197
-    # After filter: 155106
+        # Original: 2250197
+        # After filter: 155106
 
-    # Create NetworkX graph
-    get_name = lambda node_kind, node_id: node_df[(node_df['kind'] == node_kind) & (node_df['id'] == node_id)]['name'].values[0]
+        # Create NetworkX graph
+        get_name = lambda node_kind, node_id: node_df[(node_df['kind'] == node_kind) & (node_df['id'] == node_id)]['name'].values[0]
 
-    G = nx.Graph()
+        G = nx.Graph()
 
-    for idx, node in node_df.iterrows():
-        G.add_node(node['name'], kind=node['kind'])
+        for idx, node in node_df.iterrows():
+            G.add_node(node['name'], kind=node['kind'])
 
-    for idx, edge in tqdm(edge_df.iterrows(), total=edge_df.shape[0]):
-        source_name = get_name(edge['source_kind'], edge['source_id'])
-        target_name = get_name(edge['target_kind'], edge['target_id'])
+        for idx, edge in tqdm(edge_df.iterrows(), total=edge_df.shape[0]):
+            source_name = get_name(edge['source_kind'], edge['source_id'])
+            target_name = get_name(edge['target_kind'], edge['target_id'])
         
-        G.add_edge(source_name, target_name, kind=edge['kind'])
+            G.add_edge(source_name, target_name, kind=edge['kind'])
     
-    with open(f'{cwd_path}/data/nx_graph.pkl', 'wb') as f:
-        pickle.dump(G, f)
+        with open(f'{data_path}/nx_graph.pkl', 'wb') as f:
+            pickle.dump(G, f)
+
 
+    LOGGER.log_with_depth(f"Converting NetworkX graph to {compact_dir}...")
+    CompactGraph.from_networkx(G).save(compact_dir)
+    del G
+    G = CompactGraph.load(compact_dir)
 
 def retrieval_hetionet(source_name, target_name, cutoff=2):
     try:
@@ -91,7 +106,7 @@ def retrieval_hetionet(source_name, target_name, cutoff=2):
         source_name = match_name(source_name, G.nodes)
         target_name, distance = find_least_levenshtein_distance(target_name, G.nodes)
 
-        all_paths = list(nx.all_simple_paths(G, source=source_name, target=target_name, cutoff=cutoff))
+        all_paths = list(G.all_simple_paths(source_name, target_name, cutoff=cutoff))
 
         final_path_str = f"All paths from {source_name} to {target_name} with length < {cutoff+1}:\n"
 
@@ -102,9 +117,9 @@ def retrieval_hetionet(source_name, target_name, cutoff=2):
                 start_node = path[i]
                 end_node = path[i + 1]
                 
-                edge_kind = G[start_node][end_node].get('kind', 'Unknown relation')
-                start_node_kind = G.nodes[start_node].get('kind', 'Unknown kind')
-                end_node_kind = G.nodes[end_node].get('kind', 'Unknown kind')
+                edge_kind = G.edge_kind(start_node, end_node) or 'Unknown relation'
+                start_node_kind = G.node_kind(start_node) or 'Unknown kind'
+                end_node_kind = G.node_kind(end_node) or 'Unknown kind'
 
                 if i == 0:
                     single_path.append(f"<drug>{start_node_kind}:{start_node}</drug>")
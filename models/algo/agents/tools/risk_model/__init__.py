@@ -6,22 +6,24 @@ import sys
 cwd_path = os.path.dirname(os.path.realpath(__file__))
 sys.path.append(f'{cwd_path}/../../')
 
-from utils import match_name, LOGGER
+from utils import match_name, LOGGER, tool_data_dir
 
-if os.path.exists(f"{cwd_path}/data/drug_success_ratio.json") and os.path.exists(f"{cwd_path}/data/disease_success_ratio.json"):
-    drug_success_ratio = json.load(open(f"{cwd_path}/data/drug_success_ratio.json", 'r'))
-    disease_success_ratio = json.load(open(f"{cwd_path}/data/disease_success_ratio.json", 'r'))
+data_path = tool_data_dir("risk_model")
+
+if os.path.exists(f"{data_path}/drug_success_ratio.json") and os.path.exists(f"{data_path}/disease_success_ratio.json"):
+    drug_success_ratio = json.load(open(f"{data_path}/drug_success_ratio.json", 'r'))
+    disease_success_ratio = json.load(open(f"{data_path}/disease_success_ratio.json", 'r'))
 else:
     # NCT ID to label
-    trial_outcome_df = pd.read_csv(f'{cwd_path}/../enrollment/data/IQVIA_trial_outcomes.csv')
-    outcome2label = pd.read_csv(f'data/outcome2label.txt', sep='\t', header=None).set_index(0)[1].to_dict()
+    trial_outcome_df = pd.read_csv(f'{tool_data_dir("enrollment")}/IQVIA_trial_outcomes.csv')
+    outcome2label = pd.read_csv(f'{data_path}/outcome2label.txt', sep='\t', header=None).set_index(0)[1].to_dict()
     trial_outcome_df['label'] = trial_outcome_df['trialOutcome'].map(outcome2label)
     nctid2label_df = trial_outcome_df[trial_outcome_df['label'].isin([0, 1])][['studyid', 'label']]
 
     # Merge with trial data
-    trial_df = pd.read_csv(f'{cwd_path}/../enrollment/data/trial_data.csv', sep='\t').drop('label', axis=1)
+    trial_df = pd.read_csv(f'{tool_data_dir("enrollment")}/trial_data.csv', sep='\t').drop('label', axis=1)
     trial_success_df = pd.merge(trial_df, nctid2label_df, left_on='nctid', right_on='studyid', how='inner').drop('studyid', axis=1)
-    trial_success_df.to_csv(f"{cwd_path}/data/trial_success.csv", sep='\t', index=False)
+    trial_success_df.to_csv(f"{data_path}/trial_success.csv", sep='\t', index=False)
 
     drug_df = trial_success_df[['drugs', 'label']]
     drug_df['drugs'] = drug_df['drugs'].str.strip().lower()
@@ -33,7 +35,7 @@ else:
     drug_label_ratio = drug_df_expanded.groupby('drugs')['label'].mean()
     drug_success_ratio = drug_label_ratio.to_dict()
 
-    json.dump(drug_success_ratio, open(f"{cwd_path}/data/drug_success_ratio.json", 'w'))
+    json.dump(drug_success_ratio, open(f"{data_path}/drug_success_ratio.json", 'w'))
 
     disease_df = trial_success_df[['diseases', 'label']]
     disease_df['diseases'] = disease_df['diseases'].str.strip().lower()
@@ -45,7 +47,7 @@ else:
     disease_label_ratio = disease_df_expanded.groupby('diseases')['label'].mean()
     disease_success_ratio = disease_label_ratio.to_dict()
 
-    json.dump(disease_success_ratio, open(f"{cwd_path}/data/disease_success_ratio.json", 'w'))
+    json.dump(disease_success_ratio, open(f"{data_path}/disease_success_ratio.json", 'w'))
 
 def get_disease_risk(disease_name):
     disease_name = disease_name.strip().lower()
@@ -0,0 +1,86 @@
+"""CompactGraph answers like the networkx graph it was built from: paths,
+neighbours, node and edge kinds, before and after a memory-mapped reload.
+
+Lives beside the hetionet package rather than in it: importing the package
+loads the graph.
+
+    cd models/algo/agents/tools && python -m pytest -q test_compact_graph.py
+"""
+import os
+import random
+import sys
+
+import networkx as nx
+import numpy as np
+import pytest
+
+cwd_path = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(f'{cwd_path}/hetionet')
+
+from compact_graph import CompactGraph
+
+KINDS = ["compound", "disease", "side effect", "symptom"]
+EDGE_KINDS = ["treats", "causes", "resembles", "presents"]
+
+
+@pytest.fixture(scope="module")
+def nx_graph():
+    rng = random.Random(0)
+    G = nx.Graph()
+    names = [f"node {i}" for i in range(120)] + ["éscitalopram", "b", "ba", "a b"]
+    for name in names:
+        G.add_node(name, kind=rng.choice(KINDS))
+    G.add_node("no kind")
+    while G.number_of_edges() < 400:
+        u, v = rng.sample(names, 2)
+        G.add_edge(u, v, kind=rng.choice(EDGE_KINDS))
+    return G
+
+
+@pytest.fixture(scope="module", params=["built", "loaded"])
+def graph(request, nx_graph, tmp_path_factory):
+    graph = CompactGraph.from_networkx(nx_graph)
+    if request.param == "loaded":
+        path = str(tmp_path_factory.mktemp("graph") / "compact_graph")
+        graph.save(path)
+        graph.save(path)                                    # overwriting an existing graph
+        graph = CompactGraph.load(path)
+        assert isinstance(graph.indices, np.memmap)
+    return graph
+
+
+def test_nodes_and_kinds(graph, nx_graph):
+    assert len(graph) == nx_graph.number_of_nodes() and graph.number_of_edges() == nx_graph.number_of_edges()
+    assert sorted(graph.nodes) == sorted(nx_graph.nodes)
+    for name, data in nx_graph.nodes(data=True):
+        assert name in graph.nodes and graph.name(graph.id(name)) == name
+        assert graph.node_kind(name) == data.get("kind")
+    assert "missing" not in graph.nodes and 3 not in graph.nodes and graph.id("node") is None
+    with pytest.raises(KeyError):
+        graph.neighbors("missing")
+
+
+def test_neighbours_and_edge_kinds(graph, nx_graph):
+    for name in nx_graph.nodes:
+        assert sorted(graph.name(i) for i in graph.neighbors(name)) == sorted(nx_graph.neighbors(name))
+    for u, v, data in nx_graph.edges(data=True):
+        assert graph.edge_kind(u, v) == graph.edge_kind(v, u) == data["kind"]
+    assert graph.edge_kind("node 0", "no kind") is None
+
+
+@pytest.mark.parametrize("cutoff", [1, 2, 3])
+def test_simple_paths_match_networkx(graph, nx_graph, cutoff):
+    rng = random.Random(cutoff)
+    pairs = [tuple(rng.sample(list(nx_graph.nodes), 2)) for _ in range(20)] + [("éscitalopram", "a b")]
+    for source, target in pairs:
+        expected = sorted(nx.all_simple_paths(nx_graph, source, target, cutoff=cutoff))
+        assert sorted(graph.all_simple_paths(source, target, cutoff=cutoff)) == expected
+    assert list(graph.all_simple_paths("node 0", "node 0", cutoff=cutoff)) == []
+
+
+def test_unbounded_paths():
+    G = nx.relabel_nodes(nx.cycle_graph(6), str)
+    nx.set_node_attributes(G, "x", "kind")
+    graph = CompactGraph.from_networkx(G)
+    for source, target in [("0", "3"), ("2", "4")]:
+        assert sorted(graph.all_simple_paths(source, target)) == sorted(nx.all_simple_paths(G, source, target))
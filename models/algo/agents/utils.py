@@ -163,7 +163,16 @@ def find_least_levenshtein_distance(target_string, array):
 
 
 cwd_path = os.path.dirname(os.path.abspath(__file__))
-name_synonyms = json.load(open(f"{cwd_path}/tools/drugbank/data/name_synonyms.json", 'r'))
+
+
+def tool_data_dir(tool):
+    """Data directory of an agent tool. CLINICAL_AGENT_TOOLS_DATA=<root> points
+    every tool at <root>/<tool> instead (e.g. generated benchmark fixtures)."""
+    root = os.getenv("CLINICAL_AGENT_TOOLS_DATA")
+    return os.path.join(root, tool) if root else f"{cwd_path}/tools/{tool}/data"
+
+
+name_synonyms = json.load(open(f"{tool_data_dir('drugbank')}/name_synonyms.json", 'r'))
 
 
 def get_drug_synonyms(drug_name):
@@ -0,0 +1,280 @@
+"""
+Synthetic data for the agent tools, shaped like the real downloads.
+
+    <root>/drugbank/drugbank.csv, name_synonyms.json
+    <root>/hetionet/nx_graph.pkl          Hetionet-shaped graph (node kinds and
+                                          the filtered edge kinds of v1.0)
+    <root>/risk_model/trial_success.csv, drug_success_ratio.json,
+                      disease_success_ratio.json
+    <root>/enrollment/IQVIA_trial_outcomes.csv, trial_data.csv,
+                      embedding_model/    tiny random BERT (768-d, 1 layer)
+    <root>/manifest.json                  scale, counts and sample queries
+
+Point the tools at it with CLINICAL_AGENT_TOOLS_DATA=<root> and
+CLINICAL_AGENT_EMBEDDING_MODEL=<root>/enrollment/embedding_model.
+
+    cd models/algo && python -m benchmarks.fixtures --scale small --out /tmp/fixtures
+"""
+
+import argparse
+import json
+import os
+import pickle
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+VERSION = 1
+
+# "full" matches the real data: DrugBank 5.1, Hetionet v1.0, the IQVIA-labelled trials
+SCALES = {"small": 0.02, "medium": 0.2, "full": 1.0}
+FULL_DRUGS = 14000
+FULL_TRIALS = 17500
+ENROLLMENT_TRIALS = 300  # trial_data.csv is what the enrollment model trains on at first import
+
+NODE_KINDS = {
+    "gene": 20945, "biological process": 11381, "side effect": 5734, "molecular function": 2884,
+    "pathway": 1822, "compound": 1552, "cellular component": 1391, "symptom": 438,
+    "anatomy": 402, "pharmacologic class": 345, "disease": 137,
+}
+# the edge kinds kept by tools/hetionet (155,106 edges between these node kinds)
+EDGE_KINDS = [
+    ("causes", "compound", "side effect", 138944),
+    ("resembles", "compound", "compound", 6486),
+    ("localizes", "disease", "anatomy", 3602),
+    ("presents", "disease", "symptom", 3357),
+    ("includes", "pharmacologic class", "compound", 1029),
+    ("treats", "compound", "disease", 755),
+    ("resembles", "disease", "disease", 543),
+    ("palliates", "compound", "disease", 390),
+]
+
+PREFIXES = ["da", "ri", "lo", "me", "to", "va", "xe", "zo", "ce", "pra", "tri", "be", "flu", "ami", "cor",
+            "dex", "eso", "gli", "ke", "nal"]
+MIDDLES = ["sa", "to", "ne", "li", "ra", "mo", "qui", "ve", "de", "pi", "ta", "bu", "fe", "ni", "ro",
+           "ce", "zi", "ga", "lu", "xa"]
+SUFFIXES = ["tinib", "mab", "pril", "olol", "statin", "azole", "cillin", "vir", "mycin", "sartan",
+            "dipine", "oxetine", "parin", "tide", "zumab"]
+ADJECTIVES = ["chronic", "acute", "familial", "juvenile", "metastatic", "recurrent", "idiopathic", "refractory"]
+ORGANS = ["renal", "hepatic", "pulmonary", "cardiac", "gastric", "thyroid", "breast", "prostate", "colon",
+          "skin", "bone", "brain"]
+CONDITIONS = ["carcinoma", "failure", "fibrosis", "syndrome", "disease", "insufficiency", "lymphoma",
+              "inflammation", "hypertension", "neuropathy"]
+INCLUSION = ["age 18 to 75 years", "signed informed consent", "ecog performance status 0-1",
+             "adequate renal function", "adequate hepatic function", "measurable disease per recist 1.1",
+             "negative pregnancy test", "life expectancy of at least 12 weeks", "confirmed diagnosis"]
+EXCLUSION = ["pregnant or breastfeeding", "prior treatment with the study drug", "active infection",
+             "history of cardiac disease", "known hiv infection", "participation in another trial",
+             "uncontrolled hypertension", "major surgery within 4 weeks", "severe hepatic impairment"]
+OUTCOMES = {
+    "Completed, Positive outcome/primary endpoint(s) met": 1,
+    "Completed, Negative outcome/primary endpoint(s) not met": 0,
+    "Terminated, Lack of efficacy": 0,
+    "Terminated, Safety/adverse effects": 0,
+    "Terminated, Poor enrollment": 0,
+}
+
+
+def _sizes(scale):
+    f = SCALES[scale]
+    return {
+        "drugs": max(50, int(FULL_DRUGS * f)),
+        "trials": max(60, int(FULL_TRIALS * f)),
+        "nodes": {k: max(5, int(n * f)) for k, n in NODE_KINDS.items()},
+        "edges": [(kind, s, t, max(5, int(n * f))) for kind, s, t, n in EDGE_KINDS],
+    }
+
+
+def _unique_names(rng, n, make):
+    names, seen = [], set()
+    while len(names) < n:
+        name = make(rng)
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def _drug_name(rng):
+    parts = [rng.choice(PREFIXES)] + list(rng.choice(MIDDLES, rng.integers(1, 3))) + [rng.choice(SUFFIXES)]
+    return "".join(parts)
+
+
+def _disease_name(rng):
+    name = f"{rng.choice(ADJECTIVES)} {rng.choice(ORGANS)} {rng.choice(CONDITIONS)}"
+    return name if rng.random() < 0.5 else f"{name} type {rng.integers(1, 9)}"
+
+
+def _misspell(rng, name):
+    i = int(rng.integers(0, len(name)))
+    return name[:i] + rng.choice(list("aeioulnrst")) + name[i + 1:]
+
+
+def _criteria(rng):
+    inc = rng.choice(INCLUSION, rng.integers(2, 6), replace=False)
+    exc = rng.choice(EXCLUSION, rng.integers(2, 6), replace=False)
+    return "Inclusion Criteria:\n" + "\n".join(f"- {c}" for c in inc) + \
+        "\nExclusion Criteria:\n" + "\n".join(f"- {c}" for c in exc)
+
+
+def drugbank(rng, root, n):
+    names = _unique_names(rng, n, _drug_name)
+    df = pd.DataFrame({
+        "name": names,
+        "description": [f"{d} is a small molecule studied in {rng.choice(ORGANS)} conditions." for d in names],
+        "indication": [f"Indicated for {_disease_name(rng)}." for _ in names],
+        "smiles": ["C" * int(rng.integers(3, 12)) + "N(C)C(=O)O" for _ in names],
+        "absorption": [f"Bioavailability {rng.integers(10, 95)}%." for _ in names],
+        "distribution": [f"{rng.uniform(0.1, 5):.2f} L/kg" for _ in names],
+        "metabolism": [f"Hepatic via CYP{rng.choice(['3A4', '2D6', '2C9', '1A2'])}." for _ in names],
+        "excretion": [f"{rng.integers(20, 90)}% renal." for _ in names],
+        "toxicity": [f"LD50 {rng.integers(50, 5000)} mg/kg (rat, oral)." for _ in names],
+    })
+    os.makedirs(f"{root}/drugbank", exist_ok=True)
+    df.to_csv(f"{root}/drugbank/drugbank.csv", sep="\t", index=False)
+
+    # a third of the drugs get one or two brand names; every name maps to the whole group
+    taken = set(names)
+    synonyms = {}
+    for name in names:
+        group = [name]
+        if rng.random() < 1 / 3:
+            for brand in _unique_names(rng, int(rng.integers(1, 3)), lambda r: _drug_name(r)[::-1][:8]):
+                if brand not in taken:
+                    taken.add(brand)
+                    group.append(brand)
+        for member in group:
+            synonyms[member] = group
+    with open(f"{root}/drugbank/name_synonyms.json", "w") as f:
+        json.dump(synonyms, f)
+    return names, [s for s, group in synonyms.items() if s != group[0]]
+
+
+def hetionet(rng, root, sizes, drugs, diseases):
+    G = nx.Graph()
+    nodes = {}
+    for kind, n in sizes["nodes"].items():
+        if kind == "compound":
+            nodes[kind] = drugs[:n]
+        elif kind == "disease":
+            nodes[kind] = diseases[:n]
+        else:
+            nodes[kind] = [f"{kind} {i}" for i in range(n)]
+        G.add_nodes_from(nodes[kind], kind=kind)
+    for kind, source, target, n in sizes["edges"]:
+        src = rng.integers(0, len(nodes[source]), n)
+        dst = rng.integers(0, len(nodes[target]), n)
+        G.add_edges_from(((nodes[source][i], nodes[target][j]) for i, j in zip(src, dst) if
+                          nodes[source][i] != nodes[target][j]), kind=kind)
+    os.makedirs(f"{root}/hetionet", exist_ok=True)
+    with open(f"{root}/hetionet/nx_graph.pkl", "wb") as f:
+        pickle.dump(G, f)
+    return G, nodes
+
+
+def trials(rng, root, n, drugs, diseases):
+    quality = dict(zip(drugs, rng.normal(0, 1, len(drugs))))
+    rows, outcomes = [], []
+    for i in range(n):
+        nctid = f"NCT{i:08d}"
+        trial_drugs = list(rng.choice(drugs, rng.integers(1, 4), replace=False))
+        trial_diseases = list(rng.choice(diseases, rng.integers(1, 3), replace=False))
+        p = 1 / (1 + np.exp(-np.mean([quality[d] for d in trial_drugs])))
+        outcome = "Completed, Positive outcome/primary endpoint(s) met" if rng.random() < p else \
+            rng.choice([o for o, label in OUTCOMES.items() if label == 0])
+        rows.append((nctid, _criteria(rng), ";".join(trial_drugs), ";".join(trial_diseases), OUTCOMES[outcome]))
+        outcomes.append((nctid, outcome))
+    success = pd.DataFrame(rows, columns=["nctid", "criteria", "drugs", "diseases", "label"])
+
+    os.makedirs(f"{root}/risk_model", exist_ok=True)
+    success.to_csv(f"{root}/risk_model/trial_success.csv", sep="\t", index=False)
+    for column, filename in (("drugs", "drug_success_ratio.json"), ("diseases", "disease_success_ratio.json")):
+        exploded = success.assign(**{column: success[column].str.split(";")}).explode(column)
+        with open(f"{root}/risk_model/{filename}", "w") as f:
+            json.dump(exploded.groupby(column)["label"].mean().to_dict(), f)
+
+    # enrollment: label 1 = terminated for poor enrollment
+    os.makedirs(f"{root}/enrollment", exist_ok=True)
+    pd.DataFrame(outcomes, columns=["studyid", "trialOutcome"]).to_csv(
+        f"{root}/enrollment/IQVIA_trial_outcomes.csv", index=False)
+    enrollment = success.head(ENROLLMENT_TRIALS).copy()
+    poor = {nctid for nctid, o in outcomes if o == "Terminated, Poor enrollment"}
+    enrollment["label"] = enrollment["nctid"].isin(poor).astype(int)
+    enrollment.to_csv(f"{root}/enrollment/trial_data.csv", sep="\t", index=False)
+    return success
+
+
+def embedding_model(root, words, seed):
+    """A 768-d, one-layer random BERT with a word-level vocabulary, saved
+    where AutoModel / AutoTokenizer.from_pretrained can load it offline."""
+    import torch
+    from transformers import BertConfig, BertModel, BertTokenizer
+
+    path = f"{root}/enrollment/embedding_model"
+    os.makedirs(path, exist_ok=True)
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(set(words))
+    with open(f"{path}/vocab.txt", "w") as f:
+        f.write("\n".join(vocab) + "\n")
+    BertTokenizer(f"{path}/vocab.txt").save_pretrained(path)
+    torch.manual_seed(seed)
+    config = BertConfig(vocab_size=len(vocab), hidden_size=768, num_hidden_layers=1, num_attention_heads=12,
+                        intermediate_size=512, max_position_embeddings=512)
+    BertModel(config).save_pretrained(path)
+    return path
+
+
+def generate(root, scale="small", seed=0):
+    """Write a full fixture tree for `scale` under root; -> manifest dict."""
+    rng = np.random.default_rng(seed)
+    sizes = _sizes(scale)
+    drugs, brands = drugbank(rng, root, sizes["drugs"])
+    diseases = _unique_names(rng, max(sizes["nodes"]["disease"], 50), _disease_name)
+    G, nodes = hetionet(rng, root, sizes, drugs, diseases)
+    success = trials(rng, root, sizes["trials"], drugs, diseases)
+
+    words = " ".join(INCLUSION + EXCLUSION + ADJECTIVES + ORGANS + CONDITIONS + drugs[:2000] +
+                     ["inclusion", "exclusion", "criteria", "-", ":", ";", "type"] + [str(i) for i in range(100)])
+    embedding_model(root, words.replace(":", " ").replace("-", " ").split(), seed)
+
+    sample = lambda items, k=50: [str(x) for x in rng.choice(items, min(k, len(items)), replace=False)]
+    compounds = nodes["compound"]
+    manifest = {
+        "version": VERSION, "scale": scale, "seed": seed,
+        "counts": {"drugs": len(drugs), "synonyms": len(brands), "trials": len(success),
+                   "enrollment_trials": min(len(success), ENROLLMENT_TRIALS),
+                   "graph_nodes": G.number_of_nodes(), "graph_edges": G.number_of_edges()},
+        "queries": {
+            "drugs": sample(drugs),
+            "synonyms": sample(brands),
+            "misspelled": [_misspell(rng, d) for d in sample(drugs)],
+            "diseases": sample(diseases),
+            "graph_pairs": [[str(rng.choice(compounds)), str(rng.choice(nodes["disease"]))] for _ in range(50)],
+            "trials": success.sample(min(20, len(success)), random_state=seed)[["criteria", "drugs", "diseases"]]
+                             .values.tolist(),
+        },
+    }
+    with open(f"{root}/manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def ensure(root, scale="small", seed=0):
+    """The manifest of an up-to-date fixture tree at root, generating it if needed."""
+    try:
+        with open(f"{root}/manifest.json") as f:
+            manifest = json.load(f)
+        if (manifest["version"], manifest["scale"], manifest["seed"]) == (VERSION, scale, seed):
+            return manifest
+    except (OSError, ValueError, KeyError):
+        pass
+    return generate(root, scale, seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="generate synthetic agent-tool data")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    print(json.dumps(generate(args.out, args.scale, args.seed)["counts"], indent=2))
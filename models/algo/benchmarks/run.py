@@ -0,0 +1,230 @@
+"""
+Latency, throughput and peak memory of every agent tool on synthetic data.
+
+For each scale the fixtures are generated once (benchmarks/fixtures.py,
+cached under --fixtures), then every tool is measured in a fresh
+subprocess, so import time and peak RSS belong to that tool alone:
+
+    import_s                 importing the tool (loading its data / models)
+    latency_ms p50/p95/mean  per call, over a mix of exact, synonym and
+                             misspelled names (the Levenshtein fallback)
+    throughput_per_s         calls per second, sequential
+    peak_rss_mb              process peak, and its growth over the baseline
+
+Results go to <out>/<scale>.json together with the commit and the fixture
+sizes. They describe this machine, so they are not committed (results/ is
+git-ignored): keep the directory of an earlier run, and --compare prints the
+change against it.
+
+    cd models/algo && python -m benchmarks.run --scales small medium
+    python -m benchmarks.run --scales small --compare /path/to/old/results
+"""
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks import fixtures
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ALGO_DIR = os.path.dirname(HERE)
+TOOLS = ["match_name", "drugbank", "hetionet", "risk_model", "enrollment"]
+DEFAULT_FIXTURES = os.path.join(os.path.expanduser("~"), ".cache", "clinical_agent_fixtures")
+
+
+# ---------------- worker (one tool, one process) ----------------
+
+def _names(queries):
+    """Exact, synonym and misspelled names interleaved, so any prefix is a fair mix."""
+    kinds = [queries["drugs"], queries["synonyms"], queries["misspelled"]]
+    return [names[i] for i in range(max(map(len, kinds))) for names in kinds if i < len(names)]
+
+
+def _calls(tool, queries):
+    """(module to import, function building the call list from the module)."""
+    if tool == "match_name":
+        def build(module):
+            from utils import match_name
+            return [lambda n=n: match_name(n, module.drug_names) for n in _names(queries)]
+        return "agents.tools.drugbank", build
+    if tool == "drugbank":
+        return "agents.tools.drugbank", lambda m: [lambda n=n: m.retrieval_drugbank(n) for n in _names(queries)]
+    if tool == "hetionet":
+        return "agents.tools.hetionet", lambda m: [lambda p=p: m.retrieval_hetionet(*p) for p in queries["graph_pairs"]]
+    if tool == "risk_model":
+        return "agents.tools.risk_model", lambda m: [
+            lambda n=n, d=d: (m.get_drug_risk(n), m.get_disease_risk(d))
+            for n, d in zip(_names(queries), queries["diseases"] * 3)]
+    if tool == "enrollment":
+        return "agents.tools.enrollment", lambda m: [lambda t=t: m.get_enrollment_difficulty(*t)
+                                                     for t in queries["trials"]]
+    raise ValueError(f"unknown tool {tool}")
+
+
+def _rss_mb():
+    """Peak RSS of this process in MB. VmHWM, where available, starts afresh at
+    exec; ru_maxrss on Linux carries over the parent's peak from fork."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(tool, manifest, max_calls=200, budget_s=30.0):
+    baseline = _rss_mb()
+    module_name, build = _calls(tool, manifest["queries"])
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_s = time.perf_counter() - start
+    after_import = _rss_mb()
+
+    calls = build(module)
+    latencies, start = [], time.perf_counter()
+    while len(latencies) < max_calls and time.perf_counter() - start < budget_s:
+        call = calls[len(latencies) % len(calls)]
+        t = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+
+    latencies.sort()
+    pick = lambda q: 1000 * latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+    peak = _rss_mb()
+    return {
+        "import_s": import_s,
+        "calls": len(latencies),
+        "latency_ms": {"p50": pick(0.5), "p95": pick(0.95), "mean": 1000 * total / len(latencies)},
+        "throughput_per_s": len(latencies) / total,
+        "peak_rss_mb": peak,
+        "import_rss_mb": after_import - baseline,
+        "rss_growth_mb": peak - baseline,
+    }
+
+
+# ---------------- driver ----------------
+
+def _env(root):
+    env = dict(os.environ)
+    env["CLINICAL_AGENT_TOOLS_DATA"] = root
+    env["CLINICAL_AGENT_EMBEDDING_MODEL"] = os.path.join(root, "enrollment", "embedding_model")
+    env.setdefault("OPENAI_API_KEY", "benchmark")  # utils builds an OpenAI client at import; no request is made
+    return env
+
+
+# tool -> file its first import builds (a trained model, a converted graph)
+FIRST_IMPORT = {"enrollment": os.path.join("enrollment", "enrollment_model.pt"),
+                "hetionet": os.path.join("hetionet", "compact_graph", "meta.json")}
+
+
+def prepare(root, tools):
+    """Some tools build derived data on first import; do that once, outside
+    the measurements."""
+    for tool in tools:
+        if tool in FIRST_IMPORT and not os.path.exists(os.path.join(root, FIRST_IMPORT[tool])):
+            subprocess.run([sys.executable, "-c", f"import agents.tools.{tool}"], cwd=ALGO_DIR, env=_env(root),
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+
+def _commit():
+    """Short HEAD hash, with "-dirty" when models/algo has uncommitted changes."""
+    try:
+        git = lambda *args: subprocess.run(["git", *args], cwd=ALGO_DIR, capture_output=True, text=True,
+                                           check=True).stdout.strip()
+        return git("rev-parse", "--short", "HEAD") + ("-dirty" if git("status", "--porcelain", ".") else "")
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scale(scale, tools, fixtures_dir, max_calls, budget_s, timeout):
+    root = os.path.join(fixtures_dir, scale)
+    os.makedirs(root, exist_ok=True)
+    manifest = fixtures.ensure(root, scale)
+    prepare(root, tools)
+    report = {"scale": scale, "commit": _commit(), "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+              "fixture": manifest["counts"], "tools": {}}
+    for tool in tools:
+        with tempfile.NamedTemporaryFile(suffix=".json") as out:
+            cmd = [sys.executable, "-m", "benchmarks.run", "--worker", tool, "--fixture-root", root,
+                   "--calls", str(max_calls), "--budget", str(budget_s), "--worker-out", out.name]
+            try:
+                proc = subprocess.run(cmd, cwd=ALGO_DIR, env=_env(root), capture_output=True, text=True,
+                                      timeout=timeout)
+                if proc.returncode == 0:
+                    with open(out.name) as f:
+                        report["tools"][tool] = json.load(f)
+                else:
+                    report["tools"][tool] = {"error": proc.stderr.strip().splitlines()[-1:]}
+            except subprocess.TimeoutExpired:
+                report["tools"][tool] = {"error": f"timed out after {timeout}s"}
+        result = report["tools"][tool]
+        if "error" in result:
+            print(f"  {scale:>6} {tool:<11} ERROR {result['error']}")
+        else:
+            print(f"  {scale:>6} {tool:<11} import {result['import_s']:7.2f}s  "
+                  f"p50 {result['latency_ms']['p50']:9.2f}ms  p95 {result['latency_ms']['p95']:9.2f}ms  "
+                  f"{result['throughput_per_s']:9.1f}/s  peak {result['peak_rss_mb']:7.0f}MB")
+    return report
+
+
+def compare(old, new, threshold=0.2):
+    """Lines for every metric that got worse by more than `threshold`."""
+    lines = []
+    for tool, result in new["tools"].items():
+        before = old.get("tools", {}).get(tool)
+        if not before or "error" in before or "error" in result:
+            continue
+        for name, a, b in (("import_s", before["import_s"], result["import_s"]),
+                           ("p50_ms", before["latency_ms"]["p50"], result["latency_ms"]["p50"]),
+                           ("p95_ms", before["latency_ms"]["p95"], result["latency_ms"]["p95"]),
+                           ("peak_rss_mb", before["peak_rss_mb"], result["peak_rss_mb"])):
+            if a > 0 and (b - a) / a > threshold:
+                lines.append(f"{new['scale']}/{tool} {name}: {a:.3g} -> {b:.3g} (+{100 * (b - a) / a:.0f}%)")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="agent tool benchmarks on synthetic fixtures")
+    parser.add_argument("--scales", nargs="+", choices=fixtures.SCALES, default=["small", "medium"])
+    parser.add_argument("--tools", nargs="+", choices=TOOLS, default=TOOLS)
+    parser.add_argument("--calls", type=int, default=200, help="calls per tool (at most)")
+    parser.add_argument("--budget", type=float, default=30.0, help="seconds of calls per tool (at most)")
+    parser.add_argument("--timeout", type=int, default=1800, help="seconds per tool process")
+    parser.add_argument("--fixtures", default=DEFAULT_FIXTURES)
+    parser.add_argument("--out", default=os.path.join(HERE, "results"))
+    parser.add_argument("--compare", default=None, help="results directory of an earlier run")
+    parser.add_argument("--worker", choices=TOOLS, help=argparse.SUPPRESS)
+    parser.add_argument("--fixture-root", help=argparse.SUPPRESS)
+    parser.add_argument("--worker-out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        with open(os.path.join(args.fixture_root, "manifest.json")) as f:
+            result = measure(args.worker, json.load(f), args.calls, args.budget)
+        with open(args.worker_out, "w") as f:
+            json.dump(result, f)
+        sys.exit(0)
+
+    os.makedirs(args.out, exist_ok=True)
+    regressions = []
+    for scale in args.scales:
+        report = run_scale(scale, args.tools, args.fixtures, args.calls, args.budget, args.timeout)
+        with open(os.path.join(args.out, f"{scale}.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        old_path = os.path.join(args.compare, f"{scale}.json") if args.compare else None
+        if old_path and os.path.exists(old_path):
+            with open(old_path) as f:
+                regressions += compare(json.load(f), report)
+    if regressions:
+        print("regressions:\n  " + "\n  ".join(regressions))
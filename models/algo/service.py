@@ -0,0 +1,206 @@
+"""
+Trial-prediction service: solve_problem behind a bounded job queue.
+
+The agents and their tools (DrugBank, Hetionet graph, risk tables,
+enrollment model) are imported once at startup, so every job runs against
+warm models. Jobs run on a fixed pool of worker threads; when the queue is
+full new jobs are refused with 429 instead of piling up latency.
+
+    cd models/algo && uvicorn service:app --port 8010
+    SOLVE_WORKERS=2 SOLVE_QUEUE=32
+
+    POST /jobs                {"criteria", "drugs", "diseases"}  or {"problem"}
+    GET  /jobs/{id}           status and, once done, the verdict
+    GET  /jobs/{id}/events    server-sent events: queued, started,
+                              decomposed, subproblem (one per subproblem,
+                              with its partial result), final | error
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+WORKERS = int(os.getenv("SOLVE_WORKERS", "2"))
+MAX_PENDING = int(os.getenv("SOLVE_QUEUE", "32"))
+KEEP_FINISHED = 1000
+
+
+class TrialRequest(BaseModel):
+    criteria: Optional[str] = None
+    drugs: Optional[str] = None
+    diseases: Optional[str] = None
+    problem: Optional[str] = None
+
+
+class Job:
+    def __init__(self, problem):
+        self.id = uuid.uuid4().hex
+        self.problem = problem
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self.events = []
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def emit(self, event, payload):
+        """Record an event and hand it to every live subscriber (any thread)."""
+        with self._lock:
+            self.events.append((event, payload))
+            for loop, queue in self._subscribers:
+                loop.call_soon_threadsafe(queue.put_nowait, (event, payload))
+
+    def subscribe(self, loop):
+        """(events so far, queue of the ones to come), taken atomically."""
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.append((loop, queue))
+            return list(self.events), queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers = [(l, q) for l, q in self._subscribers if q is not queue]
+
+    def summary(self):
+        out = {"id": self.id, "status": self.status, "created": self.created}
+        if self.finished is not None:
+            out["elapsed_s"] = self.finished - self.created
+        if self.result is not None:
+            out["result"] = self.result
+        if self.error is not None:
+            out["error"] = self.error
+        return out
+
+
+class JobQueue:
+    """Bounded queue of solve_problem jobs on a fixed worker pool."""
+
+    def __init__(self, solve, workers=WORKERS, max_pending=MAX_PENDING):
+        self.solve = solve
+        self.max_pending = max_pending
+        self.jobs = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="solve")
+
+    def submit(self, problem):
+        """A queued Job, or None when the queue is full."""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                return None
+            self._pending += 1
+            job = Job(problem)
+            self.jobs[job.id] = job
+            self._evict()
+        job.emit("queued", {"id": job.id})
+        self._pool.submit(self._run, job)
+        return job
+
+    def _evict(self):
+        finished = [j for j in self.jobs.values() if j.done]
+        for job in sorted(finished, key=lambda j: j.finished)[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self.jobs[job.id]
+
+    def _run(self, job):
+        job.status = "running"
+        job.emit("started", {})
+        try:
+            job.result = self.solve(job.problem, on_progress=job.emit)
+            job.finished, job.status = time.time(), "done"
+        except Exception as e:
+            job.error = str(e)
+            job.finished, job.status = time.time(), "failed"
+            job.emit("error", {"error": job.error})
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+queue = None
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global queue
+    # importing solve_problem loads every agent tool (data files, graph, models) once
+    from solve_problem import solve_problem
+    queue = JobQueue(solve_problem)
+    yield
+    queue.close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+def _problem(request):
+    if request.problem:
+        return request.problem
+    if not (request.criteria and request.drugs and request.diseases):
+        raise HTTPException(422, "give either `problem` or all of `criteria`, `drugs` and `diseases`")
+    from solve_problem import build_problem
+    return build_problem(request.criteria, request.drugs, request.diseases)
+
+
+def _job(job_id):
+    job = queue.jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"unknown job {job_id}")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+def submit(request: TrialRequest):
+    job = queue.submit(_problem(request))
+    if job is None:
+        raise HTTPException(429, "job queue is full, retry later")
+    return {"id": job.id, "status": job.status}
+
+
+@app.get("/jobs/{job_id}")
+def status(job_id: str):
+    return _job(job_id).summary()
+
+
+def _sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+@app.get("/jobs/{job_id}/events")
+async def events(job_id: str):
+    job = _job(job_id)
+
+    async def stream():
+        past, pending = job.subscribe(asyncio.get_running_loop())
+        try:
+            for event, payload in past:
+                yield _sse(event, payload)
+                if event in ("final", "error"):
+                    return
+            while True:
+                event, payload = await pending.get()
+                yield _sse(event, payload)
+                if event in ("final", "error"):
+                    return
+        finally:
+            job.unsubscribe(pending)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
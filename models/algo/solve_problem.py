@@ -9,14 +9,34 @@ import sys
 sys.path.append(os.getcwd())
 
 from agents.reason_agent import decomposition
-from agents.utils import GPT_MODEL, exec_func, llm_request
+from agents.utils import GPT_MODEL, exec_func, llm_request, LOGGER, tool_data_dir
 from agents import clinical_agent
 
 import pandas as pd
 
 client = OpenAI()
 
-def solve_problem(user_problem):
+def build_problem(criteria, drugs, diseases):
+    return f'''
+        I have designed a clinical trial and hope you can help me predict whether this trial can pass.
+        #criteria#: {criteria}
+        #drugs#: {drugs}
+        #diseases#: {diseases}
+        '''
+
+def parse_verdict(text):
+    """'pass' / 'fail' from the `VERDICT:` line of the final answer, else 'unknown'."""
+    match = re.search(r"VERDICT:\s*\**\s*(PASS|FAIL)", text or "", re.IGNORECASE)
+    return match.group(1).lower() if match else "unknown"
+
+def solve_problem(user_problem, on_progress=None):
+    """Decompose, solve every subproblem with the clinical agent, then
+    conclude. `on_progress(event, payload)` is called after each step;
+    returns {"verdict", "answer", "subproblems": [{"problem", "solution"}]}."""
+    def progress(event, **payload):
+        if on_progress is not None:
+            on_progress(event, payload)
+
     agent_tools = [
         {
             "type": "function",
@@ -83,17 +103,19 @@ def solve_problem(user_problem):
 
     for idx, subproblem in enumerate(subproblems):
         LOGGER.log_with_depth(f"[PROBLEM]: {subproblem}")
+    progress("decomposed", subproblems=subproblems)
 
     problem_results = []
 
     clinicalAgent = clinical_agent.ClinicalAgent(user_problem)
 
-    for sub_problem in subproblems:
+    for idx, sub_problem in enumerate(subproblems):
         LOGGER.log_with_depth(f"\t[PROBLEM]: {sub_problem}...")
         response = clinicalAgent.request(f"The original user problem is: {user_problem}\nNow, please you solve this problem: {sub_problem}")
 
         LOGGER.log_with_depth(f"\t[SOLUTION]: {response}\n")
         problem_results.append(response)
+        progress("subproblem", index=idx, total=len(subproblems), problem=sub_problem, solution=response)
     
     messages = []
 
@@ -101,6 +123,7 @@ def solve_problem(user_problem):
         You are an expert in clinical trials. Based on the subproblems have solved, please solve the user's problem and provide the reason.
         Firstly, please give the final result of the user's problem, you must give a specific results, clear answer the user's problem.
         Secondly, please provide the reason step by step for the result.
+        Start your answer with a line that is exactly `VERDICT: PASS` or `VERDICT: FAIL`.
     '''
 
     messages.append({ "role": "system", "content": system_prompt})
@@ -109,10 +132,19 @@ def solve_problem(user_problem):
     messages.append({ "role": "user", "content": "Please solve the user's problem and provide the reason."})
 
     final_results = llm_request(messages)
+    answer = final_results.choices[0].message.content
     LOGGER.log_with_depth(f"Final results:\n")
-    LOGGER.log_with_depth(final_results.choices[0].message.content)
+    LOGGER.log_with_depth(answer)
     LOGGER.log_with_depth("\n===============================================\n\n")
 
+    result = {
+        "verdict": parse_verdict(answer),
+        "answer": answer,
+        "subproblems": [{"problem": p, "solution": s} for p, s in zip(subproblems, problem_results)],
+    }
+    progress("final", **result)
+    return result
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         LOGGER.log_with_depth("Error: Please provide the random_idx argument.")
@@ -121,8 +153,7 @@ if __name__ == "__main__":
     LOGGER.log_with_depth(f"Random Index: {sys.argv[1]}")
     random_idx = int(sys.argv[1])
 
-    cwd_path = os.getcwd()
-    trial_df = pd.read_csv(f"{cwd_path}/agents/tools/risk_model/data/trial_success.csv", sep='\t')
+    trial_df = pd.read_csv(f"{tool_data_dir('risk_model')}/trial_success.csv", sep='\t')
     trial_row = trial_df.iloc[random_idx]
 
     try:
@@ -132,16 +163,12 @@ if __name__ == "__main__":
         diseases = trial_row['diseases']
         label = trial_row['label']
 
-        user_problem = f'''
-        I have designed a clinical trial and hope you can help me predict whether this trial can pass.
-        #criteria#: {criteria}
-        #drugs#: {drugs}
-        #diseases#: {diseases}
-        '''
+        user_problem = build_problem(criteria, drugs, diseases)
 
         LOGGER.log_with_depth(f"NCTID: {nctid}\nUser problem:\n {user_problem}\n\n Correct Label: {label}, 1 means passed, 0 means not passed.\n")
 
-        solve_problem(user_problem)
+        result = solve_problem(user_problem)
+        LOGGER.log_with_depth(f"Verdict: {result['verdict']}")
 
         LOGGER.log_with_depth("\n\n\n\n\n\n\n\n")
     except Exception as e:
@@ -0,0 +1,113 @@
+"""Job queue of the trial-prediction service: bounded admission, failures,
+eviction and the event stream, with a stand-in for solve_problem.
+
+    cd models/algo && python -m pytest -q test_service.py
+"""
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import service
+from service import JobQueue
+
+
+class FakeSolve:
+    """Emits two subproblems and a final verdict; blocks until released."""
+
+    def __init__(self, fail_on=None):
+        self.release = threading.Event()
+        self.fail_on = fail_on
+        self.calls = []
+
+    def __call__(self, problem, on_progress):
+        self.calls.append(problem)
+        self.release.wait(5)
+        if problem == self.fail_on:
+            raise ValueError("no such drug")
+        on_progress("decomposed", {"subproblems": 2})
+        for i in range(2):
+            on_progress("subproblem", {"index": i, "result": f"{problem}-{i}"})
+        on_progress("final", {"verdict": "success"})
+        return {"verdict": "success", "problem": problem}
+
+
+def _wait(job, timeout=5):
+    deadline = time.time() + timeout
+    while not job.done:
+        assert time.time() < deadline, f"job {job.id} still {job.status}"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def solve():
+    solve = FakeSolve(fail_on="bad")
+    yield solve
+    solve.release.set()
+
+
+def test_full_queue_refuses_until_jobs_finish(solve):
+    queue = JobQueue(solve, workers=1, max_pending=2)
+    first, second = queue.submit("a"), queue.submit("b")
+    assert first and second and queue.submit("c") is None
+    solve.release.set()
+    _wait(first), _wait(second)
+    third = queue.submit("c")
+    _wait(third)
+    assert [j.status for j in (first, second, third)] == ["done"] * 3
+    assert third.result == {"verdict": "success", "problem": "c"}
+    assert [e for e, _ in first.events] == ["queued", "started", "decomposed", "subproblem", "subproblem", "final"]
+    queue.close()
+
+
+def test_failed_job_reports_its_error_and_frees_its_slot(solve):
+    queue = JobQueue(solve, workers=1, max_pending=1)
+    solve.release.set()
+    job = queue.submit("bad")
+    _wait(job)
+    assert job.status == "failed" and job.error == "no such drug"
+    assert job.events[-1] == ("error", {"error": "no such drug"})
+    assert job.summary()["error"] == "no such drug" and "elapsed_s" in job.summary()
+    _wait(queue.submit("a"))
+    queue.close()
+
+
+def test_finished_jobs_are_evicted_oldest_first(solve, monkeypatch):
+    monkeypatch.setattr(service, "KEEP_FINISHED", 2)
+    queue = JobQueue(solve, workers=1, max_pending=8)
+    solve.release.set()
+    jobs = []
+    for name in "abcd":
+        jobs.append(queue.submit(name))
+        _wait(jobs[-1])
+    assert set(queue.jobs) == {j.id for j in jobs[1:]}    # the newest job is still running when evicting
+    queue.close()
+
+
+@pytest.fixture
+def client(solve, monkeypatch):
+    # no `with TestClient(...)`: the lifespan would import the real solve_problem
+    queue = JobQueue(solve, workers=1, max_pending=1)
+    monkeypatch.setattr(service, "queue", queue)
+    yield TestClient(service.app)
+    queue.close()
+
+
+def test_http_submit_status_and_events(client, solve):
+    response = client.post("/jobs", json={"problem": "p"})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert client.post("/jobs", json={"problem": "q"}).status_code == 429
+    solve.release.set()
+    body = client.get(f"/jobs/{job_id}/events").text
+    events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+    assert events == ["queued", "started", "decomposed", "subproblem", "subproblem", "final"]
+    _wait(service.queue.jobs[job_id])
+    assert client.get(f"/jobs/{job_id}").json()["result"] == {"verdict": "success", "problem": "p"}
+
+
+def test_http_errors(client):
+    assert client.get("/jobs/nope").status_code == 404
+    assert client.get("/jobs/nope/events").status_code == 404
+    assert client.post("/jobs", json={"drugs": "aspirin"}).status_code == 422
@@ -16,6 +16,10 @@ import pprint
 import client
 import torch.optim as optim
 import math
+from privacy_accountant import IncrementalRDPAccountant
+from index_sampler import MemmapBatchSampler, save_index_file
+from func_dp import FuncDPSGD
+from fedavg import average_state_into, publish_aggregate_state
 
 
 # seed = 0
@@ -27,6 +31,25 @@ import math
 torch.backends.cudnn.benchmark = True
 
 
+def _snapshot_into(obj, buffers, path):
+    """Copy the tensors of a nested state into reusable `buffers`. A
+    state_dict's `_metadata` (module versions, read by load_state_dict) is
+    carried over."""
+    if torch.is_tensor(obj):
+        buf = buffers.get(path)
+        if buf is None or buf.shape != obj.shape or buf.dtype != obj.dtype:
+            buf = buffers[path] = torch.empty_like(obj)
+        return buf.copy_(obj)
+    if isinstance(obj, dict):
+        out = type(obj)((k, _snapshot_into(v, buffers, f"{path}.{k}")) for k, v in obj.items())
+        if hasattr(obj, "_metadata"):
+            out._metadata = copy.deepcopy(obj._metadata)
+        return out
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_snapshot_into(v, buffers, f"{path}.{i}") for i, v in enumerate(obj))
+    return copy.copy(obj)
+
+
 class Client:
     def __init__(self, client_id, args, sequence=None):
         self.client_id = client_id
@@ -61,52 +84,95 @@ class Client:
             self.scheduler = None
         _, self.testloader, self.private_trainset, self.testset = \
             client.get_private_trainloader_and_public_testloader(args, client_id)
+        self.criterion = client.get_loss_func(args)
+        # 'opacus': Opacus 0.15 hooks; 'func': vectorised torch.func per-sample grads
+        self.dp_engine = getattr(args, "dp_engine", "opacus").lower()
+        self.func_dp = None
+        self.privacy_engine = None
         if self.dp:
-            from opacus import PrivacyEngine  # Opacus 0.15.0 needed.
             self.net.train()
             self.target_budget = args.target_budget
             self.target_delta = min(args.delta, 1 / (len(self.private_trainset) * 1.1))
-            self.privacy_engine = PrivacyEngine(self.net, batch_size=min(self.batch_size, self.private_trainset.__len__()),
-                                           sample_size=self.private_trainset.__len__(),
-                                           alphas=[1 + x / 10. for x in range(1, 100)] + list(range(12, 64)),
-                                           # alphas is the orders for renyi DP
-                                           noise_multiplier=self.noise_multiplier,
-                                           max_grad_norm=self.max_grad_norm,
-                                           target_delta=self.target_delta)  # max_grad_norm can be changed.
-            self.privacy_engine.attach(self.optimizer)
-        else:
-            self.privacy_engine = None
-        self.criterion = client.get_loss_func(args)
+            expected_batch_size = min(self.batch_size, self.private_trainset.__len__())
+            alphas = [1 + x / 10. for x in range(1, 100)] + list(range(12, 64))  # orders for renyi DP
+            if self.dp_engine == "func":
+                self.func_dp = FuncDPSGD(self.net,
+                                         lambda outputs, labels: utils.get_loss(outputs, labels, self.criterion,
+                                                                                self.dataset, self.device),
+                                         max_grad_norm=self.max_grad_norm,
+                                         noise_multiplier=self.noise_multiplier,
+                                         expected_batch_size=expected_batch_size)
+                self.accountant = IncrementalRDPAccountant(expected_batch_size / self.private_trainset.__len__(),
+                                                           self.noise_multiplier, alphas, self.target_delta)
+            else:
+                from opacus import PrivacyEngine  # Opacus 0.15.0 needed.
+                self.privacy_engine = PrivacyEngine(self.net, batch_size=expected_batch_size,
+                                               sample_size=self.private_trainset.__len__(),
+                                               alphas=alphas,
+                                               noise_multiplier=self.noise_multiplier,
+                                               max_grad_norm=self.max_grad_norm,
+                                               target_delta=self.target_delta)  # max_grad_norm can be changed.
+                self.privacy_engine.attach(self.optimizer)
+                # per-step RDP computed once; budget checks are then a vector add + min
+                self.accountant = IncrementalRDPAccountant.from_privacy_engine(self.privacy_engine)
         # self.get_private_trainloader(sequence=sequence)
 
     def load_aggregate_state(self, aggregate_state):
+        # load_state_dict copy_()s into the existing parameters, so the
+        # aggregate (published once via publish_aggregate_state) is only
+        # read, never duplicated per client.
         if isinstance(aggregate_state, str):
             state = torch.load(aggregate_state, map_location=self.device)
-            self.net.load_state_dict(state)
         elif isinstance(aggregate_state, OrderedDict):
-            self.net.load_state_dict(copy.deepcopy(aggregate_state))
+            state = aggregate_state
         elif isinstance(aggregate_state, torch.nn.Module):
-            self.net.load_state_dict(copy.deepcopy(aggregate_state.state_dict()))
+            state = aggregate_state.state_dict()
         elif isinstance(aggregate_state, dict):
-            self.net.load_state_dict(copy.deepcopy(aggregate_state["net"]))
+            state = aggregate_state["net"]
         else:
             raise NotImplementedError("aggregate_state type not recognized")
+        self.net.load_state_dict(state)
 
     def get_private_trainloader(self, from_global_epoch=0, sequence=None,):
-        if sequence is None:
-            sequence = utils.get_or_load_sequence(self.batch_size, self.private_trainset.__len__(),
-                                                  self.args.num_local_client_epoch,
-                                                  f"{self.args.save_dir}/clients/g{from_global_epoch}/c{self.client_id}/",
-                                                  drop_last=self.dp)
-        try:
-            sequence = np.concatenate(sequence)
-        except ValueError:
-            pass
-        subset = torch.utils.data.Subset(self.private_trainset, sequence)
-        self.train_loader = torch.utils.data.DataLoader(subset, batch_size=self.batch_size,
-                                                  num_workers=self.args.num_workers, pin_memory=True)
-
-    def save(self,):
+        # the deterministic per-epoch sequence lives in a memory-mapped .npy;
+        # one long-lived loader with persistent workers is re-pointed at it
+        sequence_dir = f"{self.args.save_dir}/clients/g{from_global_epoch}/c{self.client_id}/"
+        index_path = os.path.join(sequence_dir, "sequence.npy")
+        if sequence is not None or not os.path.exists(index_path):
+            if sequence is None:
+                sequence = utils.get_or_load_sequence(self.batch_size, self.private_trainset.__len__(),
+                                                      self.args.num_local_client_epoch,
+                                                      sequence_dir,
+                                                      drop_last=self.dp)
+            try:
+                sequence = np.concatenate(sequence)
+            except ValueError:
+                pass
+            save_index_file(sequence, index_path)
+
+        if getattr(self, "train_sampler", None) is not None:
+            self.train_sampler.set_source(index_path)
+            return
+        self.train_sampler = MemmapBatchSampler(index_path, self.batch_size)
+        num_workers = self.args.num_workers
+        loader_kwargs = {}
+        if num_workers > 0:
+            loader_kwargs = dict(persistent_workers=True,
+                                 prefetch_factor=getattr(self.args, "prefetch_factor", 4))
+        self.train_loader = torch.utils.data.DataLoader(self.private_trainset, batch_sampler=self.train_sampler,
+                                                        num_workers=num_workers, pin_memory=True,
+                                                        **loader_kwargs)
+
+    def save(self, mode="copy"):
+        """Client state for the server.
+
+        mode="copy" (default): an independent deep copy.
+        mode="buffers": copied into buffers owned by this client and reused
+            across rounds (allocated once); valid until the next save().
+            run_round uses it.
+        """
+        if mode not in ("copy", "buffers"):
+            raise ValueError(f"unknown save mode {mode!r}")
         net_state_dict = self.net.state_dict()
 
         state = {'net': net_state_dict,
@@ -114,14 +180,26 @@ class Client:
                  }
         if self.scheduler is not None:
             state['scheduler'] = self.scheduler.state_dict()
-        if self.privacy_engine is not None:
-            state["privacy_engine"] = self.privacy_engine.state_dict()
-            state["eps"], state["best_alpha"] = self.privacy_engine.get_privacy_spent()
+        if self.dp:
+            dp_state = self.privacy_engine if self.privacy_engine is not None else self.func_dp
+            state["privacy_engine"] = dp_state.state_dict()
+            state["eps"], state["best_alpha"] = self.accountant.get_privacy_spent(self.dp_steps)
             state["delta"] = self.target_delta
 
-        return copy.deepcopy(state)
+        if mode == "copy":
+            return copy.deepcopy(state)
+        if not hasattr(self, "_snapshot_buffers"):
+            self._snapshot_buffers = {}
+        return _snapshot_into(state, self._snapshot_buffers, "")
 
 
+    @property
+    def dp_steps(self):
+        """Noisy optimizer steps taken so far, whichever DP engine is used."""
+        if self.func_dp is not None:
+            return self.func_dp.steps
+        return self.privacy_engine.steps
+
     def train_step(self, batch_idx, data):
         inputs, labels = utils.get_batch_data(data, self.dataset, self.device)
         if not self.dp:
@@ -130,6 +208,13 @@ class Client:
             loss.backward()
             self.optimizer.step()
             self.optimizer.zero_grad()
+        elif self.func_dp is not None:
+            # per-sample grads of a whole physical batch in one vmap call
+            for start_ind in range(0, len(inputs), self.physical_batch_size):
+                input_temp = inputs[start_ind: start_ind + self.physical_batch_size].to(self.device)
+                label_temp = labels[start_ind: start_ind + self.physical_batch_size].to(self.device)
+                self.func_dp.accumulate(input_temp, label_temp)
+            self.func_dp.step(self.optimizer)
         else:
             for num_pseudo_batch in range(math.ceil(len(inputs)/self.physical_batch_size)):
                 torch.cuda.empty_cache()
@@ -153,23 +238,22 @@ class Client:
         if self.freeze_running_stats:
             custom_model.freeze_bn(self.net)
         self.optimizer.zero_grad()
+        if self.dp:
+            # one optimizer step per batch: how many batches still fit the budget
+            remaining_steps = self.accountant.remaining_steps(self.dp_steps, self.target_budget)
         for batch_idx, data in enumerate(self.train_loader, 0):
-            if self.dp:
-                self.optimizer.privacy_engine.steps += 1
-                next_epsilon, _ = self.optimizer.privacy_engine.get_privacy_spent()
-                self.optimizer.privacy_engine.steps -= 1
-                if next_epsilon >= self.target_budget:
-                    print("privacy budget would exceed if train for another step. break")
-                    break
+            if self.dp and batch_idx >= remaining_steps:
+                print("privacy budget would exceed if train for another step. break")
+                break
             self.train_step(batch_idx, data)
         if self.scheduler is not None:
             self.scheduler.step()
         if self.dp:
-            epsilon, best_alpha = self.optimizer.privacy_engine.get_privacy_spent()
+            epsilon, best_alpha = self.accountant.get_privacy_spent(self.dp_steps)
             print(f"clipping norm {self.max_grad_norm} || "
                   f"noise {self.noise_multiplier} || "
                   f"eps {epsilon} and best alpha {best_alpha} || "
-                  f"steps: {self.optimizer.privacy_engine.state_dict()['steps']}")
+                  f"steps: {self.dp_steps}")
             torch.cuda.empty_cache()
 
     def validate(self):
@@ -209,3 +293,26 @@ class Client:
         else:
             data = None
         return data
+
+
+def run_round(clients, aggregate, epoch):
+    """One FedAvg round over in-process clients without per-client copies of
+    the model: `aggregate` (from publish_aggregate_state) is loaded by every
+    client with copy_, each client hands back a snapshot in its own reused
+    buffers, and the sample-weighted mean of the nets is written back into
+    `aggregate` in place.  Returns the client states (valid until the next
+    round), e.g. for their eps.
+
+        aggregate = publish_aggregate_state(clients[0].net.state_dict())
+        for epoch in range(rounds):
+            states = run_round(clients, aggregate, epoch)
+    """
+    states, weights = [], []
+    for c in clients:
+        c.load_aggregate_state(aggregate)
+        c.get_private_trainloader(epoch)
+        c.train(epoch)
+        states.append(c.save(mode="buffers"))
+        weights.append(len(c.private_trainset))
+    average_state_into(aggregate, [s["net"] for s in states], weights)
+    return states
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+# -----------------------  Streaming weighted FedAvg  -------------------------
+#  Every client model is re-backed by ONE contiguous parameter buffer, so the
+#  whole model can be read, accumulated and overwritten with a single tensor
+#  op.  The aggregator keeps one running fp32 sum (O(model) memory, however
+#  many clients) and folds each client in as soon as it finishes its round.
+# -----------------------------------------------------------------------------
+from collections import OrderedDict
+
+import torch
+import torch.nn as nn
+
+
+def flatten_parameters_(module: nn.Module) -> torch.Tensor:
+    """Move the trainable parameters of `module` into one contiguous buffer
+    and turn each parameter into a view of it.  Returns the buffer.
+
+    Call it before the optimizer creates any state.  Frozen parameters are
+    left alone – they are identical on every client and need no averaging.
+    """
+    params = [p for p in module.parameters() if p.requires_grad]
+    assert params, "module has no trainable parameters"
+    dtype, device = params[0].dtype, params[0].device
+    assert all(p.dtype == dtype and p.device == device for p in params), \
+        "flat buffer needs a single dtype/device"
+    flat = torch.empty(sum(p.numel() for p in params), dtype=dtype, device=device)
+    offset = 0
+    with torch.no_grad():
+        for p in params:
+            n = p.numel()
+            flat[offset:offset + n].copy_(p.reshape(-1))
+            p.data = flat[offset:offset + n].view_as(p)
+            offset += n
+    module._flat_params = flat
+    return flat
+
+
+def flat_parameters(module: nn.Module) -> torch.Tensor:
+    flat = getattr(module, "_flat_params", None)
+    return flat if flat is not None else flatten_parameters_(module)
+
+
+class StreamingFedAvg:
+    """Sample-count weighted FedAvg over flat parameter buffers.
+
+        agg = StreamingFedAvg(client_nets[0])
+        for each client:  train ...; agg.add(net, len(dataset))
+        agg.broadcast(client_nets)
+    """
+    def __init__(self, like: nn.Module):
+        ref = flat_parameters(like)
+        self._sum = torch.zeros_like(ref, dtype=torch.float32)
+        self._weight = 0.0
+
+    def add(self, module: nn.Module, n_samples: int):
+        flat = flat_parameters(module)
+        assert flat.numel() == self._sum.numel(), "client model layout differs"
+        self._sum.add_(flat.detach(), alpha=float(n_samples))
+        self._weight += float(n_samples)
+
+    def average(self) -> torch.Tensor:
+        assert self._weight > 0, "no client updates accumulated"
+        return self._sum / self._weight
+
+    @torch.no_grad()
+    def broadcast(self, modules):
+        """Write the weighted average into every module and reset."""
+        avg = self.average()
+        for m in modules:
+            flat_parameters(m).copy_(avg)
+        self.reset()
+
+    def reset(self):
+        self._sum.zero_()
+        self._weight = 0.0
+
+
+# ---------------------  Shared aggregate for in-process clients  -------------
+#  publish_aggregate_state() puts the global state_dict into shared memory
+#  once; every client loads it with load_state_dict (a copy_ into its own
+#  parameters) and average_state_into() overwrites it in place at the end of
+#  the round, so no round allocates another copy of the aggregate.
+# -----------------------------------------------------------------------------
+def publish_aggregate_state(state):
+    """A shared-memory CPU copy of `state` (a state_dict), made once."""
+    out = OrderedDict((k, v.detach().to("cpu", copy=True).share_memory_()) for k, v in state.items())
+    if hasattr(state, "_metadata"):
+        out._metadata = state._metadata
+    return out
+
+
+@torch.no_grad()
+def average_state_into(aggregate, states, weights):
+    """aggregate <- sum(w_i * state_i) / sum(w), in place.  Integer entries
+    (e.g. BatchNorm's num_batches_tracked) are taken from the first state."""
+    total = float(sum(weights))
+    assert total > 0, "no client updates to average"
+    for k, dst in aggregate.items():
+        if dst.is_floating_point():
+            dst.zero_()
+            for state, w in zip(states, weights):
+                dst.add_(state[k].to(dst.device, dst.dtype), alpha=float(w) / total)
+        else:
+            dst.copy_(states[0][k])
+    return aggregate
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# ----------------------  Round-level async checkpointing  --------------------
+#  save() snapshots the given states to CPU on the caller's thread (cheap,
+#  consistent) and hands them to a background writer, so training goes on
+#  while the file is serialised.  Each round is one safetensors file, written
+#  to a temp name and atomically renamed: a `round_XXXX.safetensors` on disk
+#  is always complete, and the newest one is what --resume picks up.
+#
+#  Arbitrary state_dicts (optimizer states included) are split into a flat
+#  {key: tensor} map plus a JSON skeleton kept in the safetensors metadata.
+#  rng_state()/set_rng_state() cover every generator a round draws from
+#  (torch CPU + CUDA, numpy, python), so a resumed run replays the same
+#  shuffles and dropout masks.
+# -----------------------------------------------------------------------------
+import os, re, json, queue, random, threading, numpy as np, torch
+from safetensors.torch import save_file, safe_open
+
+_ROUND_FILE = re.compile(r"^round_(\d+)\.safetensors$")
+
+
+def _pack(obj, tensors, path):
+    """Nested state -> JSON-able skeleton; tensors are moved into `tensors`."""
+    if torch.is_tensor(obj):
+        tensors[path] = obj.detach().to("cpu", copy=True).contiguous()
+        return {"__tensor__": path}
+    if isinstance(obj, dict):
+        return {"__dict__": [[k, _pack(v, tensors, f"{path}.{k}")] for k, v in obj.items()]}
+    if isinstance(obj, (list, tuple)):
+        return {"__list__": [_pack(v, tensors, f"{path}.{i}") for i, v in enumerate(obj)],
+                "tuple": isinstance(obj, tuple)}
+    return obj                                  # int / float / str / bool / None
+
+
+def _unpack(node, tensors):
+    if isinstance(node, dict):
+        if "__tensor__" in node:
+            return tensors[node["__tensor__"]]
+        if "__dict__" in node:
+            return {k: _unpack(v, tensors) for k, v in node["__dict__"]}
+        if "__list__" in node:
+            items = [_unpack(v, tensors) for v in node["__list__"]]
+            return tuple(items) if node["tuple"] else items
+    return node
+
+
+def rng_state():
+    """Snapshot of the torch (CPU + every CUDA device), numpy and python RNGs."""
+    _, np_keys, np_pos, np_gauss, np_cached = np.random.get_state()
+    py_version, py_internal, py_gauss = random.getstate()
+    return {
+        "torch":  torch.get_rng_state(),
+        "cuda":   torch.cuda.get_rng_state_all() if torch.cuda.is_available() else [],
+        "numpy":  {"keys": torch.from_numpy(np_keys.astype(np.int64)), "pos": int(np_pos),
+                   "has_gauss": int(np_gauss), "cached_gaussian": float(np_cached)},
+        "python": {"version": py_version, "internal": torch.tensor(py_internal, dtype=torch.int64),
+                   "gauss": py_gauss},
+    }
+
+
+def set_rng_state(state):
+    """Restore a rng_state() snapshot. A bare tensor (older checkpoints) only
+    restores the torch CPU generator."""
+    if torch.is_tensor(state):
+        torch.set_rng_state(state)
+        return
+    torch.set_rng_state(state["torch"])
+    if state["cuda"] and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+    np_state = state["numpy"]
+    np.random.set_state(("MT19937", np_state["keys"].numpy().astype(np.uint32), np_state["pos"],
+                         np_state["has_gauss"], np_state["cached_gaussian"]))
+    py_state = state["python"]
+    random.setstate((py_state["version"], tuple(py_state["internal"].tolist()), py_state["gauss"]))
+
+
+def latest_checkpoint(ckpt_dir):
+    """Path of the newest complete round checkpoint, or None."""
+    if not os.path.isdir(ckpt_dir):
+        return None
+    rounds = [(int(m.group(1)), f) for f in os.listdir(ckpt_dir)
+              if (m := _ROUND_FILE.match(f))]
+    return os.path.join(ckpt_dir, max(rounds)[1]) if rounds else None
+
+
+def load_checkpoint(path, device="cpu"):
+    """-> (round_idx, states) as passed to AsyncCheckpointer.save."""
+    with safe_open(path, framework="pt", device=str(device)) as f:
+        meta    = f.metadata()
+        tensors = {k: f.get_tensor(k) for k in f.keys()}
+    return int(meta["round"]), _unpack(json.loads(meta["skeleton"]), tensors)
+
+
+class AsyncCheckpointer:
+    """Writes one checkpoint per round from a background thread.
+
+    At most one snapshot waits behind the one being written, so a slow disk
+    throttles training instead of piling up copies of the model in memory.
+    """
+    def __init__(self, ckpt_dir, keep=2):
+        os.makedirs(ckpt_dir, exist_ok=True)
+        self.ckpt_dir = ckpt_dir
+        self.keep     = keep
+        self._queue   = queue.Queue(maxsize=1)
+        self._error   = None
+        self._thread  = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def save(self, round_idx, states: dict):
+        self._raise_pending()
+        tensors  = {}
+        skeleton = _pack(states, tensors, "s")
+        self._queue.put((round_idx, tensors, skeleton))
+
+    def wait(self):
+        """Block until every queued checkpoint is on disk."""
+        self._queue.join()
+        self._raise_pending()
+
+    def close(self):
+        self.wait()
+        self._queue.put(None)
+        self._thread.join()
+
+    def _raise_pending(self):
+        if self._error is not None:
+            err, self._error = self._error, None
+            raise RuntimeError("background checkpoint write failed") from err
+
+    def _writer(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                round_idx, tensors, skeleton = item
+                final = os.path.join(self.ckpt_dir, f"round_{round_idx:04d}.safetensors")
+                tmp   = final + ".tmp"
+                save_file(tensors, tmp, metadata={"round": str(round_idx),
+                                                  "skeleton": json.dumps(skeleton)})
+                os.replace(tmp, final)
+                self._prune()
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _prune(self):
+        rounds = sorted(f for f in os.listdir(self.ckpt_dir) if _ROUND_FILE.match(f))
+        for f in rounds[:-self.keep] if self.keep else []:
+            os.remove(os.path.join(self.ckpt_dir, f))
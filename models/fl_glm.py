@@ -1,4 +1,5 @@
 from collections import OrderedDict
+import argparse
 import warnings
 
 import flwr as fl
@@ -6,6 +7,8 @@ import torch
 from torch.utils.data import DataLoader, TensorDataset
 from transformers import AutoTokenizer, AutoModelForMaskedLM, AdamW
 
+from fl_checkpoint import AsyncCheckpointer, latest_checkpoint, load_checkpoint
+
 # Suppress warnings
 warnings.filterwarnings("ignore", category=UserWarning)
 
@@ -17,9 +20,24 @@ model = AutoModelForMaskedLM.from_pretrained(MODEL_NAME)
 # Define the device
 DEVICE = torch.device("cuda:0" if torch.cuda.is_available() else "cpu")
 
+def mask_tokens(texts, generator=None):
+    """Tokenize and randomly mask 15% of the tokens for masked language modeling."""
+    inputs = tokenizer(texts, return_tensors='pt', max_length=512, truncation=True, padding='max_length')
+    inputs['labels'] = inputs.input_ids.detach().clone()
+    # Create masks for masked language modeling
+    rand = torch.rand(inputs.input_ids.shape, generator=generator)
+    mask_arr = (rand < 0.15) * (inputs.input_ids != 101) * (inputs.input_ids != 102)
+    selection = []
+    for i in range(inputs.input_ids.shape[0]):
+        selection.append(torch.flatten(mask_arr[i].nonzero()).tolist())
+    for i in range(inputs.input_ids.shape[0]):
+        inputs.input_ids[i, selection[i]] = 103
+    return TensorDataset(inputs.input_ids, inputs.attention_mask, inputs.labels)
+
 def simulate_clinical_data(num_clients: int):
     """
-    Simulates a small clinical dataset distributed among clients.
+    Simulates a small clinical dataset distributed among clients, with a
+    held-out validation split per client.
     In a real-world scenario, this data would already exist on each client's server.
     """
     # Dummy clinical notes
@@ -28,29 +46,29 @@ def simulate_clinical_data(num_clients: int):
         "client_2": ["Patient has a history of hypertension and diabetes.", "Prescribed metformin for glucose control."],
         "client_3": ["Routine check-up shows normal sinus rhythm.", "Advised to continue with a healthy diet and exercise."]
     }
+    # Held-out notes, never trained on
+    client_val_data = {
+        "client_1": ["Chest x-ray shows signs of pneumonia.", "Fever resolved after antibiotics."],
+        "client_2": ["Blood pressure remains elevated despite medication.", "HbA1c improved to seven percent."],
+        "client_3": ["Electrocardiogram within normal limits.", "Patient reports regular physical activity."]
+    }
 
-    # Tokenize the data
-    tokenized_data = {}
-    for client_id, texts in client_data.items():
-        inputs = tokenizer(texts, return_tensors='pt', max_length=512, truncation=True, padding='max_length')
-        inputs['labels'] = inputs.input_ids.detach().clone()
-        # Create masks for masked language modeling
-        rand = torch.rand(inputs.input_ids.shape)
-        mask_arr = (rand < 0.15) * (inputs.input_ids != 101) * (inputs.input_ids != 102)
-        selection = []
-        for i in range(inputs.input_ids.shape[0]):
-            selection.append(torch.flatten(mask_arr[i].nonzero()).tolist())
-        for i in range(inputs.input_ids.shape[0]):
-            inputs.input_ids[i, selection[i]] = 103
-        tokenized_data[client_id] = TensorDataset(inputs.input_ids, inputs.attention_mask, inputs.labels)
-
-    # Create DataLoaders
+    # Create DataLoaders; the validation masks are fixed so rounds are comparable
     client_dataloaders = {}
-    for client_id, dataset in tokenized_data.items():
-        client_dataloaders[client_id] = DataLoader(dataset, batch_size=2, shuffle=True)
+    for client_id, texts in client_data.items():
+        trainloader = DataLoader(mask_tokens(texts), batch_size=2, shuffle=True)
+        val_generator = torch.Generator().manual_seed(int(client_id.split("_")[1]))
+        valloader = DataLoader(mask_tokens(client_val_data[client_id], val_generator), batch_size=32)
+        client_dataloaders[client_id] = (trainloader, valloader)
 
     return client_dataloaders
 
+def weighted_average(metrics):
+    """Sample-weighted mean of every metric the clients report."""
+    total = sum(n for n, _ in metrics)
+    keys = set().union(*(m.keys() for _, m in metrics)) if metrics else set()
+    return {k: sum(n * m[k] for n, m in metrics if k in m) / total for k in keys}
+
 class ClinicalNlpClient(fl.client.NumPyClient):
     """A Flower client for training a language model on clinical data."""
     def __init__(self, model, trainloader, valloader):
@@ -93,35 +111,76 @@ class ClinicalNlpClient(fl.client.NumPyClient):
         self.set_parameters(parameters)
         self.model.to(DEVICE)
         self.model.eval()
-        loss = 0
-        with torch.no_grad():
+        loss_sum, n = 0.0, 0
+        with torch.inference_mode():
             for batch in self.valloader:
                 input_ids, attention_mask, labels = [t.to(DEVICE) for t in batch]
                 outputs = self.model(input_ids=input_ids, attention_mask=attention_mask, labels=labels)
-                loss += outputs.loss.item()
-        return loss / len(self.valloader), len(self.valloader.dataset), {"loss": loss}
+                loss_sum += outputs.loss.item() * input_ids.size(0)
+                n += input_ids.size(0)
+        loss = loss_sum / n
+        return loss, n, {"loss": loss}
 
 def client_fn(cid: str):
     """Create a Flower client representing a single hospital."""
     client_dataloaders = simulate_clinical_data(num_clients=3)
-    trainloader = client_dataloaders[f"client_{int(cid) + 1}"]
-    # In a real-world scenario, you would have a separate validation set
-    valloader = trainloader
+    trainloader, valloader = client_dataloaders[f"client_{int(cid) + 1}"]
     return ClinicalNlpClient(model, trainloader, valloader)
 
+class CheckpointedFedAvg(fl.server.strategy.FedAvg):
+    """FedAvg that checkpoints the aggregated global model after every round."""
+    def __init__(self, checkpointer, round_offset=0, **kwargs):
+        super().__init__(**kwargs)
+        self.checkpointer = checkpointer
+        self.round_offset = round_offset
+
+    def aggregate_fit(self, server_round, results, failures):
+        parameters, metrics = super().aggregate_fit(server_round, results, failures)
+        if parameters is not None:
+            arrays = fl.common.parameters_to_ndarrays(parameters)
+            state = OrderedDict((k, torch.from_numpy(v))
+                                for k, v in zip(model.state_dict().keys(), arrays))
+            # written by a background thread; the next round starts right away
+            self.checkpointer.save(self.round_offset + server_round, {"global": state})
+        return parameters, metrics
+
 # Start the Federated Learning simulation
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from the latest complete round checkpoint")
+    parser.add_argument("--ckpt-dir", default="checkpoints_fl_glm")
+    args = parser.parse_args()
+
+    # Pick up where a previous (preempted) run stopped
+    completed_rounds, initial_parameters = 0, None
+    if args.resume and (path := latest_checkpoint(args.ckpt_dir)):
+        completed_rounds, state = load_checkpoint(path)
+        model.load_state_dict(state["global"])
+        initial_parameters = fl.common.ndarrays_to_parameters(
+            [v.numpy() for v in state["global"].values()])
+        print(f"Resumed from {path} after {completed_rounds} rounds")
+    checkpointer = AsyncCheckpointer(args.ckpt_dir)
+
     # Define the strategy for federated learning
-    strategy = fl.server.strategy.FedAvg(
+    strategy = CheckpointedFedAvg(
+        checkpointer,
+        round_offset=completed_rounds,
         fraction_fit=1.0,  # Train on 100% of clients
         min_fit_clients=3,
         min_available_clients=3,
+        fraction_evaluate=1.0,  # Score every hospital's held-out notes
+        evaluate_metrics_aggregation_fn=weighted_average,
+        fit_metrics_aggregation_fn=weighted_average,
+        initial_parameters=initial_parameters,
     )
 
     # Start the simulation
     fl.simulation.start_simulation(
         client_fn=client_fn,
         num_clients=3,
-        config=fl.server.ServerConfig(num_rounds=5),
+        config=fl.server.ServerConfig(num_rounds=max(args.rounds - completed_rounds, 0)),
         strategy=strategy,
-    )
\ No newline at end of file
+    )
+    checkpointer.close()
\ No newline at end of file
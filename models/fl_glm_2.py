@@ -1,10 +1,14 @@
 #!/usr/bin/env python
 # -----------------------  FL‑GLM implementation  -----------------------
-import os, random, copy, itertools, math, secrets, torch, torch.nn as nn
+import os, random, copy, itertools, math, secrets, argparse, torch, torch.nn as nn
 from torch.utils.data import DataLoader, Dataset, random_split
-from transformers import AutoTokenizer, AutoModel, AutoConfig
+from transformers import AutoTokenizer, AutoConfig
 from datasets import load_dataset
 from tqdm import tqdm
+from split_compression import SplitLink
+from fedavg import StreamingFedAvg, flatten_parameters_
+from partial_load import PartialCheckpoint
+from fl_checkpoint import AsyncCheckpointer, latest_checkpoint, load_checkpoint, rng_state, set_rng_state
 
 DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 N_CLIENTS = 3                  # pretend we have three hospitals
@@ -12,6 +16,12 @@ ROUNDS     = 3                 # global FL rounds (keep tiny)
 LOCAL_EPOCHS = 1               # local epochs per round
 BATCH_SIZE   = 8
 LR           = 2e-5
+# split-boundary codecs: none | fp16 | bf16 | int8 | topk[:ratio]
+ACTIVATION_CODEC = "none"      # client -> server smashed features
+GRADIENT_CODEC   = "none"      # server -> client gradients
+FREEZE_CLIENT_EMBEDDINGS = False   # True: all clients share one frozen copy
+CKPT_DIR     = "checkpoints"   # one safetensors file per completed round
+PARTITION_SEED = 42            # fixes which rows each hospital gets (saved in checkpoints)
 
 # -------------------------------------------------------------------------
 #  Encryption helpers (toy XOR stream cipher – replace with HE/TEE, etc.)
@@ -32,14 +42,17 @@ config   = AutoConfig.from_pretrained(BACKBONE, num_labels=3)
 
 class ClientNet(nn.Module):
     """Embedding + (optionally) first transformer block + classifier head."""
-    def __init__(self, backbone_cfg):
+    def __init__(self, backbone_cfg, ckpt=None):
         super().__init__()
-        full = AutoModel.from_pretrained(BACKBONE, add_pooling_layer=False)
-        # keep embeddings + first transformer layer on client
-        self.embeddings      = full.embeddings
-        self.first_layer     = full.transformer.layer[0]
+        # load only embeddings + first transformer layer from the checkpoint
+        ckpt = ckpt or PartialCheckpoint(BACKBONE, backbone_cfg)
+        if FREEZE_CLIENT_EMBEDDINGS:
+            self.embeddings  = ckpt.shared_frozen("embeddings", ckpt.embeddings)
+        else:
+            self.embeddings  = ckpt.embeddings()
+        self.first_layer     = ckpt.layer(0, cache=True)
         self.classifier_head = nn.Linear(backbone_cfg.hidden_size, config.num_labels)
-        # freeze? up to you – demo keeps them trainable
+        # freeze? see FREEZE_CLIENT_EMBEDDINGS – demo keeps them trainable
     def forward(self, input_ids, attention_mask):
         h = self.embeddings(input_ids)                  # (B, L, H)
         h = self.first_layer(h, attention_mask)[0]
@@ -47,11 +60,11 @@ class ClientNet(nn.Module):
 
 class ServerNet(nn.Module):
     """Middle transformer layers living on the central server."""
-    def __init__(self, backbone_cfg):
+    def __init__(self, backbone_cfg, ckpt=None):
         super().__init__()
-        full = AutoModel.from_pretrained(BACKBONE, add_pooling_layer=False)
-        # drop embeddings & first layer -> keep layers 1‑5
-        self.middle = nn.ModuleList(full.transformer.layer[1:])
+        # never materialise embeddings & first layer -> load layers 1‑5 only
+        ckpt = ckpt or PartialCheckpoint(BACKBONE, backbone_cfg)
+        self.middle = nn.ModuleList(ckpt.layer(i) for i in range(1, ckpt.num_layers()))
     def forward(self, hidden_states, attention_mask):
         h = hidden_states
         for layer in self.middle:
@@ -61,11 +74,12 @@ class ServerNet(nn.Module):
 # -------------------------------------------------------------------------
 #  Simple MedNLI loader and partitioner  ----------------------------------
 # -------------------------------------------------------------------------
-def get_partitions(n_clients):
+def get_partitions(n_clients, seed=PARTITION_SEED):
     ds = load_dataset("mednli", "matched")["train"]     # 11k rows
-    ds = ds.shuffle(42)
-    shards = ds.train_test_split(test_size=n_clients)
-    parts  = shards["train"].train_test_split(n_clients)
+    ds = ds.shuffle(seed)
+    # seeded splits: the same seed gives every client the same rows again
+    shards = ds.train_test_split(test_size=n_clients, seed=seed)
+    parts  = shards["train"].train_test_split(n_clients, seed=seed)
     # convert to torch Dataset
     tok = AutoTokenizer.from_pretrained(BACKBONE)
     def make_ds(hf_subset):
@@ -83,30 +97,58 @@ def get_partitions(n_clients):
 # -------------------------------------------------------------------------
 #  Federated training driver  ---------------------------------------------
 # -------------------------------------------------------------------------
-def train_federated():
+def train_federated(resume=False, ckpt_dir=CKPT_DIR):
+    # one checkpoint reader: each tensor is read once, clients share theirs
+    ckpt   = PartialCheckpoint(BACKBONE, config)
     # one ServerNet shared globally
-    server = ServerNet(config).to(DEVICE)
+    server = ServerNet(config, ckpt).to(DEVICE)
     server_opt = torch.optim.AdamW(server.parameters(), lr=LR)
     
     # an independent ClientNet + key for every client
-    client_nets = [ClientNet(config).to(DEVICE) for _ in range(N_CLIENTS)]
+    client_nets = [ClientNet(config, ckpt).to(DEVICE) for _ in range(N_CLIENTS)]
+    for c in client_nets: flatten_parameters_(c)        # one buffer per client
     client_opts = [torch.optim.AdamW(c.parameters(), lr=LR) for c in client_nets]
     keys        = [secrets.token_bytes(16) for _ in range(N_CLIENTS)]
+    links       = [SplitLink(ACTIVATION_CODEC, GRADIENT_CODEC) for _ in range(N_CLIENTS)]
     
-    partitions  = get_partitions(N_CLIENTS)
+    fedavg      = StreamingFedAvg(client_nets[0])
+
+    # ---- resume from the newest complete round checkpoint -----------------
+    start_round, partition_seed = 0, PARTITION_SEED
+    if resume and (path := latest_checkpoint(ckpt_dir)):
+        last_round, state = load_checkpoint(path)
+        server.load_state_dict(state["server"])
+        server_opt.load_state_dict(state["server_opt"])
+        for cnet, copt, cstate, ostate in zip(client_nets, client_opts,
+                                              state["clients"], state["client_opts"]):
+            cnet.load_state_dict(cstate)                # copies into flat buffers
+            copt.load_state_dict(ostate)
+        for link, lstate in zip(links, state.get("links", [])):
+            link.load_state_dict(lstate)                # top-k error-feedback residuals
+        if "keys" in state:                             # both sides of a link keep its key
+            keys = [bytes(k.tolist()) for k in state["keys"]]
+        set_rng_state(state["rng"])
+        partition_seed = state.get("partition_seed", PARTITION_SEED)
+        start_round = last_round + 1
+        print(f"Resumed from {path} – continuing at round {start_round+1}/{ROUNDS}")
+    # built after the resume so a resumed run uses the seed its checkpoints recorded
+    partitions   = get_partitions(N_CLIENTS, partition_seed)
+    checkpointer = AsyncCheckpointer(ckpt_dir)
     
-    for rnd in range(ROUNDS):
+    for rnd in range(start_round, ROUNDS):
         print(f"\n===== Federated round {rnd+1}/{ROUNDS} =====")
         # ---- local client loops ------------------------------------------------
-        for cid, (ds, cnet, copt, key) in enumerate(zip(partitions, client_nets,
-                                                        client_opts, keys)):
+        for cid, (ds, cnet, copt, key, link) in enumerate(zip(partitions, client_nets,
+                                                              client_opts, keys, links)):
             loader = DataLoader(ds, batch_size=BATCH_SIZE, shuffle=True)
             cnet.train(); server.train()
+            link.reset_stats()
+            correct = seen = 0
             for _ in range(LOCAL_EPOCHS):
                 for xb, mb, yb in tqdm(loader, leave=False):
                     xb, mb, yb = xb.to(DEVICE), mb.to(DEVICE), yb.to(DEVICE)
                     # FWD client part
-                    smashed = cnet(xb, mb)
+                    smashed = link(cnet(xb, mb))            # compressed both ways
                     smashed_enc = xor_encrypt(smashed, key)
                     # FWD server part
                     server_out  = server(smashed_enc, mb)
@@ -114,17 +156,32 @@ def train_federated():
                     # head + loss
                     logits = cnet.classifier_head(server_out[:,0,:])  # CLS token
                     loss   = nn.CrossEntropyLoss()(logits, yb)
+                    correct += (logits.argmax(-1) == yb).sum().item()
+                    seen    += yb.numel()
                     # BWD pass (through both nets)
                     copt.zero_grad(); server_opt.zero_grad()
                     loss.backward()
                     torch.nn.utils.clip_grad_norm_(cnet.parameters(), 1.0)
                     copt.step(); server_opt.step()
-            print(f" Client {cid} done – last minibatch loss {loss.item():.4f}")
-        # ---- FedAvg of CLIENT blocks ------------------------------------------
-        with torch.no_grad():
-            for params in zip(*[c.parameters() for c in client_nets]):
-                avg = torch.mean(torch.stack(params), dim=0)
-                for p in params: p.copy_(avg)
+            print(f" Client {cid} done – last minibatch loss {loss.item():.4f}, "
+                  f"train acc {correct / max(seen, 1):.3f}")
+            print(f"   link: {link.summary()}")
+            fedavg.add(cnet, len(ds))                   # fold in as it finishes
+        # ---- FedAvg of CLIENT blocks (weighted by local dataset size) ----------
+        fedavg.broadcast(client_nets)
+        # ---- checkpoint the round in the background ---------------------------
+        checkpointer.save(rnd, {
+            "server":      server.state_dict(),
+            "server_opt":  server_opt.state_dict(),
+            "clients":     [c.state_dict() for c in client_nets],   # incl. heads
+            "client_opts": [o.state_dict() for o in client_opts],
+            "links":       [l.state_dict() for l in links],
+            # the link keys are secrets like the weights: keep ckpt_dir private
+            "keys":        [torch.tensor(list(k), dtype=torch.uint8) for k in keys],
+            "rng":         rng_state(),             # torch CPU/CUDA, numpy, python
+            "partition_seed": partition_seed,
+        })
+    checkpointer.close()
     # save final global model snapshot
     torch.save({
         "client_state_dict": client_nets[0].state_dict(),
@@ -133,5 +190,10 @@ def train_federated():
     print("\nTraining complete – combined weights written to fl_glm_mednli.pt")
 
 if __name__ == "__main__":
-    train_federated()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--resume", action="store_true",
+                        help="continue from the latest complete round checkpoint")
+    parser.add_argument("--ckpt-dir", default=CKPT_DIR)
+    args = parser.parse_args()
+    train_federated(resume=args.resume, ckpt_dir=args.ckpt_dir)
 
@@ -0,0 +1,75 @@
+import torch
+from torch.func import functional_call, grad, vmap
+
+
+class FuncDPSGD:
+    """DP-SGD with per-sample gradients from torch.func (vmap over grad).
+
+    A drop-in for the Opacus hook path in client_FL.Client: each physical
+    batch gets its per-sample gradients in one vectorised call, they are
+    clipped to `max_grad_norm` and summed; step() then adds Gaussian noise
+    with std `noise_multiplier * max_grad_norm`, divides by the expected
+    (logical) batch size and applies the optimizer - the same mechanism
+    Opacus implements, so the same accountant gives the same epsilon.
+
+    `loss_fn(outputs, labels)` must reduce with a mean, as for Opacus.
+    """
+
+    def __init__(self, net, loss_fn, max_grad_norm, noise_multiplier, expected_batch_size):
+        self.net = net
+        self.loss_fn = loss_fn
+        self.max_grad_norm = max_grad_norm
+        self.noise_multiplier = noise_multiplier
+        self.expected_batch_size = expected_batch_size
+        self.steps = 0
+        self.grad_sum = None
+
+        def sample_loss(params, buffers, x, y):
+            outputs = functional_call(self.net, (params, buffers), (x.unsqueeze(0),))
+            return self.loss_fn(outputs, y.unsqueeze(0))
+
+        # "different": dropout draws an independent mask for every sample
+        self._per_sample_grads = vmap(grad(sample_loss), in_dims=(None, None, 0, 0),
+                                      randomness="different")
+
+    def _params(self):
+        return {k: p.detach() for k, p in self.net.named_parameters() if p.requires_grad}
+
+    def accumulate(self, inputs, labels):
+        """Add the clipped per-sample gradients of one physical batch. An empty
+        batch adds nothing, but the next step() is still taken (noise only),
+        as Opacus does with an empty Poisson-sampled batch."""
+        params = self._params()
+        if self.grad_sum is None:
+            self.grad_sum = {k: torch.zeros_like(p) for k, p in params.items()}
+        if inputs.size(0) == 0:
+            return
+        buffers = {k: b.detach() for k, b in self.net.named_buffers()}
+        grads = self._per_sample_grads(params, buffers, inputs, labels)
+
+        batch = inputs.size(0)
+        norms = torch.stack([g.reshape(batch, -1).norm(dim=1) for g in grads.values()]).norm(dim=0)
+        scale = (self.max_grad_norm / (norms + 1e-6)).clamp(max=1.0)
+        for k, g in grads.items():
+            self.grad_sum[k].add_(torch.einsum("b,b...->...", scale, g))
+
+    def step(self, optimizer):
+        """Noise the accumulated sum, write it to .grad and take one step."""
+        if self.grad_sum is None:
+            raise RuntimeError("FuncDPSGD.step() called before accumulate() for this step")
+        std = self.noise_multiplier * self.max_grad_norm
+        for k, p in self.net.named_parameters():
+            if not p.requires_grad:
+                continue
+            noisy = self.grad_sum[k] + torch.normal(0, std, size=p.shape, device=p.device, dtype=p.dtype)
+            p.grad = noisy / self.expected_batch_size
+        optimizer.step()
+        optimizer.zero_grad()
+        self.grad_sum = None
+        self.steps += 1
+
+    def state_dict(self):
+        return {"steps": self.steps}
+
+    def load_state_dict(self, state):
+        self.steps = state["steps"]
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import torch
+
+
+def save_index_file(sequence, path):
+    """Store an index sequence as a compact .npy (uint32 when it fits)."""
+    sequence = np.asarray(sequence)
+    dtype = np.uint32 if sequence.size == 0 or sequence.max() < 2 ** 32 else np.int64
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp.npy"
+    np.save(tmp, sequence.astype(dtype, copy=False))
+    os.replace(tmp, path)
+    return path
+
+
+class MemmapBatchSampler(torch.utils.data.Sampler):
+    """Yields consecutive `batch_size` slices of an index file, read lazily
+    through a memory map.
+
+    The file can be swapped with set_source() between epochs, so one
+    DataLoader (and its persistent workers) serves every global epoch.
+    """
+
+    def __init__(self, path, batch_size, drop_last=False):
+        self.batch_size = batch_size
+        self.drop_last = drop_last
+        self.set_source(path)
+
+    def set_source(self, path):
+        self.path = path
+        self.indices = np.load(path, mmap_mode="r")
+
+    def __iter__(self):
+        indices = self.indices
+        stop = len(self) * self.batch_size if self.drop_last else len(indices)
+        for start in range(0, stop, self.batch_size):
+            yield indices[start: start + self.batch_size].tolist()
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.indices) // self.batch_size
+        return (len(self.indices) + self.batch_size - 1) // self.batch_size
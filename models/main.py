@@ -7,7 +7,9 @@ app = FastAPI()
 def root():
     return {"message": "LLM Federated Clinical Agent is running"}
 
+# one agent for the process: hospital statistics are cached across requests
+agent = ClinicalDataAgent(["data/hospital_1.csv", "data/hospital_2.csv"])
+
 @app.get("/analyze")
 def analyze():
-    agent = ClinicalDataAgent(["data/hospital_1.csv", "data/hospital_2.csv"])
     return agent.analyze_data()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# ----------------------  Partial backbone checkpoint loading  ----------------
+#  ClientNet needs embeddings + layer 0, ServerNet needs layers 1..k.  Instead
+#  of `AutoModel.from_pretrained` (full model, every time) we build only the
+#  submodules a party owns and fill them with just their tensors, read lazily
+#  from the safetensors checkpoint.  Client tensors are read once and shared
+#  by every co-located simulated client.
+# -----------------------------------------------------------------------------
+import os, torch, torch.nn as nn
+from transformers import AutoModel
+
+# where embeddings / the layer stack live in the bare AutoModel, per family
+LAYOUTS = {
+    "distilbert": ("embeddings", "transformer.layer"),
+    "bert":       ("embeddings", "encoder.layer"),
+    "roberta":    ("embeddings", "encoder.layer"),
+}
+
+
+def resolve_checkpoint(name_or_path: str) -> str:
+    """Local dir or hub id -> weights file (safetensors preferred)."""
+    for fname in ("model.safetensors", "pytorch_model.bin"):
+        if os.path.isdir(name_or_path):
+            path = os.path.join(name_or_path, fname)
+            if os.path.exists(path):
+                return path
+            continue
+        from huggingface_hub import hf_hub_download
+        try:
+            return hf_hub_download(name_or_path, fname)
+        except Exception:
+            continue
+    raise FileNotFoundError(f"no model.safetensors / pytorch_model.bin for {name_or_path}")
+
+
+class PartialCheckpoint:
+    """Reads selected tensors of one checkpoint, keyed like the bare AutoModel
+    (task-head prefixes such as 'distilbert.' are stripped)."""
+    def __init__(self, name_or_path: str, config):
+        self.config = config
+        self.path   = resolve_checkpoint(name_or_path)
+        self.embeddings_path, self.layers_path = LAYOUTS[config.model_type]
+        # class of each submodule, taken from a weightless skeleton
+        with torch.device("meta"):
+            skel = AutoModel.from_config(config)
+        self._embeddings_cls = type(skel.get_submodule(self.embeddings_path))
+        self._layer_cls      = type(skel.get_submodule(self.layers_path)[0])
+        self._prefix = skel.base_model_prefix + "."
+        self._shared = {}
+
+    def _bin(self):
+        # a .bin can't be read per tensor; mmap it so only touched pages load
+        if not hasattr(self, "_bin_sd"):
+            self._bin_sd = torch.load(self.path, map_location="cpu",
+                                      mmap=True, weights_only=True)
+        return self._bin_sd
+
+    def read(self, prefix: str) -> dict:
+        """All tensors under `prefix` (bare-model naming), prefix stripped."""
+        out = {}
+        if self.path.endswith(".safetensors"):
+            from safetensors import safe_open
+            with safe_open(self.path, framework="pt") as f:
+                for k in f.keys():
+                    bare = k[len(self._prefix):] if k.startswith(self._prefix) else k
+                    if bare.startswith(prefix):
+                        out[bare[len(prefix):]] = f.get_tensor(k)
+        else:
+            for k, v in self._bin().items():
+                bare = k[len(self._prefix):] if k.startswith(self._prefix) else k
+                if bare.startswith(prefix):
+                    out[bare[len(prefix):]] = v
+        if not out:
+            raise KeyError(f"no tensors under '{prefix}' in {self.path}")
+        return out
+
+    def _build(self, cls, prefix, cache):
+        if cache and prefix in self._shared:
+            state = self._shared[prefix]
+        else:
+            state = self.read(prefix)
+            if cache:
+                self._shared[prefix] = state
+        module = cls(self.config)
+        # non-persistent buffers (e.g. position_ids) come from the constructor;
+        # old checkpoints may still carry them, so only *missing* keys are fatal
+        missing, _ = module.load_state_dict(state, strict=False)
+        if missing:
+            raise KeyError(f"checkpoint lacks {missing} under '{prefix}'")
+        return module
+
+    def embeddings(self, cache=True) -> nn.Module:
+        return self._build(self._embeddings_cls, self.embeddings_path + ".", cache)
+
+    def layer(self, idx: int, cache=False) -> nn.Module:
+        return self._build(self._layer_cls, f"{self.layers_path}.{idx}.", cache)
+
+    def num_layers(self) -> int:
+        return self.config.num_hidden_layers
+
+    def shared_frozen(self, name: str, build) -> nn.Module:
+        """One read-only module instance shared by all co-located clients."""
+        key = ("frozen", name)
+        if key not in self._shared:
+            module = build()
+            module.requires_grad_(False)
+            self._shared[key] = module
+        return self._shared[key]
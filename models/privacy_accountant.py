@@ -0,0 +1,62 @@
+import numpy as np
+
+try:  # Opacus 0.15 (the version client_FL.py is written against)
+    from opacus.privacy_analysis import compute_rdp, get_privacy_spent
+except ImportError:  # Opacus >= 1.0
+    from opacus.accountants.analysis.rdp import compute_rdp, get_privacy_spent
+
+
+class IncrementalRDPAccountant:
+    """RDP accountant for a fixed (sample_rate, noise_multiplier) schedule.
+
+    The RDP of the subsampled Gaussian mechanism is additive over steps, so
+    the expensive per-order computation is done once for a single step and
+    every later query is `steps * rdp_step` followed by the usual conversion
+    to (epsilon, delta), i.e. a vector multiply and a min over the orders.
+    Epsilons match PrivacyEngine.get_privacy_spent for the same settings.
+    """
+
+    def __init__(self, sample_rate, noise_multiplier, alphas, delta):
+        self.sample_rate = sample_rate
+        self.noise_multiplier = noise_multiplier
+        self.alphas = list(alphas)
+        self.delta = delta
+        self.rdp_step = np.asarray(compute_rdp(q=sample_rate, noise_multiplier=noise_multiplier,
+                                               steps=1, orders=self.alphas))
+
+    @classmethod
+    def from_privacy_engine(cls, privacy_engine):
+        return cls(privacy_engine.sample_rate, privacy_engine.noise_multiplier,
+                   privacy_engine.alphas, privacy_engine.target_delta)
+
+    def get_privacy_spent(self, steps):
+        """(epsilon, best_alpha) after `steps` noisy steps (steps=0 included:
+        like Opacus, the RDP-to-DP conversion gives a small positive epsilon)."""
+        eps, best_alpha = get_privacy_spent(orders=self.alphas, rdp=steps * self.rdp_step,
+                                             delta=self.delta)
+        return float(eps), best_alpha
+
+    def remaining_steps(self, steps_taken, target_epsilon):
+        """How many more steps keep epsilon strictly below `target_epsilon`.
+
+        Epsilon grows monotonically with steps, so this is an exponential
+        search followed by a bisection: O(log steps) cheap queries, once per
+        epoch instead of one full RDP computation per batch.
+        """
+        def fits(k):
+            return self.get_privacy_spent(steps_taken + k)[0] < target_epsilon
+
+        if not fits(1):
+            return 0
+        lo, hi = 1, 2
+        while fits(hi):
+            lo, hi = hi, hi * 2
+            if hi > 1 << 40:  # budget never binds (very large noise multiplier)
+                return lo
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+            if fits(mid):
+                lo = mid
+            else:
+                hi = mid
+        return lo
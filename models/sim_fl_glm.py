@@ -3,6 +3,8 @@ import torch.nn as nn
 import torch.optim as optim
 from transformers import AutoModelForCausalLM, AutoTokenizer, AutoConfig
 from torch.utils.data import DataLoader, TensorDataset
+from dataclasses import dataclass
+import itertools
 import copy
 
 # --- 1. Model and Tokenizer Setup ---
@@ -55,69 +57,178 @@ class ServerModel(nn.Module):
         return logits
 
 
-# --- 3. Server and Client/Agent Classes ---
+# --- 3. Split-Learning Protocol: Messages, Server and Client/Agent Classes ---
+# Nothing but these messages crosses the client/server boundary. Tensors in a
+# message are always detached, so each side only ever backprops through its
+# own graph, exactly as it would across a network.
+
+@dataclass
+class ActivationMessage:
+    """Client -> server: smashed activations of one micro-batch."""
+    client_id: int
+    mb_id: int
+    activations: torch.Tensor
+
+@dataclass
+class LogitsMessage:
+    """Server -> client: server output for one micro-batch."""
+    client_id: int
+    mb_id: int
+    logits: torch.Tensor
+
+@dataclass
+class GradientMessage:
+    """Either direction: gradient w.r.t. the tensor of the matching message."""
+    client_id: int
+    mb_id: int
+    grad: torch.Tensor
+
+
+class _InFlight:
+    """One server forward (possibly several micro-batches concatenated) whose
+    autograd graph is kept alive until every gradient for it has arrived."""
+    def __init__(self, keys, sizes, inputs, outputs):
+        self.keys, self.sizes = keys, sizes
+        self.inputs, self.outputs = inputs, outputs
+        self.grads = {}
+
 
 class Server:
     """The central server in the Federated Learning setup."""
     def __init__(self, server_model):
         self.model = server_model
         self.optimizer = optim.Adam(self.model.parameters(), lr=1e-5)
-        self.activations_from_client = None
+        self.pending = {}  # (client_id, mb_id) -> _InFlight
 
-    def forward_pass(self, activations):
-        """Forward pass on the server's model part."""
-        self.activations_from_client = activations
-        # Detach to break the computation graph from the client side initially
-        self.activations_from_client.retain_grad()
-        return self.model(self.activations_from_client)
+    def forward_pass(self, message):
+        """Forward pass on the server's model part for one micro-batch."""
+        return self.forward_batch([message])[0]
 
-    def backward_pass(self, grads_from_client):
-        """Backward pass on the server's model part."""
-        self.optimizer.zero_grad()
-        # The gradients from the client are for the output of the server model
-        server_output = self.model(self.activations_from_client)
-        server_output.backward(gradient=grads_from_client)
+    def forward_batch(self, messages):
+        """Forward several micro-batches, possibly from different clients.
+
+        Micro-batches with the same (seq_len, hidden) shape are concatenated
+        into a single forward. The graph is kept, keyed by micro-batch id, so
+        the backward pass never has to recompute the forward.
+        """
+        groups = {}
+        for msg in messages:
+            groups.setdefault(tuple(msg.activations.shape[1:]), []).append(msg)
+
+        replies = {}
+        for group in groups.values():
+            keys = [(m.client_id, m.mb_id) for m in group]
+            sizes = [m.activations.size(0) for m in group]
+            inputs = torch.cat([m.activations for m in group]).requires_grad_()
+            outputs = self.model(inputs)
+            inflight = _InFlight(keys, sizes, inputs, outputs)
+            for key, logits in zip(keys, outputs.detach().split(sizes)):
+                self.pending[key] = inflight
+                replies[key] = LogitsMessage(key[0], key[1], logits)
+        return [replies[(m.client_id, m.mb_id)] for m in messages]
+
+    def backward_pass(self, message):
+        """Backward pass on the server's model part.
+
+        Returns the gradient messages for the client activations once every
+        micro-batch of the forward they were part of has reported back, and
+        an empty list until then. Parameter gradients accumulate until step().
+        """
+        key = (message.client_id, message.mb_id)
+        inflight = self.pending.pop(key)
+        inflight.grads[key] = message.grad
+        if len(inflight.grads) < len(inflight.keys):
+            return []
+        grad = torch.cat([inflight.grads[k] for k in inflight.keys])
+        inflight.outputs.backward(gradient=grad)
+        return [GradientMessage(cid, mb_id, g)
+                for (cid, mb_id), g in zip(inflight.keys, inflight.inputs.grad.split(inflight.sizes))]
+
+    def step(self):
+        """Apply the gradients accumulated since the last step."""
         self.optimizer.step()
-        return self.activations_from_client.grad
+        self.optimizer.zero_grad()
+
 
 class Client:
     """A client (or agent) in the Federated Learning setup."""
-    def __init__(self, client_model, local_data, server):
+    def __init__(self, client_model, local_data, server, client_id=0, max_in_flight=1):
+        self.client_id = client_id
         self.model = client_model
         self.data_loader = local_data
         self.server = server
+        self.max_in_flight = max_in_flight
         self.optimizer = optim.Adam(self.model.parameters(), lr=1e-5)
         self.loss_fn = nn.CrossEntropyLoss()
+        self.mb_ids = itertools.count()
+        self.outputs = {}  # mb_id -> client output still waiting for its gradient
+        self.labels = {}
+
+    def send(self, inputs, labels):
+        """1. Forward pass on the client model; activations go out as a message."""
+        mb_id = next(self.mb_ids)
+        client_output = self.model(inputs)
+        self.outputs[mb_id] = client_output
+        self.labels[mb_id] = labels
+        return ActivationMessage(self.client_id, mb_id, client_output.detach())
+
+    def receive_logits(self, message):
+        """2. Loss on the client from the server output; its gradient goes back."""
+        logits = message.logits.requires_grad_()
+        labels = self.labels.pop(message.mb_id)
+        loss = self.loss_fn(logits.view(-1, logits.size(-1)), labels.view(-1))
+        loss.backward()
+        self.last_loss = loss.item()
+        return GradientMessage(self.client_id, message.mb_id, logits.grad)
+
+    def receive_gradient(self, message):
+        """3. Finish backpropagation on the client."""
+        client_output = self.outputs.pop(message.mb_id)
+        client_output.backward(gradient=message.grad)
+
+    def step(self):
+        self.optimizer.step()
+        self.optimizer.zero_grad()
 
     def train_epoch(self):
         """Train the client for one epoch on its local data."""
-        for inputs, labels in self.data_loader:
-            self.optimizer.zero_grad()
-            
-            # 1. Forward pass on the client model
-            client_output = self.model(inputs)
+        train_round(self.server, [self])
 
-            # 2. Send activations to the server and get server output
-            server_output = self.server.forward_pass(client_output)
-            
-            # 3. Calculate loss on the client
-            # The server's output (logits) and labels are used to compute the loss
-            loss = self.loss_fn(server_output.view(-1, server_output.size(-1)), labels.view(-1))
-            
-            # 4. Backward pass on the client to get gradients for server
-            loss.backward()
-            
-            # The gradient for the server's output is what the server needs to start its backpropagation
-            grads_for_server = server_output.grad
 
-            # 5. Send gradients to the server and get gradients for the client's output
-            grads_from_server = self.server.backward_pass(grads_for_server)
+def train_round(server, clients):
+    """One epoch over every client's local data.
+
+    Each window, every client still holding data puts up to `max_in_flight`
+    micro-batches on the wire; the server forwards all of them together
+    (batched across clients where shapes allow), then the loss gradients
+    flow back and each party steps once per window.
+    """
+    iterators = {c.client_id: iter(c.data_loader) for c in clients}
+    by_id = {c.client_id: c for c in clients}
+    while iterators:
+        activations = []
+        for cid in list(iterators):
+            client = by_id[cid]
+            for _ in range(client.max_in_flight):
+                batch = next(iterators[cid], None)
+                if batch is None:
+                    del iterators[cid]
+                    break
+                inputs, labels = batch
+                activations.append(client.send(inputs, labels))
+        if not activations:
+            break
 
-            # 6. Finish backpropagation on the client and update weights
-            client_output.backward(gradient=grads_from_server)
-            self.optimizer.step()
+        for logits_msg in server.forward_batch(activations):
+            client = by_id[logits_msg.client_id]
+            for grad_msg in server.backward_pass(client.receive_logits(logits_msg)):
+                by_id[grad_msg.client_id].receive_gradient(grad_msg)
 
-            print(f"Client training loss: {loss.item()}")
+        server.step()
+        stepped = {m.client_id for m in activations}
+        for cid in stepped:
+            by_id[cid].step()
+            print(f"Client {cid} training loss: {by_id[cid].last_loss}")
 
 # --- 4. Simulation of the Federated Learning Process ---
 
@@ -158,12 +269,14 @@ def main():
     client1 = Client(
         client_model=copy.deepcopy(client_part), # Each client gets a copy of the client model part
         local_data=client1_loader, 
-        server=server
+        server=server,
+        client_id=1,
     )
     client2 = Client(
         client_model=copy.deepcopy(client_part), 
         local_data=client2_loader, 
-        server=server
+        server=server,
+        client_id=2,
     )
     
     clients = [client1, client2]
@@ -172,9 +285,8 @@ def main():
     NUM_ROUNDS = 3
     for round_num in range(NUM_ROUNDS):
         print(f"\n--- Round {round_num + 1}/{NUM_ROUNDS} ---")
-        for i, client in enumerate(clients):
-            print(f"-> Training Client {i+1}")
-            client.train_epoch()
+        # all clients in lock-step; the server batches their micro-batches
+        train_round(server, clients)
             
     print("\n✅ Federated Learning Simulation Finished!")
 
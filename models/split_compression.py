@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -------------------  Split-learning boundary compression  -------------------
+#  Codecs for the smashed activations sent client -> server and the gradients
+#  sent back server -> client.  Every codec turns a tensor into a *payload*
+#  (dict of tensors + small metadata) and back, so the payload is exactly what
+#  would cross the wire in a real deployment and its size can be counted.
+# -----------------------------------------------------------------------------
+import torch
+
+
+def payload_nbytes(payload: dict) -> int:
+    """Bytes on the wire for a payload: every tensor it carries."""
+    return sum(v.numel() * v.element_size()
+               for v in payload.values() if torch.is_tensor(v))
+
+
+class Codec:
+    """Identity codec – full precision, nothing saved."""
+    name = "none"
+
+    def encode(self, x: torch.Tensor) -> dict:
+        return {"data": x}
+
+    def decode(self, payload: dict) -> torch.Tensor:
+        return payload["data"]
+
+    def state_dict(self) -> dict:
+        """Per-stream state a resumed run needs (none for stateless codecs)."""
+        return {}
+
+    def load_state_dict(self, state: dict):
+        pass
+
+
+class CastCodec(Codec):
+    """Down-cast to a 16-bit float type for transport (fp16 / bf16)."""
+    def __init__(self, dtype):
+        self.dtype = dtype
+        self.name = {torch.float16: "fp16", torch.bfloat16: "bf16"}[dtype]
+
+    def encode(self, x):
+        return {"data": x.to(self.dtype), "dtype": x.dtype}
+
+    def decode(self, payload):
+        return payload["data"].to(payload["dtype"])
+
+
+class Int8Codec(Codec):
+    """Symmetric int8 quantisation with one fp32 scale per channel (last dim)."""
+    name = "int8"
+
+    def encode(self, x):
+        flat  = x.reshape(-1, x.shape[-1])
+        scale = flat.abs().amax(dim=0).float().clamp_min(1e-8) / 127.0   # (H,)
+        q     = torch.round(flat.float() / scale).clamp_(-127, 127).to(torch.int8)
+        return {"data": q, "scale": scale, "shape": x.shape, "dtype": x.dtype}
+
+    def decode(self, payload):
+        x = payload["data"].float() * payload["scale"]
+        return x.reshape(payload["shape"]).to(payload["dtype"])
+
+
+class TopKCodec(Codec):
+    """Keep the k largest-magnitude entries; the rest is carried over to the
+    next message on this stream (error feedback), so nothing is lost for good.
+    """
+    def __init__(self, ratio=0.1, error_feedback=True):
+        assert 0 < ratio <= 1, "top-k ratio must be in (0, 1]"
+        self.ratio = ratio
+        self.error_feedback = error_feedback
+        self.residual = None
+        self.name = f"topk:{ratio:g}"
+
+    def encode(self, x):
+        flat = x.detach().reshape(-1)
+        # a residual of another shape (short last batch) is dropped, not folded
+        if self.error_feedback and self.residual is not None \
+                and self.residual.shape == flat.shape:
+            flat = flat + self.residual
+        k   = max(1, int(flat.numel() * self.ratio))
+        idx = flat.abs().topk(k, sorted=False).indices
+        val = flat[idx]
+        if self.error_feedback:
+            self.residual = flat.clone()
+            self.residual[idx] = 0
+        return {"data": val, "index": idx.to(torch.int32),
+                "shape": x.shape, "dtype": x.dtype}
+
+    def decode(self, payload):
+        val  = payload["data"]
+        flat = torch.zeros(payload["shape"].numel(), dtype=payload["dtype"],
+                           device=val.device)
+        flat[payload["index"].long()] = val.to(payload["dtype"])
+        return flat.reshape(payload["shape"])
+
+    def state_dict(self):
+        return {} if self.residual is None else {"residual": self.residual}
+
+    def load_state_dict(self, state):
+        self.residual = state.get("residual")
+
+
+def make_codec(spec: str) -> Codec:
+    """'none' | 'fp16' | 'bf16' | 'int8' | 'topk[:ratio]'"""
+    spec = (spec or "none").lower()
+    if spec in ("none", "fp32"):
+        return Codec()
+    if spec == "fp16":
+        return CastCodec(torch.float16)
+    if spec == "bf16":
+        return CastCodec(torch.bfloat16)
+    if spec == "int8":
+        return Int8Codec()
+    if spec.startswith("topk"):
+        _, _, ratio = spec.partition(":")
+        return TopKCodec(float(ratio) if ratio else 0.1)
+    raise ValueError(f"unknown split-boundary codec '{spec}'")
+
+
+# -----------------------------------------------------------------------------
+#  Boundary link: compress on the way up, compress grads on the way down
+# -----------------------------------------------------------------------------
+class _Boundary(torch.autograd.Function):
+    @staticmethod
+    def forward(ctx, x, link):
+        ctx.link = link
+        return link._transmit(x, up=True)
+
+    @staticmethod
+    def backward(ctx, grad):
+        return ctx.link._transmit(grad, up=False), None
+
+
+class SplitLink:
+    """One client<->server link.  Call it on the smashed tensor; the returned
+    tensor is what the server sees, and its gradient is what the client gets
+    back, each after a round trip through the configured codec.
+
+    Keep one link per client: top-k error feedback state is per stream.
+    """
+    def __init__(self, uplink="none", downlink="none"):
+        self.up   = make_codec(uplink)   if isinstance(uplink, str)   else uplink
+        self.down = make_codec(downlink) if isinstance(downlink, str) else downlink
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {"up_bytes": 0, "up_raw_bytes": 0,
+                      "down_bytes": 0, "down_raw_bytes": 0, "messages": 0}
+
+    def _transmit(self, x, up):
+        codec   = self.up if up else self.down
+        payload = codec.encode(x)
+        key     = "up" if up else "down"
+        self.stats[f"{key}_bytes"]     += payload_nbytes(payload)
+        self.stats[f"{key}_raw_bytes"] += x.numel() * x.element_size()
+        if up:
+            self.stats["messages"] += 1
+        out = codec.decode(payload)
+        return out.clone() if out is x else out
+
+    def __call__(self, smashed: torch.Tensor) -> torch.Tensor:
+        return _Boundary.apply(smashed, self)
+
+    def state_dict(self) -> dict:
+        """Error-feedback residuals of both directions, for checkpoints."""
+        return {"up": self.up.state_dict(), "down": self.down.state_dict()}
+
+    def load_state_dict(self, state: dict):
+        self.up.load_state_dict(state["up"])
+        self.down.load_state_dict(state["down"])
+
+    def summary(self) -> str:
+        s  = self.stats
+        mb = lambda b: b / 2**20
+        up_ratio   = s["up_raw_bytes"]   / max(s["up_bytes"], 1)
+        down_ratio = s["down_raw_bytes"] / max(s["down_bytes"], 1)
+        return (f"up {mb(s['up_bytes']):.2f} MiB ({self.up.name}, x{up_ratio:.1f})  "
+                f"down {mb(s['down_bytes']):.2f} MiB ({self.down.name}, x{down_ratio:.1f})  "
+                f"over {s['messages']} minibatches")
@@ -0,0 +1,85 @@
+"""Streaming FedAvg: flat buffers alias the parameters, and the running sum
+equals the sample-weighted mean of the client state_dicts; the shared
+aggregate is published once and averaged into in place.
+
+    cd models && python -m pytest -q test_fedavg.py
+"""
+import pytest
+import torch
+import torch.nn as nn
+
+from fedavg import (StreamingFedAvg, average_state_into, flat_parameters, flatten_parameters_,
+                    publish_aggregate_state)
+
+
+def _net(seed):
+    torch.manual_seed(seed)
+    net = nn.Sequential(nn.Linear(4, 3), nn.ReLU(), nn.Linear(3, 2))
+    net[0].bias.requires_grad_(False)                       # frozen: not in the flat buffer
+    return net
+
+
+def test_flat_buffer_aliases_the_parameters():
+    net = _net(0)
+    before = {k: v.clone() for k, v in net.state_dict().items()}
+    flat = flatten_parameters_(net)
+    assert flat.numel() == sum(p.numel() for p in net.parameters() if p.requires_grad)
+    assert all(torch.equal(v, before[k]) for k, v in net.state_dict().items())
+    flat.zero_()
+    assert net[0].weight.abs().sum() == 0 and net[0].bias.abs().sum() > 0
+    assert flat_parameters(net) is flat
+
+
+def test_weighted_average_matches_state_dicts():
+    nets = [_net(seed) for seed in range(3)]
+    for net in nets:
+        flatten_parameters_(net)
+    samples = [10, 30, 60]
+    expected = {name: sum(n * net.state_dict()[name] for net, n in zip(nets, samples)) / sum(samples)
+                for name in ("0.weight", "2.weight", "2.bias")}
+
+    agg = StreamingFedAvg(nets[0])
+    for net, n in zip(nets, samples):
+        agg.add(net, n)
+    agg.broadcast(nets)
+    for net in nets:
+        for name, value in expected.items():
+            assert torch.allclose(net.state_dict()[name], value, atol=1e-6)
+    with pytest.raises(AssertionError):
+        agg.average()                                       # broadcast resets the sum
+
+
+def test_layout_mismatch_is_rejected():
+    agg = StreamingFedAvg(_net(0))
+    with pytest.raises(AssertionError, match="layout"):
+        agg.add(nn.Linear(4, 2), 1)
+
+
+def _bn_net(seed):
+    torch.manual_seed(seed)
+    net = nn.Sequential(nn.Linear(4, 3), nn.BatchNorm1d(3))
+    net.train()
+    net(torch.randn(8, 4))                                  # running stats and num_batches_tracked move
+    return net
+
+
+def test_shared_aggregate_is_published_once_and_averaged_in_place():
+    nets = [_bn_net(seed) for seed in range(3)]
+    aggregate = publish_aggregate_state(nets[0].state_dict())
+    pointers = {k: v.data_ptr() for k, v in aggregate.items()}
+    assert all(v.is_shared() for v in aggregate.values())
+    assert aggregate._metadata == nets[0].state_dict()._metadata
+    assert aggregate["0.weight"].data_ptr() != nets[0][0].weight.data_ptr()
+
+    weights = [1, 2, 5]
+    states = [net.state_dict() for net in nets]
+    expected = sum(w * s["1.running_mean"] for w, s in zip(weights, states)) / sum(weights)
+    average_state_into(aggregate, states, weights)
+    assert {k: v.data_ptr() for k, v in aggregate.items()} == pointers
+    assert torch.allclose(aggregate["1.running_mean"], expected, atol=1e-6)
+    assert aggregate["1.num_batches_tracked"].item() == 1
+
+    client = _bn_net(7)
+    client.load_state_dict(aggregate)                       # what Client.load_aggregate_state does
+    assert torch.equal(client[0].weight, aggregate["0.weight"])
+    assert client[0].weight.data_ptr() != aggregate["0.weight"].data_ptr()
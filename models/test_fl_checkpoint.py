@@ -0,0 +1,86 @@
+"""Round checkpoints: nested states, RNG streams and split-link residuals
+survive a save/resume.
+
+    cd models && python -m pytest -q test_fl_checkpoint.py
+"""
+import random
+
+import numpy as np
+import torch
+
+from fl_checkpoint import AsyncCheckpointer, latest_checkpoint, load_checkpoint, rng_state, set_rng_state
+from split_compression import SplitLink
+
+
+def _draws():
+    return torch.rand(4).tolist(), np.random.rand(4).tolist(), [random.random() for _ in range(4)]
+
+
+def test_resume_replays_every_rng_stream(tmp_path):
+    torch.manual_seed(0); np.random.seed(0); random.seed(0)
+    ckpt = AsyncCheckpointer(str(tmp_path))
+    ckpt.save(3, {"rng": rng_state()})
+    ckpt.close()
+    expected = _draws()
+
+    torch.manual_seed(1); np.random.seed(1); random.seed(1)   # a fresh process
+    round_idx, state = load_checkpoint(latest_checkpoint(str(tmp_path)))
+    set_rng_state(state["rng"])
+    assert round_idx == 3
+    assert _draws() == expected
+
+
+def test_nested_state_and_pruning(tmp_path):
+    model = torch.nn.Linear(3, 2)
+    opt = torch.optim.AdamW(model.parameters())
+    model(torch.ones(1, 3)).sum().backward()
+    opt.step()
+    ckpt = AsyncCheckpointer(str(tmp_path), keep=2)
+    for rnd in range(4):
+        ckpt.save(rnd, {"model": model.state_dict(), "opt": opt.state_dict(), "partition_seed": 42})
+    ckpt.close()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["round_0002.safetensors", "round_0003.safetensors"]
+    round_idx, state = load_checkpoint(latest_checkpoint(str(tmp_path)))
+    assert round_idx == 3 and state["partition_seed"] == 42
+    restored = torch.optim.AdamW(torch.nn.Linear(3, 2).parameters())
+    restored.load_state_dict(state["opt"])
+    assert torch.equal(state["model"]["weight"], model.weight.detach())
+    assert torch.equal(restored.state_dict()["state"][0]["exp_avg"], opt.state_dict()["state"][0]["exp_avg"])
+
+
+def test_legacy_tensor_rng_state():
+    torch.manual_seed(5)
+    legacy = torch.get_rng_state()
+    expected = torch.rand(3)
+    set_rng_state(legacy)
+    assert torch.equal(torch.rand(3), expected)
+
+
+def test_resumed_split_link_continues_its_error_feedback(tmp_path):
+    torch.manual_seed(0)
+    batches = [torch.randn(2, 5, 8, requires_grad=True) for _ in range(4)]
+
+    def run(link, xs):
+        outs = []
+        for x in xs:
+            out = link(x)
+            out.sum().backward()
+            outs.append((out.detach(), x.grad.clone()))
+            x.grad = None
+        return outs
+
+    uninterrupted = run(SplitLink("topk:0.2", "topk:0.3"), batches)
+
+    link = SplitLink("topk:0.2", "topk:0.3")
+    run(link, batches[:2])
+    ckpt = AsyncCheckpointer(str(tmp_path))
+    ckpt.save(1, {"links": [link.state_dict()], "keys": [torch.tensor(list(b"0123456789abcdef"), dtype=torch.uint8)]})
+    ckpt.close()
+    _, state = load_checkpoint(latest_checkpoint(str(tmp_path)))
+    resumed = SplitLink("topk:0.2", "topk:0.3")
+    resumed.load_state_dict(state["links"][0])
+    assert bytes(state["keys"][0].tolist()) == b"0123456789abcdef"
+    for (out, grad), (ref_out, ref_grad) in zip(run(resumed, batches[2:]), uninterrupted[2:]):
+        assert torch.equal(out, ref_out) and torch.equal(grad, ref_grad)
+    assert not torch.equal(run(SplitLink("topk:0.2", "topk:0.3"), batches[2:3])[0][0], uninterrupted[2][0])
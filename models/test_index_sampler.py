@@ -0,0 +1,39 @@
+"""Memory-mapped index files: compact on disk, batched like the sequence
+they store, and swappable under one persistent DataLoader.
+
+    cd models && python -m pytest -q test_index_sampler.py
+"""
+import numpy as np
+import torch
+
+from index_sampler import MemmapBatchSampler, save_index_file
+
+
+def test_index_file_roundtrip(tmp_path):
+    path = save_index_file([5, 3, 9, 0], str(tmp_path / "g0" / "sequence.npy"))
+    assert np.load(path).dtype == np.uint32 and np.load(path).tolist() == [5, 3, 9, 0]
+    big = save_index_file([2 ** 33], str(tmp_path / "big.npy"))
+    assert np.load(big).dtype == np.int64
+    assert list(tmp_path.joinpath("g0").iterdir()) == [tmp_path / "g0" / "sequence.npy"]   # no temp left
+
+
+def test_batches_follow_the_sequence(tmp_path):
+    sequence = np.random.default_rng(0).permutation(23)
+    path = save_index_file(sequence, str(tmp_path / "s.npy"))
+    sampler = MemmapBatchSampler(path, 5)
+    batches = list(sampler)
+    assert len(batches) == len(sampler) == 5
+    assert sum(batches, []) == sequence.tolist() and len(batches[-1]) == 3
+    dropped = MemmapBatchSampler(path, 5, drop_last=True)
+    assert len(dropped) == 4 and list(dropped) == batches[:4]
+
+
+def test_one_persistent_loader_serves_every_epoch(tmp_path):
+    data = torch.arange(100, dtype=torch.float32)
+    epochs = [np.random.default_rng(e).permutation(100)[:30] for e in range(3)]
+    paths = [save_index_file(s, str(tmp_path / f"g{e}.npy")) for e, s in enumerate(epochs)]
+    sampler = MemmapBatchSampler(paths[0], 8)
+    loader = torch.utils.data.DataLoader(data, batch_sampler=sampler, num_workers=1, persistent_workers=True)
+    for path, sequence in zip(paths, epochs):
+        sampler.set_source(path)
+        assert torch.cat(list(loader)).long().tolist() == sequence.tolist()
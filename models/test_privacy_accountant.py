@@ -0,0 +1,44 @@
+"""IncrementalRDPAccountant: same epsilons as a full RDP computation, and
+remaining_steps is the exact budget boundary.
+
+    cd models && python -m pytest -q test_privacy_accountant.py
+"""
+import pytest
+
+from privacy_accountant import IncrementalRDPAccountant, compute_rdp, get_privacy_spent
+
+# Opacus warns when the largest order wins (zero steps, huge noise); expected here
+pytestmark = pytest.mark.filterwarnings("ignore:Optimal order is the largest alpha")
+
+ALPHAS = [1 + x / 10.0 for x in range(1, 100)] + list(range(12, 64))
+
+
+@pytest.fixture
+def accountant():
+    return IncrementalRDPAccountant(sample_rate=0.01, noise_multiplier=1.1, alphas=ALPHAS, delta=1e-5)
+
+
+@pytest.mark.parametrize("steps", [0, 1, 7, 100, 2500])
+def test_matches_full_rdp_computation(accountant, steps):
+    rdp = compute_rdp(q=0.01, noise_multiplier=1.1, steps=steps, orders=ALPHAS)
+    eps, alpha = get_privacy_spent(orders=ALPHAS, rdp=rdp, delta=1e-5)
+    assert accountant.get_privacy_spent(steps) == pytest.approx((eps, alpha), rel=1e-9)
+
+
+@pytest.mark.parametrize("taken", [0, 150, 1000])
+def test_remaining_steps_is_the_budget_boundary(accountant, taken):
+    target = 2.0
+    k = accountant.remaining_steps(taken, target)
+    assert k > 0
+    assert accountant.get_privacy_spent(taken + k)[0] < target
+    assert accountant.get_privacy_spent(taken + k + 1)[0] >= target
+
+
+def test_spent_budget_leaves_no_steps(accountant):
+    spent = accountant.get_privacy_spent(500)[0]
+    assert accountant.remaining_steps(500, spent) == 0
+
+
+def test_large_noise_never_binds():
+    accountant = IncrementalRDPAccountant(sample_rate=1e-4, noise_multiplier=1e4, alphas=ALPHAS, delta=1e-5)
+    assert accountant.remaining_steps(0, 10.0) >= 1 << 39
@@ -0,0 +1,152 @@
+"""
+Cohort-level proofs: one proof per chunk of N patients instead of one per
+patient, with the cohort claim itself proved in-circuit.
+
+The cohort is split into chunks of the circuit's N (cohort_stats.zok). Each
+chunk proof shows that its values lie in [lower, upper] and folds them into
+running totals (count, sum, sum of squares, eligible count) that are only
+ever public as a salted Poseidon commitment, `acc`. Chunk i + 1 opens chunk
+i's acc privately, so the chain carries the cohort totals without revealing
+them, and the last chunk checks the Claim (mean / variance / eligibility
+bounds) on the totals and outputs only whether it holds. The cohort is
+committed to with sha256 over the ordered, salted chunk roots.
+
+The prover knows the data, so it computes the acc chain up front with
+pipeline.evaluate (witness only) and then proves every chunk in parallel.
+
+Values and claim bounds are non-negative integers (scale fractional
+measurements first, e.g. glucose in tenths of mg/dL; a variance bound is in
+squared units).
+
+    pipeline = ProvingPipeline(make_backend(), COHORT_CIRCUIT)
+    claim = Claim(min_mean=50, max_variance=200, min_eligible=30)
+    cohort = prove_cohort(pipeline, ages, 18, 100, 45, 60, claim)
+    holds = verify_cohort(pipeline, cohort, 18, 100, 45, 60, claim)
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+from dataclasses import dataclass, field
+
+from proving import BN254_R, COHORT_PUBLIC, split_public
+
+COHORT_CIRCUIT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cohort_stats.zok")
+N_OUTPUTS = 3  # salted root, acc, verdict
+
+
+def chunk_size(circuit=COHORT_CIRCUIT):
+    """N as declared in the circuit source (`const u32 N = ...;`)."""
+    with open(circuit) as f:
+        match = re.search(r"const\s+u32\s+N\s*=\s*(\d+)\s*;", f.read())
+    if match is None:
+        raise ValueError(f"{circuit} does not declare `const u32 N`")
+    return int(match.group(1))
+
+
+@dataclass
+class Claim:
+    """Bounds the cohort statistics must meet; None leaves one open."""
+    min_mean: int = None
+    max_mean: int = None
+    max_variance: int = None
+    min_eligible: int = None
+
+    def arguments(self, lower, upper):
+        """The circuit's four claim inputs; an open bound becomes one every
+        cohort within [lower, upper] meets."""
+        bounds = [lower if self.min_mean is None else self.min_mean,
+                  upper if self.max_mean is None else self.max_mean,
+                  (upper - lower) ** 2 if self.max_variance is None else self.max_variance,
+                  0 if self.min_eligible is None else self.min_eligible]
+        if any(not isinstance(b, int) or b < 0 for b in bounds):
+            raise ValueError(f"claim bounds must be non-negative integers, got {bounds}")
+        return bounds
+
+
+def _salt(salt_key, *parts):
+    """A blinding field element: random, or derived from `salt_key` and the
+    data it blinds so unchanged chunks get identical (cacheable) arguments."""
+    if salt_key is None:
+        return secrets.randbelow(BN254_R)
+    digest = hmac.new(salt_key, json.dumps(parts).encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest, "big") % BN254_R
+
+
+def chunk_arguments(pipeline, values, lower, upper, elig_lower, elig_upper, claim, salt_key=None):
+    """Circuit arguments for every chunk (the last one padded), chained
+    through the acc of the previous chunk."""
+    n = chunk_size()
+    public = [lower, upper, elig_lower, elig_upper] + claim.arguments(lower, upper)
+    starts = range(0, max(len(values), 1), n)
+    arguments, prev, prev_salt, prev_acc = [], [0, 0, 0, 0], 0, 0
+    for i, start in enumerate(starts):
+        chunk = [int(v) for v in values[start:start + n]]
+        pad = n - len(chunk)
+        totals = [prev[0] + len(chunk), prev[1] + sum(chunk), prev[2] + sum(v * v for v in chunk),
+                  prev[3] + sum(elig_lower <= v <= elig_upper for v in chunk)]
+        acc_salt = _salt(salt_key, "acc", i, totals)
+        args = (chunk + [0] * pad + [1] * len(chunk) + [0] * pad
+                + [_salt(salt_key, "root", i, chunk)] + prev + [prev_salt, acc_salt]
+                + public + [prev_acc, int(i == 0), int(i == len(starts) - 1)])
+        arguments.append(args)
+        if i < len(starts) - 1:
+            prev_acc = pipeline.evaluate(args)[1]   # raises ProofError on out-of-range values
+            prev, prev_salt = totals, acc_salt
+    return arguments
+
+
+def commitment(roots):
+    """Cohort commitment: sha256 over the chunk count and the ordered chunk roots."""
+    h = hashlib.sha256(len(roots).to_bytes(8, "big"))
+    for root in roots:
+        h.update(int(root).to_bytes(32, "big"))
+    return h.hexdigest()
+
+
+@dataclass
+class CohortProof:
+    commitment: str
+    proofs: list = field(default_factory=list)
+
+
+def prove_cohort(pipeline, values, lower, upper, elig_lower, elig_upper, claim, salt_key=None):
+    """Prove a cohort chunk by chunk on the pipeline's worker pool."""
+    proofs = pipeline.prove_many(chunk_arguments(pipeline, values, lower, upper, elig_lower, elig_upper,
+                                                 claim, salt_key))
+    return CohortProof(commitment([split_public(p, N_OUTPUTS)[1][0] for p in proofs]), proofs)
+
+
+def verify_cohort(pipeline, cohort, lower, upper, elig_lower, elig_upper, claim, verify=None):
+    """Check every chunk proof and the chain; -> whether the claim holds.
+
+    Raises ValueError if the proofs are invalid, made for other bounds or
+    another claim, out of order, not chained, or do not match the commitment.
+    `verify(proofs) -> list[bool]` may be a batch verifier; by default each
+    proof is checked with the pipeline's backend.
+    """
+    if not cohort.proofs:
+        raise ValueError("cohort proof has no chunks")
+    expected = [lower, upper, elig_lower, elig_upper] + claim.arguments(lower, upper)
+    last = len(cohort.proofs) - 1
+    roots, prev_acc, verdict = [], 0, 0
+    for i, proof in enumerate(cohort.proofs):
+        public, (root, acc, verdict) = split_public(proof, N_OUTPUTS)
+        if len(public) != COHORT_PUBLIC or public[:-3] != expected:
+            raise ValueError("chunk proof was made for different bounds or another claim")
+        chain_acc, first, is_last = public[-3:]
+        if first != int(i == 0) or is_last != int(i == last):
+            raise ValueError("chunk proofs are out of order")
+        if chain_acc != prev_acc:
+            raise ValueError("chunk proofs do not chain")
+        roots.append(root)
+        prev_acc = acc
+    ok = verify(cohort.proofs) if verify else [pipeline.verify(p) for p in cohort.proofs]
+    if not all(ok):
+        raise ValueError(f"{ok.count(False)} of {len(ok)} chunk proofs failed verification")
+    if commitment(roots) != cohort.commitment:
+        raise ValueError("chunk roots do not match the cohort commitment")
+    return verdict == 1
@@ -0,0 +1,505 @@
+"""
+In-process Pedersen commitments and range proofs on secp256k1.
+
+    C = v*G + r*H        H = hash-to-curve("zk_crs/pedersen/v1/H"), log_G(H) unknown
+
+A range proof shows that C opens to some v in [lower, upper] without
+revealing v. With k = bit length of (upper - lower), both v - lower and
+upper - v are split into k bit commitments. Each bit has a Fiat-Shamir
+OR-proof (CDS) that it commits to 0 or 1, and the bits must recombine to
+C - lower*G and upper*G - C.
+
+Speed comes from three places, all pure Python:
+  - public parameters are precomputed: 8-bit fixed-base tables for G and H
+    (32 x 255 affine points each), so v*G and r*H cost 32 additions
+  - the prover only ever multiplies G and H (it knows the opening of every
+    point it has to simulate), for a whole batch at once with one shared
+    inversion per table window
+  - verification of any number of proofs is one random linear combination
+    of all their equations, i.e. one Pippenger multi-exponentiation
+
+    commitments, blindings = commit_many(scores)
+    proofs = prove_ranges(scores, blindings, lower=0, upper=100, commitments=commitments)
+    ok = verify_ranges(proofs, [(0, 100)] * len(proofs))
+
+No toolchain and no subprocess; `python pedersen.py` runs benchmark().
+"""
+
+import hashlib
+import os
+import secrets
+import shutil
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+
+P = 2 ** 256 - 2 ** 32 - 977
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+G = (0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+     0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8)
+DOMAIN = b"zk_crs/pedersen/v1"
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# ---------------- curve arithmetic (Jacobian, a = 0) ----------------
+# affine points are (x, y) tuples, Jacobian (X, Y, Z); None is infinity
+
+def _double(p):
+    if p is None:
+        return None
+    x, y, z = p
+    if y == 0:
+        return None
+    a = x * x % P
+    b = y * y % P
+    c = b * b % P
+    d = 2 * ((x + b) ** 2 - a - c) % P
+    e = 3 * a % P
+    x3 = (e * e - 2 * d) % P
+    return x3, (e * (d - x3) - 8 * c) % P, 2 * y * z % P
+
+
+def _add_affine(p, q):
+    """Jacobian p + affine q."""
+    if q is None:
+        return p
+    if p is None:
+        return q[0], q[1], 1
+    x1, y1, z1 = p
+    zz = z1 * z1 % P
+    h = (q[0] * zz - x1) % P
+    r = (q[1] * zz * z1 - y1) % P
+    if h == 0:
+        return _double(p) if r == 0 else None
+    hh = h * h % P
+    hhh = h * hh % P
+    v = x1 * hh % P
+    x3 = (r * r - hhh - 2 * v) % P
+    return x3, (r * (v - x3) - y1 * hhh) % P, z1 * h % P
+
+
+def _add(p, q):
+    """Jacobian p + Jacobian q."""
+    if p is None:
+        return q
+    if q is None:
+        return p
+    x1, y1, z1 = p
+    x2, y2, z2 = q
+    z1z1, z2z2 = z1 * z1 % P, z2 * z2 % P
+    u1, u2 = x1 * z2z2 % P, x2 * z1z1 % P
+    s1, s2 = y1 * z2 * z2z2 % P, y2 * z1 * z1z1 % P
+    h, r = (u2 - u1) % P, (s2 - s1) % P
+    if h == 0:
+        return _double(p) if r == 0 else None
+    hh = h * h % P
+    hhh = h * hh % P
+    v = u1 * hh % P
+    x3 = (r * r - hhh - 2 * v) % P
+    return x3, (r * (v - x3) - s1 * hhh) % P, z1 * z2 * h % P
+
+
+def _to_affine(p):
+    if p is None:
+        return None
+    zi = pow(p[2], -1, P)
+    zi2 = zi * zi % P
+    return p[0] * zi2 % P, p[1] * zi2 * zi % P
+
+
+def _inverses(values):
+    """Modular inverses of many non-zero field elements with one inversion."""
+    prefix, acc = [], 1
+    for v in values:
+        prefix.append(acc)
+        acc = acc * v % P
+    inv = pow(acc, -1, P)
+    out = [0] * len(values)
+    for i in range(len(values) - 1, -1, -1):
+        out[i] = inv * prefix[i] % P
+        inv = inv * values[i] % P
+    return out
+
+
+def _batch_to_affine(points):
+    """Affine forms of many Jacobian points with one field inversion."""
+    inverses = iter(_inverses([p[2] for p in points if p is not None]))
+    out = []
+    for p in points:
+        if p is None:
+            out.append(None)
+            continue
+        zi = next(inverses)
+        zi2 = zi * zi % P
+        out.append((p[0] * zi2 % P, p[1] * zi2 * zi % P))
+    return out
+
+
+def _add_affine_many(accs, todo):
+    """accs[j] += q for every (j, q) in todo (distinct j), all affine, sharing
+    one inversion (Montgomery's trick) across the independent additions."""
+    pending = []
+    for j, q in todo:
+        a = accs[j]
+        if a is None:
+            accs[j] = q
+        elif a[0] == q[0]:  # doubling or a + (-a): rare, do it the slow way
+            accs[j] = _to_affine(_add_affine((a[0], a[1], 1), q))
+        else:
+            pending.append((j, a, q))
+    for (j, (x1, y1), (x2, y2)), inv in zip(pending, _inverses([q[0] - a[0] for _, a, q in pending])):
+        lam = (y2 - y1) * inv % P
+        x3 = (lam * lam - x1 - x2) % P
+        accs[j] = x3, (lam * (x1 - x3) - y1) % P
+
+
+def on_curve(q):
+    """Canonical affine point on the curve: coordinates in [0, P), so every
+    point has exactly one encoding."""
+    return q is not None and 0 <= q[0] < P and 0 <= q[1] < P and (q[1] * q[1] - q[0] ** 3 - 7) % P == 0
+
+
+def hash_to_curve(tag):
+    """Try-and-increment: nobody knows the discrete log of the result."""
+    counter = 0
+    while True:
+        x = int.from_bytes(hashlib.sha256(tag + counter.to_bytes(4, "big")).digest(), "big") % P
+        y = pow((x ** 3 + 7) % P, (P + 1) // 4, P)  # P = 3 mod 4
+        if (y * y - x ** 3 - 7) % P == 0:
+            return x, y if y % 2 == 0 else P - y
+        counter += 1
+
+
+class FixedBase:
+    """Precomputed multiples j * 2**(8i) * B for a fixed base B."""
+    WINDOW = 8
+
+    def __init__(self, base):
+        rows, row_base = [], (base[0], base[1], 1)
+        for _ in range(256 // self.WINDOW):
+            row, acc = [], None
+            for _ in range((1 << self.WINDOW) - 1):
+                acc = _add(acc, row_base)
+                row.append(acc)
+            rows.append(row)
+            for _ in range(self.WINDOW):
+                row_base = _double(row_base)
+        flat = _batch_to_affine([p for row in rows for p in row])
+        width = (1 << self.WINDOW) - 1
+        self.table = [flat[i * width:(i + 1) * width] for i in range(len(rows))]
+
+    def mul(self, k):
+        """k * B as a Jacobian point."""
+        k %= N
+        acc, mask, i = None, (1 << self.WINDOW) - 1, 0
+        while k:
+            digit = k & mask
+            if digit:
+                acc = _add_affine(acc, self.table[i][digit - 1])
+            k >>= self.WINDOW
+            i += 1
+        return acc
+
+
+def multi_exp(scalars, points):
+    """sum(s_i * P_i) for affine points (Pippenger bucket method). -> Jacobian"""
+    pairs = [(s % N, q) for s, q in zip(scalars, points) if s % N and q is not None]
+    if not pairs:
+        return None
+    c = max(3, len(pairs).bit_length() - 4)
+    acc = None
+    for window in range((256 + c - 1) // c - 1, -1, -1):
+        for _ in range(c):
+            acc = _double(acc)
+        buckets = [None] * ((1 << c) - 1)
+        shift, mask = window * c, (1 << c) - 1
+        for s, q in pairs:
+            digit = (s >> shift) & mask
+            if digit:
+                buckets[digit - 1] = _add_affine(buckets[digit - 1], q)
+        running, total = None, None
+        for bucket in reversed(buckets):
+            running = _add(running, bucket)
+            total = _add(total, running)
+        acc = _add(acc, total)
+    return acc
+
+
+# ---------------- public parameters ----------------
+
+H = hash_to_curve(DOMAIN + b"/H")
+_TABLES = {}
+
+
+def _tables():
+    if not _TABLES:
+        _TABLES["G"], _TABLES["H"] = FixedBase(G), FixedBase(H)
+    return _TABLES["G"], _TABLES["H"]
+
+
+def _gh(a, b):
+    """a*G + b*H (Jacobian) from the fixed-base tables."""
+    tg, th = _tables()
+    return _add(tg.mul(a), th.mul(b))
+
+
+def _gh_many(pairs):
+    """[a*G + b*H for (a, b) in pairs] as affine points, all accumulated
+    together so every table window costs one shared inversion."""
+    tables = _tables()
+    scalars = [(a % N, b % N) for a, b in pairs]
+    accs = [None] * len(scalars)
+    mask = (1 << FixedBase.WINDOW) - 1
+    for i in range(256 // FixedBase.WINDOW):
+        shift = i * FixedBase.WINDOW
+        for which, table in enumerate(tables):
+            row, todo = table.table[i], []
+            for j, ab in enumerate(scalars):
+                digit = (ab[which] >> shift) & mask
+                if digit:
+                    todo.append((j, row[digit - 1]))
+            _add_affine_many(accs, todo)
+    return accs
+
+
+def commit(value, blinding=None):
+    """(commitment, blinding). The commitment is an affine point."""
+    blinding = secrets.randbelow(N) if blinding is None else blinding % N
+    return _gh_many([(value, blinding)])[0], blinding
+
+
+def commit_many(values, blindings=None):
+    """Commitments to many values in one batch -> (commitments, blindings)."""
+    blindings = [secrets.randbelow(N) for _ in values] if blindings is None else [b % N for b in blindings]
+    return _gh_many(list(zip(values, blindings))), blindings
+
+
+# ---------------- range proofs ----------------
+
+@dataclass
+class BitProof:
+    commitment: tuple
+    r0: tuple
+    r1: tuple
+    e0: int
+    s0: int
+    s1: int
+
+
+@dataclass
+class RangeProof:
+    commitment: tuple
+    lower: int
+    upper: int
+    low: list   # bits of v - lower
+    high: list  # bits of upper - v
+
+
+def _encode(q):
+    return q[0].to_bytes(32, "big") + q[1].to_bytes(32, "big")
+
+
+def _challenge(context, index, c, r0, r1):
+    h = hashlib.sha256(DOMAIN + context + index.to_bytes(2, "big") + _encode(c) + _encode(r0) + _encode(r1))
+    return int.from_bytes(h.digest(), "big") % N
+
+
+def _context(commitment, lower, upper, side):
+    return _encode(commitment) + lower.to_bytes(32, "big", signed=True) + \
+        upper.to_bytes(32, "big", signed=True) + side
+
+
+def range_bits(lower, upper):
+    return max((upper - lower).bit_length(), 1)
+
+
+def prove_ranges(values, blindings, lower, upper, commitments=None):
+    """One RangeProof per value, showing commitment = v*G + r*H with
+    lower <= v <= upper.
+
+    Each of v - lower (blinding r) and upper - v (blinding -r) is split into
+    k bit commitments whose blindings recombine to the parent's, and every
+    bit gets a CDS OR-proof for "opens to 0" / "opens to 1". The prover
+    knows the opening of every point it has to simulate, so all of it is
+    fixed-base work, done for the whole batch in one _gh_many call.
+    """
+    for v in values:
+        if not lower <= v <= upper:
+            raise ValueError(f"{v} is outside [{lower}, {upper}]")
+    if commitments is None:
+        commitments, blindings = commit_many(values, blindings)
+    k = range_bits(lower, upper)
+
+    sides, pairs = [], []
+    for v, r, c in zip(values, blindings, commitments):
+        for side, x, blinding in ((b"L", v - lower, r), (b"U", upper - v, -r)):
+            bits = [(x >> i) & 1 for i in range(k)]
+            rs = [secrets.randbelow(N) for _ in range(k)]
+            rs[0] = (blinding - sum(ri << i for i, ri in enumerate(rs[1:], 1))) % N
+            nonces = [(secrets.randbelow(N), secrets.randbelow(N), secrets.randbelow(N)) for _ in range(k)]
+            for b, ri, (w, e_sim, s_sim) in zip(bits, rs, nonces):
+                # C_i, the real branch's R = w*H, and the simulated branch's
+                # R = s*H - e*(C_i - (1-b)*G) where C_i - (1-b)*G = (2b-1)*G + r_i*H
+                pairs += [(b, ri), (0, w), (-e_sim * (2 * b - 1), s_sim - e_sim * ri)]
+            sides.append((c, side, bits, rs, nonces))
+    points = iter(_gh_many(pairs))
+
+    proofs, halves = [], []
+    for c, side, bits, rs, nonces in sides:
+        context, half = _context(c, lower, upper, side), []
+        for i, (b, ri, (w, e_sim, s_sim)) in enumerate(zip(bits, rs, nonces)):
+            ci, real, sim = next(points), next(points), next(points)
+            r0, r1 = (real, sim) if b == 0 else (sim, real)
+            e_real = (_challenge(context, i, ci, r0, r1) - e_sim) % N
+            s_real = (w + e_real * ri) % N
+            if b == 0:
+                half.append(BitProof(ci, r0, r1, e_real, s_real, s_sim))
+            else:
+                half.append(BitProof(ci, r0, r1, e_sim, s_sim, s_real))
+        halves.append(half)
+        if side == b"U":
+            proofs.append(RangeProof(c, lower, upper, halves[-2], halves[-1]))
+    return proofs
+
+
+def prove_range(value, blinding, lower, upper, commitment=None):
+    return prove_ranges([value], None if blinding is None else [blinding], lower, upper,
+                        None if commitment is None else [commitment])[0]
+
+
+def _equations(proof, weight, terms):
+    """Add the weighted equations of `proof` to `terms` {point: scalar} and
+    return the (G, H) coefficients; the total is O iff (with overwhelming
+    probability) every equation holds."""
+    g_coef, h_coef = 0, 0
+    c = proof.commitment
+    k = range_bits(proof.lower, proof.upper)
+    if len(proof.low) != k or len(proof.high) != k or not on_curve(c):
+        raise ValueError("malformed range proof")
+    for side, bits, sign, g_target in ((b"L", proof.low, 1, -proof.lower), (b"U", proof.high, -1, proof.upper)):
+        context = _context(c, proof.lower, proof.upper, side)
+        # recombination: sign*C + g_target*G - sum 2**i C_i = O
+        z = weight()
+        terms[c] = terms.get(c, 0) + z * sign
+        g_coef += z * g_target
+        for i, bp in enumerate(bits):
+            if not (on_curve(bp.commitment) and on_curve(bp.r0) and on_curve(bp.r1)):
+                raise ValueError("malformed range proof")
+            e1 = (_challenge(context, i, bp.commitment, bp.r0, bp.r1) - bp.e0) % N
+            # s0*H - e0*C_i - R0 = O  and  s1*H - e1*(C_i - G) - R1 = O
+            z0, z1 = weight(), weight()
+            h_coef += z0 * bp.s0 + z1 * bp.s1
+            g_coef += z1 * e1
+            terms[bp.commitment] = terms.get(bp.commitment, 0) - z * (1 << i) - z0 * bp.e0 - z1 * e1
+            terms[bp.r0] = terms.get(bp.r0, 0) - z0
+            terms[bp.r1] = terms.get(bp.r1, 0) - z1
+    return g_coef, h_coef
+
+
+def _bounds_match(proof, bounds):
+    """The proof is for the range the verifier expects, not one the prover
+    picked (a score of 150 proved on [0, 1000] says nothing about [0, 100])."""
+    lower, upper = bounds
+    return getattr(proof, "lower", None) == lower and getattr(proof, "upper", None) == upper
+
+
+def verify_range_batch(proofs, bounds):
+    """True iff every proof verifies on its expected (lower, upper) in
+    `bounds`: one multi-exponentiation for the lot."""
+    def weight():
+        return secrets.randbits(128) | 1
+
+    proofs, bounds = list(proofs), list(bounds)
+    if len(proofs) != len(bounds) or not all(map(_bounds_match, proofs, bounds)):
+        return False
+    terms, g_coef, h_coef = {}, 0, 0
+    try:
+        for proof in proofs:
+            g, h = _equations(proof, weight, terms)
+            g_coef += g
+            h_coef += h
+    except (ValueError, TypeError, AttributeError, OverflowError):
+        return False
+    total = _add(multi_exp(list(terms.values()), list(terms)), _gh(g_coef, h_coef))
+    return total is None
+
+
+def verify_ranges(proofs, bounds):
+    """One bool per proof, `bounds` holding the expected (lower, upper) of
+    each: proofs for other bounds are rejected up front, the rest are
+    batch-verified and bisected when the batch fails."""
+    proofs, bounds = list(proofs), list(bounds)
+    if len(proofs) != len(bounds):
+        raise ValueError(f"{len(proofs)} proofs but {len(bounds)} expected bounds")
+    ok = [_bounds_match(p, b) for p, b in zip(proofs, bounds)]
+    idx = [i for i, matched in enumerate(ok) if matched]
+    for i, valid in zip(idx, _verify_bisect([proofs[i] for i in idx], [bounds[i] for i in idx])):
+        ok[i] = valid
+    return ok
+
+
+def _verify_bisect(proofs, bounds):
+    if not proofs:
+        return []
+    if verify_range_batch(proofs, bounds):
+        return [True] * len(proofs)
+    if len(proofs) == 1:
+        return [False]
+    mid = len(proofs) // 2
+    return _verify_bisect(proofs[:mid], bounds[:mid]) + _verify_bisect(proofs[mid:], bounds[mid:])
+
+
+def verify_range(proof, lower, upper):
+    return verify_range_batch([proof], [(lower, upper)])
+
+
+# ---------------- benchmark ----------------
+
+def benchmark(n=200, lower=0, upper=100):
+    """Per-value cost of commit + range proof + verification, against the
+    subprocess path of proof_handler (or its process launches alone when
+    zokrates is not installed)."""
+    _tables()
+    values = [secrets.randbelow(upper - lower + 1) + lower for _ in range(n)]
+
+    start = time.perf_counter()
+    proofs = prove_ranges(values, None, lower, upper)
+    t_prove = (time.perf_counter() - start) / n
+
+    start = time.perf_counter()
+    assert all(verify_range(p, lower, upper) for p in proofs[:20])
+    t_verify = (time.perf_counter() - start) / 20
+
+    start = time.perf_counter()
+    assert verify_range_batch(proofs, [(lower, upper)] * n)
+    t_batch = (time.perf_counter() - start) / n
+
+    if shutil.which("zokrates"):
+        # the proof_handler path: compute-witness + generate-proof, then verify
+        from proving import DEFAULT_CACHE_DIR, ZoKratesBackend
+        backend = ZoKratesBackend()
+        artifacts = backend.setup(os.path.join(HERE, "mean_variance.zok"), DEFAULT_CACHE_DIR)
+        start = time.perf_counter()
+        for v in values[:10]:
+            assert backend.verify(artifacts, backend.prove(artifacts, [v, lower, upper, v, 0]))
+        label = "zokrates prove + verify"
+    else:
+        # lower bound for the same path: its three process launches, no proving work
+        label = "3 process launches (no zokrates)"
+        start = time.perf_counter()
+        for _ in range(10):
+            for _ in range(3):
+                subprocess.run([shutil.which("true") or sys.executable], capture_output=True)
+    t_sub = (time.perf_counter() - start) / 10
+
+    print(f"{n} values in [{lower}, {upper}] ({range_bits(lower, upper)} bits)")
+    print(f"  prove (commit + range proof) {1000 * t_prove:8.2f} ms/value")
+    print(f"  verify, one by one           {1000 * t_verify:8.2f} ms/value")
+    print(f"  verify, one batch            {1000 * t_batch:8.2f} ms/value")
+    print(f"  subprocess: {label}  {1000 * t_sub:.2f} ms/value")
+    return {"prove": t_prove, "verify": t_verify, "verify_batch": t_batch, "subprocess": t_sub}
+
+
+if __name__ == "__main__":
+    benchmark()
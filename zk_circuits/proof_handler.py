@@ -1,14 +1,65 @@
-import subprocess
+import os
+
+import pedersen
+from proving import ProvingPipeline, make_backend
+from verifier import VerifierService
+
+CIRCUIT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mean_variance.zok")
+
+_pipeline = None
+_verifier = None
+
+def get_pipeline():
+    """The mean_variance pipeline, compiled and set up once per process."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = ProvingPipeline(make_backend(), CIRCUIT)
+    return _pipeline
+
+def get_verifier():
+    """Verification keys are loaded once and reused for every round."""
+    global _verifier
+    if _verifier is None:
+        _verifier = VerifierService(get_pipeline().backend, {"mean_variance": CIRCUIT})
+    return _verifier
+
+def _arguments(participant_data):
+    return [participant_data['score'], participant_data['lower'], participant_data['upper'],
+            participant_data['mean'], participant_data['variance']]
+
+def generate_proofs(participants):
+    """Proofs for many participants, proved in parallel; unchanged data is served from cache."""
+    return get_pipeline().prove_many([_arguments(p) for p in participants])
 
 def generate_proof(participant_data):
-    input_data = f"{participant_data['score']} {participant_data['lower']} {participant_data['upper']} {participant_data['mean']} {participant_data['variance']}"
-    
-    result = subprocess.run(
-        ["zokrates", "compute-witness", "-a"] + input_data.split(),
-        capture_output=True, text=True
-    )
-    return result.stdout
+    return generate_proofs([participant_data])[0]
+
+def verify_proofs(proofs):
+    """One bool per proof, checked as a batch."""
+    return get_verifier().verify_batch(proofs, "mean_variance")
 
 def verify_proof(proof):
-    print(f"Verifying proof: {proof[:50]}...")
-    return "Witness computed successfully" in proof
+    return verify_proofs([proof])[0]
+
+def generate_range_proofs(participants):
+    """In-process alternative for the bounds check of mean_variance: a Pedersen
+    commitment to each (integer) score with a range proof on [lower, upper].
+    The score stays hidden; -> (proofs, blindings), the blindings being the
+    participants' openings."""
+    proofs, blindings = [None] * len(participants), [None] * len(participants)
+    groups = {}
+    for i, p in enumerate(participants):
+        groups.setdefault((int(p['lower']), int(p['upper'])), []).append(i)
+    for (lower, upper), idx in groups.items():
+        scores = [int(participants[i]['score']) for i in idx]
+        commitments, rs = pedersen.commit_many(scores)
+        for i, proof, r in zip(idx, pedersen.prove_ranges(scores, rs, lower, upper, commitments), rs):
+            proofs[i], blindings[i] = proof, r
+    return proofs, blindings
+
+def verify_range_proofs(proofs, participants):
+    """One bool per range proof, all checked in one multi-exponentiation.
+    Each proof must be for its participant's [lower, upper]; the bounds
+    carried in the proof are the prover's claim, not the verifier's."""
+    bounds = [(int(p['lower']), int(p['upper'])) for p in participants]
+    return pedersen.verify_ranges(proofs, bounds)
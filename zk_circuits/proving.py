@@ -0,0 +1,367 @@
+"""
+Proving pipeline for the zk_circuits.
+
+  - circuits are compiled and set up once; the program, proving key and
+    verification key are cached on disk under a key of the circuit source,
+    the proving scheme and the toolchain version, so changing any of them
+    sets up afresh instead of reusing stale keys
+  - witness generation + proving of many inputs run on a worker pool
+  - proofs are cached by (artifact key, input hash), so participants whose
+    data did not change are not proved again in later rounds
+  - the prover is pluggable: ZoKratesBackend drives the real toolchain,
+    PythonBackend is a toolchain-free stand-in for tests and local runs
+
+    pipeline = ProvingPipeline(ZoKratesBackend(), "zk_circuits/mean_variance.zok")
+    proofs = pipeline.prove_many([[72, 0, 100, 70, 25], ...])
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "zk_crs")
+
+
+class ProofError(RuntimeError):
+    """Witness generation or proving failed (e.g. an assertion did not hold)."""
+
+
+def circuit_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def artifact_key(circuit_digest, scheme, version):
+    """Cache key of a circuit's artifacts and proofs."""
+    return hashlib.sha256(json.dumps([circuit_digest, scheme, version]).encode()).hexdigest()
+
+
+def input_hash(circuit_digest, inputs):
+    payload = json.dumps([circuit_digest, [str(x) for x in inputs]]).encode()
+    return hashlib.sha256(payload).hexdigest()
+
+
+@dataclass
+class CircuitArtifacts:
+    """Everything a backend needs to prove/verify one compiled circuit."""
+    backend: str
+    circuit: str          # circuit name (file stem)
+    circuit_hash: str
+    directory: str
+    program: str = None
+    abi: str = None
+    proving_key: str = None
+    verification_key: str = None
+    key: str = None       # artifact_key(circuit_hash, scheme, toolchain version)
+
+
+class ProverBackend:
+    """Interface of a proving backend."""
+    name = None
+
+    def setup(self, circuit_path, cache_dir):
+        """Compile + key generation, or reuse what is cached. -> CircuitArtifacts"""
+        raise NotImplementedError
+
+    def prove(self, artifacts, inputs):
+        """Proof (a JSON-serialisable dict) for one list of circuit arguments."""
+        raise NotImplementedError
+
+    def evaluate(self, artifacts, inputs):
+        """The circuit's return values (ints) for one list of arguments; the
+        witness only, no proof."""
+        raise NotImplementedError
+
+    def verify(self, artifacts, proof):
+        raise NotImplementedError
+
+
+def _run(cmd, cwd=None):
+    result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise ProofError(f"{' '.join(cmd[:2])} failed: {result.stderr.strip() or result.stdout.strip()}")
+    return result.stdout
+
+
+class ZoKratesBackend(ProverBackend):
+    """The `zokrates` CLI (compile / setup / compute-witness / generate-proof / verify)."""
+    name = "zokrates"
+
+    def __init__(self, binary="zokrates", proving_scheme="g16"):
+        self.binary = binary
+        self.proving_scheme = proving_scheme
+        if shutil.which(binary) is None:
+            raise FileNotFoundError(f"'{binary}' not found on PATH; install ZoKrates or use PythonBackend")
+        self.version = _run([binary, "--version"]).strip()
+
+    def setup(self, circuit_path, cache_dir):
+        digest = circuit_hash(circuit_path)
+        key = artifact_key(digest, self.proving_scheme, self.version)
+        directory = os.path.join(cache_dir, self.name, key)
+        artifacts = CircuitArtifacts(
+            self.name, os.path.splitext(os.path.basename(circuit_path))[0], digest, directory,
+            program=os.path.join(directory, "out"), abi=os.path.join(directory, "abi.json"),
+            proving_key=os.path.join(directory, "proving.key"),
+            verification_key=os.path.join(directory, "verification.key"), key=key)
+        if os.path.exists(artifacts.verification_key):
+            return artifacts
+
+        # build next to the cache entry, then publish it with one rename
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        build = tempfile.mkdtemp(prefix=key[:12] + ".", dir=os.path.dirname(directory))
+        _run([self.binary, "compile", "-i", os.path.abspath(circuit_path),
+              "-o", "out", "-s", "abi.json"], cwd=build)
+        _run([self.binary, "setup", "-i", "out", "-s", self.proving_scheme,
+              "-p", "proving.key", "-v", "verification.key"], cwd=build)
+        try:
+            os.replace(build, directory)
+        except OSError:  # another process published it first
+            shutil.rmtree(build, ignore_errors=True)
+        return artifacts
+
+    def evaluate(self, artifacts, inputs):
+        with tempfile.TemporaryDirectory(prefix="zk_witness_") as work:
+            out = _run([self.binary, "compute-witness", "-i", artifacts.program, "-s", artifacts.abi,
+                        "-o", os.path.join(work, "witness"), "--verbose", "-a"] + [str(x) for x in inputs])
+        # --verbose prints the return values as ABI JSON after "Witness:"
+        match = re.search(r"Witness:\s*(\[.*?\]|\"[^\"]*\")", out, re.S)
+        if match is None:
+            raise ProofError("compute-witness printed no return values")
+        values = json.loads(match.group(1))
+        return [int(v) for v in (values if isinstance(values, list) else [values])]
+
+    def prove(self, artifacts, inputs):
+        with tempfile.TemporaryDirectory(prefix="zk_prove_") as work:
+            witness = os.path.join(work, "witness")
+            proof_path = os.path.join(work, "proof.json")
+            _run([self.binary, "compute-witness", "-i", artifacts.program, "-s", artifacts.abi,
+                  "-o", witness, "-a"] + [str(x) for x in inputs])
+            _run([self.binary, "generate-proof", "-i", artifacts.program, "-s", self.proving_scheme,
+                  "-p", artifacts.proving_key, "-w", witness, "-j", proof_path])
+            with open(proof_path) as f:
+                return json.load(f)
+
+    def verify(self, artifacts, proof):
+        with tempfile.TemporaryDirectory(prefix="zk_verify_") as work:
+            proof_path = os.path.join(work, "proof.json")
+            with open(proof_path, "w") as f:
+                json.dump(proof, f)
+            result = subprocess.run([self.binary, "verify", "-v", artifacts.verification_key, "-j", proof_path],
+                                    capture_output=True, text=True)
+            return result.returncode == 0 and "PASSED" in result.stdout
+
+
+# ---------------- pure-Python stand-in ----------------
+
+def _mean_variance(x, lower_bound, upper_bound, claimed_mean, claimed_variance):
+    if not lower_bound <= x <= upper_bound:
+        raise ProofError("x is outside [lower_bound, upper_bound]")
+    if claimed_mean < 0 or claimed_variance < 0:
+        raise ProofError("claimed mean and variance must be non-negative")
+    return [1]
+
+
+BN254_R = 21888242871839275222246405745257275088548364400416034343698204186575808495617
+
+
+def _h2(a, b):
+    """Two-to-one hash into the BN254 scalar field (stands in for Poseidon)."""
+    return _hash(a, b)
+
+
+def _hash(*xs):
+    """Many-to-one hash into the BN254 scalar field (stands in for Poseidon)."""
+    digest = hashlib.sha256(b"".join(x.to_bytes(32, "big") for x in xs)).digest()
+    return int.from_bytes(digest, "big") % BN254_R
+
+
+COHORT_PUBLIC = 11  # lower, upper, elig_lower, elig_upper, 4 claim bounds, prev_acc, first, last
+
+
+def _cohort_stats(*args):
+    n = (len(args) - 7 - COHORT_PUBLIC) // 2
+    values, valid = args[:n], args[n:2 * n]
+    salt, prev, prev_salt, acc_salt = args[2 * n], args[2 * n + 1:2 * n + 5], args[2 * n + 5], args[2 * n + 6]
+    (lower, upper, elig_lower, elig_upper, min_mean, max_mean, max_variance, min_eligible,
+     prev_acc, first, last) = args[2 * n + 7:]
+    if first not in (0, 1) or last not in (0, 1):
+        raise ProofError("first and last must be 0 or 1")
+    if first and any(prev):
+        raise ProofError("the first chunk starts from zero totals")
+    if not first and prev_acc != _hash(*prev, prev_salt):
+        raise ProofError("prev does not open prev_acc")
+    count, total, sumsq, eligible = prev
+    for v, ok in zip(values, valid):
+        if ok not in (0, 1) or (ok == 0 and v != 0):
+            raise ProofError("padding slots must have valid = 0 and value = 0")
+        if ok and not lower <= v <= upper:
+            raise ProofError(f"value {v} is outside [{lower}, {upper}]")
+        count, total, sumsq = count + ok, total + v, sumsq + v * v
+        eligible += ok and elig_lower <= v <= elig_upper
+    layer = [_h2(v, ok) for v, ok in zip(values, valid)]
+    while len(layer) > 1:
+        layer = [_h2(layer[i], layer[i + 1]) for i in range(0, len(layer), 2)]
+    holds = (count != 0 and min_mean * count <= total <= max_mean * count
+             and count * sumsq - total * total <= max_variance * count * count and eligible >= min_eligible)
+    return [_h2(layer[0], salt), _hash(count, total, sumsq, eligible, acc_salt), int(bool(last and holds))]
+
+
+def _n_private_cohort(args):
+    return len(args) - COHORT_PUBLIC
+
+
+# circuit name -> (statement, number of leading private arguments, or a function of the arguments)
+PYTHON_PROGRAMS = {"mean_variance": (_mean_variance, 0),
+                   "cohort_stats": (_cohort_stats, _n_private_cohort)}
+
+
+def split_public(proof, n_outputs):
+    """(public inputs, outputs) of a proof as ints. Both backends list the
+    public inputs followed by the circuit's return values."""
+    values = [int(v, 16) if isinstance(v, str) else int(v) for v in proof["inputs"]]
+    return values[:len(values) - n_outputs], values[len(values) - n_outputs:]
+
+
+class PythonBackend(ProverBackend):
+    """Evaluates the circuit's statement in Python and MACs (circuit, public
+    inputs, outputs) with a key derived from the circuit hash.
+
+    A stand-in with the same interface and failure behaviour as the real
+    prover - it is NOT zero-knowledge and not publicly verifiable.
+    """
+    name = "python"
+    scheme = "python-hmac"
+    version = "1"
+
+    def __init__(self, secret=b"zk_crs-python-backend", programs=None):
+        self.secret = secret
+        self.programs = dict(PYTHON_PROGRAMS, **(programs or {}))
+
+    def setup(self, circuit_path, cache_dir):
+        name = os.path.splitext(os.path.basename(circuit_path))[0]
+        if name not in self.programs:
+            raise ProofError(f"no Python program registered for circuit '{name}'")
+        digest = circuit_hash(circuit_path)
+        return CircuitArtifacts(self.name, name, digest, None, key=artifact_key(digest, self.scheme, self.version))
+
+    def _key(self, artifacts):
+        return hmac.new(self.secret, artifacts.circuit_hash.encode(), hashlib.sha256).digest()
+
+    def _tag(self, artifacts, public):
+        message = json.dumps([artifacts.circuit_hash, public]).encode()
+        return hmac.new(self._key(artifacts), message, hashlib.sha256).hexdigest()
+
+    def evaluate(self, artifacts, inputs):
+        program, _ = self.programs[artifacts.circuit]
+        return [int(v) for v in program(*[int(x) for x in inputs])]
+
+    def prove(self, artifacts, inputs):
+        program, n_private = self.programs[artifacts.circuit]
+        inputs = [int(x) for x in inputs]
+        if callable(n_private):
+            n_private = n_private(inputs)
+        public = inputs[n_private:] + [int(v) for v in program(*inputs)]
+        return {"scheme": self.scheme, "circuit": artifacts.circuit_hash,
+                "inputs": public, "tag": self._tag(artifacts, public)}
+
+    def verify(self, artifacts, proof):
+        if proof.get("scheme") != self.scheme or proof.get("circuit") != artifacts.circuit_hash:
+            return False
+        return hmac.compare_digest(self._tag(artifacts, proof["inputs"]), proof.get("tag", ""))
+
+
+def make_backend(name=None):
+    """Backend by name; default from ZK_PROVER_BACKEND (zokrates)."""
+    name = name or os.environ.get("ZK_PROVER_BACKEND", "zokrates")
+    if name == "zokrates":
+        return ZoKratesBackend()
+    if name == "python":
+        return PythonBackend()
+    raise ValueError(f"unknown prover backend '{name}'")
+
+
+# ---------------- pipeline ----------------
+
+class ProvingPipeline:
+    """One circuit, set up once, proving many inputs in parallel with a
+    proof cache keyed by input hash (in memory and under cache_dir)."""
+
+    def __init__(self, backend, circuit_path, workers=None, cache_dir=DEFAULT_CACHE_DIR):
+        self.backend = backend
+        self.cache_dir = cache_dir
+        self.artifacts = backend.setup(circuit_path, cache_dir)
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ThreadPoolExecutor(self.workers)  # proving runs in subprocesses; threads suffice
+        self._proofs = {}
+        self._lock = threading.Lock()
+        self._proof_dir = os.path.join(cache_dir, "proofs", backend.name, self.artifacts.key)
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, key):
+        with self._lock:
+            if key in self._proofs:
+                return self._proofs[key]
+        path = os.path.join(self._proof_dir, key + ".json")
+        if os.path.exists(path):
+            with open(path) as f:
+                proof = json.load(f)
+            with self._lock:
+                self._proofs[key] = proof
+            return proof
+        return None
+
+    def _store(self, key, proof):
+        with self._lock:
+            self._proofs[key] = proof
+        os.makedirs(self._proof_dir, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self._proof_dir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(proof, f)
+        os.replace(tmp, os.path.join(self._proof_dir, key + ".json"))
+
+    def _prove(self, key, inputs):
+        proof = self.backend.prove(self.artifacts, inputs)
+        self._store(key, proof)
+        return proof
+
+    def prove_many(self, inputs_list):
+        """Proofs for every argument list, in order. Cached inputs are not
+        re-proved and duplicates within the batch are proved once; a failing
+        input raises ProofError."""
+        keys = [input_hash(self.artifacts.key, inputs) for inputs in inputs_list]
+        results, pending = {}, {}
+        for key, inputs in zip(keys, inputs_list):
+            if key in results or key in pending:
+                continue
+            proof = self._cached(key)
+            if proof is not None:
+                results[key] = proof
+                self.hits += 1
+            else:
+                pending[key] = self._pool.submit(self._prove, key, inputs)
+                self.misses += 1
+        for key, future in pending.items():
+            results[key] = future.result()
+        return [results[key] for key in keys]
+
+    def prove(self, inputs):
+        return self.prove_many([inputs])[0]
+
+    def evaluate(self, inputs):
+        """Return values for one argument list, without proving."""
+        return self.backend.evaluate(self.artifacts, inputs)
+
+    def verify(self, proof):
+        return self.backend.verify(self.artifacts, proof)
+
+    def close(self):
+        self._pool.shutdown()
@@ -0,0 +1,129 @@
+"""Cohort claims: proved in-circuit, chained across chunks, sound against
+re-ordering, splicing, other bounds and forged running totals.
+
+Runs on the Python stand-in backend (same statement as cohort_stats.zok).
+
+    cd zk_circuits && python -m pytest -q test_cohort_proofs.py
+"""
+import random
+
+import pytest
+
+from cohort_proofs import (COHORT_CIRCUIT, N_OUTPUTS, Claim, CohortProof, chunk_arguments, chunk_size, prove_cohort,
+                           verify_cohort)
+from proving import COHORT_PUBLIC, ProofError, ProvingPipeline, PythonBackend, split_public
+
+BOUNDS = (18, 100, 45, 60)
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    pipeline = ProvingPipeline(PythonBackend(), COHORT_CIRCUIT, workers=2, cache_dir=str(tmp_path))
+    yield pipeline
+    pipeline.close()
+
+
+@pytest.fixture
+def ages():
+    rng = random.Random(0)
+    return [rng.randint(18, 90) for _ in range(3 * chunk_size() + 17)]
+
+
+def _stats(values):
+    n, s = len(values), sum(values)
+    return s / n, sum(v * v for v in values) / n - (s / n) ** 2, sum(45 <= v <= 60 for v in values)
+
+
+def _roundtrip(pipeline, values, claim):
+    cohort = prove_cohort(pipeline, values, *BOUNDS, claim)
+    return verify_cohort(pipeline, cohort, *BOUNDS, claim)
+
+
+def test_claim_verdict_matches_the_data(pipeline, ages):
+    mean, variance, eligible = _stats(ages)
+    assert _roundtrip(pipeline, ages, Claim(min_mean=int(mean), max_mean=int(mean) + 1,
+                                            max_variance=int(variance) + 1, min_eligible=eligible))
+    assert not _roundtrip(pipeline, ages, Claim(min_mean=int(mean) + 1))
+    assert not _roundtrip(pipeline, ages, Claim(max_mean=int(mean)))
+    assert not _roundtrip(pipeline, ages, Claim(max_variance=int(variance)))
+    assert not _roundtrip(pipeline, ages, Claim(min_eligible=eligible + 1))
+
+
+def test_only_commitments_and_verdict_are_public(pipeline, ages):
+    claim = Claim(min_mean=40)
+    cohort = prove_cohort(pipeline, ages, *BOUNDS, claim)
+    assert len(cohort.proofs) == 4
+    for i, proof in enumerate(cohort.proofs):
+        public, (_, _, verdict) = split_public(proof, N_OUTPUTS)
+        assert len(public) == COHORT_PUBLIC
+        assert public[:-3] == list(BOUNDS) + claim.arguments(18, 100)
+        assert verdict == (1 if i == 3 else 0)      # intermediate chunks say nothing
+    # salts: proving the same cohort twice gives unlinkable roots and accs
+    again = prove_cohort(pipeline, ages, *BOUNDS, claim)
+    assert again.commitment != cohort.commitment
+
+
+def test_out_of_range_value_cannot_be_proved(pipeline, ages):
+    with pytest.raises(ProofError):
+        prove_cohort(pipeline, ages + [150], *BOUNDS, Claim())
+
+
+def test_proof_for_a_weaker_claim_is_rejected(pipeline, ages):
+    cohort = prove_cohort(pipeline, ages, *BOUNDS, Claim(min_mean=20))
+    with pytest.raises(ValueError, match="another claim"):
+        verify_cohort(pipeline, cohort, *BOUNDS, Claim(min_mean=60))
+    with pytest.raises(ValueError, match="different bounds"):
+        verify_cohort(pipeline, cohort, 0, 1000, 45, 60, Claim(min_mean=20))
+
+
+def test_reordered_dropped_or_spliced_chunks_are_rejected(pipeline, ages):
+    claim = Claim(min_mean=40)
+    cohort = prove_cohort(pipeline, ages, *BOUNDS, claim)
+    p = cohort.proofs
+    with pytest.raises(ValueError, match="do not chain"):
+        verify_cohort(pipeline, CohortProof(cohort.commitment, [p[0], p[2], p[1], p[3]]), *BOUNDS, claim)
+    with pytest.raises(ValueError, match="out of order"):
+        verify_cohort(pipeline, CohortProof(cohort.commitment, [p[1], p[0], p[2], p[3]]), *BOUNDS, claim)
+    with pytest.raises(ValueError, match="out of order"):
+        verify_cohort(pipeline, CohortProof(cohort.commitment, p[:3]), *BOUNDS, claim)
+    with pytest.raises(ValueError, match="do not chain"):
+        verify_cohort(pipeline, CohortProof(cohort.commitment, [p[0], p[2], p[3]]), *BOUNDS, claim)
+    other = prove_cohort(pipeline, [60] * len(ages), *BOUNDS, claim)
+    with pytest.raises(ValueError, match="do not chain"):
+        verify_cohort(pipeline, CohortProof(cohort.commitment, p[:3] + other.proofs[3:]), *BOUNDS, claim)
+    with pytest.raises(ValueError, match="commitment"):
+        verify_cohort(pipeline, CohortProof(other.commitment, p), *BOUNDS, claim)
+
+
+def test_tampered_outputs_fail_verification(pipeline, ages):
+    claim = Claim(min_mean=80)
+    cohort = prove_cohort(pipeline, ages, *BOUNDS, claim)
+    last = dict(cohort.proofs[-1])
+    last["inputs"] = last["inputs"][:-1] + [1]      # flip the verdict to "holds"
+    with pytest.raises(ValueError, match="failed verification"):
+        verify_cohort(pipeline, CohortProof(cohort.commitment, cohort.proofs[:-1] + [last]), *BOUNDS, claim)
+
+
+def test_forged_running_totals_cannot_be_proved(pipeline, ages):
+    args = chunk_arguments(pipeline, ages, *BOUNDS, Claim(min_mean=80))
+    n = chunk_size()
+    forged = list(args[-1])
+    forged[2 * n + 2] += 10_000                     # inflate the carried-in sum
+    with pytest.raises(ProofError, match="prev_acc"):
+        pipeline.prove(forged)
+    restart = list(args[-1])
+    restart[-2] = 1                                 # claim to be a fresh first chunk
+    with pytest.raises(ProofError, match="zero totals"):
+        pipeline.prove(restart)
+
+
+def test_salt_key_makes_unchanged_cohorts_cacheable(pipeline, ages):
+    claim = Claim(min_mean=40)
+    first = prove_cohort(pipeline, ages, *BOUNDS, claim, salt_key=b"site-secret")
+    misses = pipeline.misses
+    second = prove_cohort(pipeline, ages, *BOUNDS, claim, salt_key=b"site-secret")
+    assert second.commitment == first.commitment and pipeline.misses == misses
+
+
+def test_empty_cohort_never_satisfies_a_claim(pipeline):
+    assert not _roundtrip(pipeline, [], Claim())
@@ -0,0 +1,96 @@
+"""Pedersen range proofs: batch verification is sound against other bounds,
+tampered and forged bit proofs and non-canonical points.
+
+    cd zk_circuits && python -m pytest -q test_pedersen.py
+"""
+import dataclasses
+import secrets
+
+import pytest
+
+import pedersen
+from pedersen import (BitProof, N, P, commit_many, prove_range, prove_ranges, verify_range,
+                      verify_range_batch, verify_ranges)
+
+
+def _point(a, b):
+    return pedersen._to_affine(pedersen._gh(a, b))
+
+
+def _simulated_bit(value, blinding):
+    """A bit proof for a commitment to `value` with both CDS branches
+    simulated, i.e. made without knowing which branch is real."""
+    e0, e1, s0, s1 = (secrets.randbelow(N) for _ in range(4))
+    c = _point(value, blinding)
+    r0 = _point(-e0 * value, s0 - e0 * blinding)             # s0*H - e0*C
+    r1 = _point(-e1 * (value - 1), s1 - e1 * blinding)       # s1*H - e1*(C - G)
+    return BitProof(c, r0, r1, e0, s0, s1)
+
+
+def test_valid_proofs_batch_and_bisect():
+    scores = [0, 17, 42, 99, 100]
+    commitments, blindings = commit_many(scores)
+    proofs = prove_ranges(scores, blindings, 0, 100, commitments)
+    assert [p.commitment for p in proofs] == commitments
+    assert verify_range_batch(proofs, [(0, 100)] * 5)
+    bad = dataclasses.replace(proofs[2], low=proofs[3].low)
+    assert verify_ranges(proofs[:2] + [bad] + proofs[3:], [(0, 100)] * 5) == [True, True, False, True, True]
+
+
+def test_proof_for_other_bounds_is_rejected():
+    proof = prove_range(150, None, 0, 1000)
+    assert verify_range(proof, 0, 1000)
+    assert not verify_range(proof, 0, 100)
+    relabelled = dataclasses.replace(proof, lower=0, upper=1023)            # same bit length, other context
+    assert not verify_range(relabelled, 0, 1023)
+    narrowed = dataclasses.replace(proof, upper=100)
+    assert not verify_range(narrowed, 0, 100)
+    ok = prove_range(50, None, 0, 100)
+    assert verify_ranges([ok, proof], [(0, 100), (0, 100)]) == [True, False]
+    with pytest.raises(ValueError):
+        verify_ranges([ok, proof], [(0, 100)])
+
+
+def test_out_of_range_value_cannot_be_proved():
+    with pytest.raises(ValueError):
+        prove_range(101, None, 0, 100)
+
+
+def test_tampered_proofs_are_rejected():
+    proof = prove_range(42, None, 0, 100)
+    other = prove_range(42, None, 0, 100)
+    bit = proof.low[1]
+    tampered = [
+        dataclasses.replace(proof, commitment=other.commitment),
+        dataclasses.replace(proof, low=proof.low[:1] + [dataclasses.replace(bit, e0=(bit.e0 + 1) % N)] + proof.low[2:]),
+        dataclasses.replace(proof, high=proof.high[:-1] + [other.high[-1]]),
+        dataclasses.replace(proof, low=proof.low[:-1]),
+    ]
+    assert verify_ranges(tampered, [(0, 100)] * len(tampered)) == [False] * len(tampered)
+
+
+def test_huge_and_aliased_coordinates_return_false():
+    proof = prove_range(7, None, 0, 100)
+    x, y = proof.commitment
+    bit = proof.low[0]
+    for bad in (dataclasses.replace(proof, commitment=(x + P, y)),
+                dataclasses.replace(proof, commitment=(2 ** 300, y)),
+                dataclasses.replace(proof, low=[dataclasses.replace(bit, r0=(bit.r0[0], bit.r0[1] + P))] + proof.low[1:]),
+                dataclasses.replace(proof, low=[dataclasses.replace(bit, commitment=(-1, 5))] + proof.low[1:])):
+        assert verify_range(bad, 0, 100) is False
+    huge = dataclasses.replace(proof, upper=2 ** 300)                                   # bounds beyond 256 bits
+    assert verify_range(huge, 0, 2 ** 300) is False
+
+
+def test_forged_bit_proofs_are_rejected():
+    """x = v - lower = 2 on [0, 3] is split as bits (2, 0) instead of (0, 1):
+    the recombination holds, so only the CDS bit proofs can catch it."""
+    value, lower, upper = 2, 0, 3
+    proof = prove_range(value, 11, lower, upper)
+    r1 = secrets.randbelow(N)
+    forged = dataclasses.replace(proof, low=[_simulated_bit(2, 11 - 2 * r1), _simulated_bit(0, r1)])
+    c0, c1 = forged.low[0].commitment, forged.low[1].commitment
+    recombined = pedersen._add(pedersen._add((c0[0], c0[1], 1), pedersen._double((c1[0], c1[1], 1))),
+                               pedersen._gh(-value, -11))
+    assert recombined is None                                              # C - lower*G == C_0 + 2*C_1
+    assert not verify_range(forged, lower, upper)
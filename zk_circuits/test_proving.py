@@ -0,0 +1,52 @@
+"""Proving pipeline: artifact/proof cache keys and stand-in backend behaviour.
+
+    cd zk_circuits && python -m pytest -q test_proving.py
+"""
+import os
+
+import pytest
+
+from proving import (ProofError, ProvingPipeline, PythonBackend, artifact_key, circuit_hash)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CIRCUIT = os.path.join(HERE, "mean_variance.zok")
+
+
+def test_artifact_key_covers_scheme_and_version():
+    digest = circuit_hash(CIRCUIT)
+    keys = {artifact_key(digest, "g16", "ZoKrates 0.8.8"), artifact_key(digest, "gm17", "ZoKrates 0.8.8"),
+            artifact_key(digest, "g16", "ZoKrates 0.8.7"), artifact_key("0" * 64, "g16", "ZoKrates 0.8.8")}
+    assert len(keys) == 4
+
+
+def test_toolchain_change_does_not_reuse_cached_proofs(tmp_path):
+    class NewerBackend(PythonBackend):
+        version = "2"
+
+    old = ProvingPipeline(PythonBackend(), CIRCUIT, workers=1, cache_dir=str(tmp_path))
+    old.prove_many([[72, 0, 100, 70, 25]])
+    assert old.misses == 1
+
+    again = ProvingPipeline(PythonBackend(), CIRCUIT, workers=1, cache_dir=str(tmp_path))
+    again.prove_many([[72, 0, 100, 70, 25]])
+    assert again.hits == 1 and again.misses == 0
+
+    newer = ProvingPipeline(NewerBackend(), CIRCUIT, workers=1, cache_dir=str(tmp_path))
+    assert newer.artifacts.key != old.artifacts.key
+    newer.prove_many([[72, 0, 100, 70, 25]])
+    assert newer.hits == 0 and newer.misses == 1
+
+
+def test_python_backend_rejects_tampering(tmp_path):
+    pipeline = ProvingPipeline(PythonBackend(), CIRCUIT, workers=1, cache_dir=str(tmp_path))
+    proof, = pipeline.prove_many([[72, 0, 100, 70, 25]])
+    backend = pipeline.backend
+    assert backend.verify(pipeline.artifacts, proof)
+    forged = dict(proof, inputs=[0, 1000] + proof["inputs"][2:])
+    assert not backend.verify(pipeline.artifacts, forged)
+
+
+def test_unsatisfied_statement_fails_to_prove(tmp_path):
+    pipeline = ProvingPipeline(PythonBackend(), CIRCUIT, workers=1, cache_dir=str(tmp_path))
+    with pytest.raises(ProofError):
+        pipeline.prove_many([[150, 0, 100, 70, 25]])
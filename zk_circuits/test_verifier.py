@@ -0,0 +1,172 @@
+"""Groth16 RLC batch verification: sound against tampered proofs, points
+outside the prime-order subgroup and other coefficient orders.
+
+The key and proofs are made with known trapdoors (alpha, beta, gamma, delta),
+so they satisfy the Groth16 pairing equation without the zokrates toolchain.
+
+    cd zk_circuits && python -m pytest -q test_verifier.py
+"""
+import json
+import os
+import random
+
+import pytest
+
+bn128 = pytest.importorskip("py_ecc.optimized_bn128")
+
+from proving import CircuitArtifacts, ProverBackend, PythonBackend
+from verifier import Groth16Key, VerifierService, _g2
+
+R = bn128.curve_order
+P = bn128.field_modulus
+N_INPUTS = 3
+
+
+def _hex_g1(point):
+    x, y = bn128.normalize(point)
+    return [hex(x.n), hex(y.n)]
+
+
+def _hex_g2(point):
+    x, y = bn128.normalize(point)
+    return [[hex(c) for c in x.coeffs], [hex(c) for c in y.coeffs]]
+
+
+class TrapdoorBackend(ProverBackend):
+    """Stands in for ZoKrates: writes a g16 verification.key and simulates
+    proofs with the trapdoors."""
+    name = "zokrates"
+
+    def __init__(self, scheme="g16", seed=0):
+        rng = random.Random(seed)
+        self.scheme = scheme
+        self.alpha, self.beta, self.gamma, self.delta = (rng.randrange(1, R) for _ in range(4))
+        self.ic = [rng.randrange(1, R) for _ in range(N_INPUTS + 1)]
+        self.rng = rng
+
+    def setup(self, circuit_path, cache_dir):
+        directory = os.path.join(cache_dir, "trapdoor")
+        os.makedirs(directory, exist_ok=True)
+        vk = {"scheme": self.scheme, "curve": "bn128",
+              "alpha": _hex_g1(bn128.multiply(bn128.G1, self.alpha)),
+              "beta": _hex_g2(bn128.multiply(bn128.G2, self.beta)),
+              "gamma": _hex_g2(bn128.multiply(bn128.G2, self.gamma)),
+              "delta": _hex_g2(bn128.multiply(bn128.G2, self.delta)),
+              "gamma_abc": [_hex_g1(bn128.multiply(bn128.G1, u)) for u in self.ic]}
+        path = os.path.join(directory, "verification.key")
+        with open(path, "w") as f:
+            json.dump(vk, f)
+        return CircuitArtifacts(self.name, "trapdoor", "0", directory, verification_key=path)
+
+    def prove(self, artifacts, inputs):
+        l = (self.ic[0] + sum(x * u for x, u in zip(inputs, self.ic[1:]))) % R
+        a, b = self.rng.randrange(1, R), self.rng.randrange(1, R)
+        c = (a * b - self.alpha * self.beta - l * self.gamma) * pow(self.delta, -1, R) % R
+        return {"scheme": "g16", "curve": "bn128", "inputs": [hex(x) for x in inputs],
+                "proof": {"a": _hex_g1(bn128.multiply(bn128.G1, a)), "b": _hex_g2(bn128.multiply(bn128.G2, b)),
+                          "c": _hex_g1(bn128.multiply(bn128.G1, c))}}
+
+    def verify(self, artifacts, proof):
+        return Groth16Key.load(artifacts.verification_key).verify_batch([proof])
+
+
+def _fq2_sqrt(a):
+    """Square root in Fq2 for p = 3 mod 4, or None."""
+    a1 = a ** ((P - 3) // 4)
+    alpha = a1 * a1 * a
+    if alpha ** P * alpha == -bn128.FQ2.one():
+        return None
+    x0 = a1 * a
+    if alpha == -bn128.FQ2.one():
+        return bn128.FQ2([0, 1]) * x0
+    return (bn128.FQ2.one() + alpha) ** ((P - 1) // 2) * x0
+
+
+def _twist_point_outside_subgroup():
+    """On the twist curve but not in G2 (the cofactor is about 2**254)."""
+    for i in range(1, 100):
+        x = bn128.FQ2([i, 1])
+        y = _fq2_sqrt(x ** 3 + bn128.b2)
+        if y is not None and y * y == x ** 3 + bn128.b2:
+            point = (x, y, bn128.FQ2.one())
+            assert bn128.is_on_curve(point, bn128.b2)
+            assert not bn128.is_inf(bn128.multiply(point, R))
+            return point
+    raise AssertionError("no twist point found")
+
+
+@pytest.fixture
+def backend():
+    return TrapdoorBackend()
+
+
+@pytest.fixture
+def service(backend, tmp_path):
+    service = VerifierService(backend, {"trapdoor": "trapdoor.zok"}, cache_dir=str(tmp_path))
+    yield service
+    service.close()
+
+
+def _proofs(backend, n):
+    return [backend.prove(None, [i, 2 * i + 1, 7]) for i in range(n)]
+
+
+def test_auto_mode_batches_g16_keys(service, backend, tmp_path):
+    assert service.mode == "rlc"
+    other = VerifierService(TrapdoorBackend(scheme="gm17"), {"trapdoor": "trapdoor.zok"}, cache_dir=str(tmp_path))
+    assert other.mode == "parallel"
+    other.close()
+    python = VerifierService(PythonBackend(), {}, cache_dir=str(tmp_path))
+    assert python.mode == "parallel"
+    python.close()
+
+
+def test_valid_batch_is_accepted(service, backend):
+    assert service.verify_batch(_proofs(backend, 4), "trapdoor") == [True] * 4
+
+
+def test_bisection_finds_the_bad_proofs(service, backend):
+    proofs = _proofs(backend, 5)
+    proofs[1] = dict(proofs[1], inputs=proofs[1]["inputs"][:-1] + [hex(8)])   # another public input
+    swapped = dict(proofs[3]["proof"], a=proofs[3]["proof"]["c"], c=proofs[3]["proof"]["a"])
+    proofs[3] = dict(proofs[3], proof=swapped)
+    assert service.verify_batch(proofs, "trapdoor") == [True, False, True, False, True]
+
+
+def test_malformed_points_are_rejected(service, backend):
+    proofs = _proofs(backend, 3)
+    off_curve = dict(proofs[0]["proof"], a=[proofs[0]["proof"]["a"][0], hex(1)])
+    x, y = proofs[1]["proof"]["a"]
+    aliased = dict(proofs[1]["proof"], a=[hex(int(x, 16) + P), y])                   # same point, x + p
+    huge = dict(proofs[2]["proof"], c=[hex(2 ** 300), hex(1)])
+    bad = [dict(proofs[0], proof=off_curve), dict(proofs[1], proof=aliased), dict(proofs[2], proof=huge)]
+    assert service.verify_batch(bad, "trapdoor") == [False, False, False]
+
+
+def test_non_canonical_public_input_is_rejected(service, backend):
+    proofs = _proofs(backend, 3)
+    x = int(proofs[1]["inputs"][0], 16)
+    proofs[1] = dict(proofs[1], inputs=[hex(x + R)] + proofs[1]["inputs"][1:])   # same scalar
+    proofs[2] = dict(proofs[2], inputs=[-1] + proofs[2]["inputs"][1:])
+    with pytest.raises(ValueError, match="canonical"):
+        service.keys["trapdoor"]._input_point(proofs[1]["inputs"])
+    assert service.verify_batch(proofs, "trapdoor") == [True, False, False]
+
+
+def test_g2_outside_the_subgroup_is_rejected(service, backend):
+    point = _twist_point_outside_subgroup()
+    proof = _proofs(backend, 1)[0]
+    proof = dict(proof, proof=dict(proof["proof"], b=_hex_g2(point)))
+    with pytest.raises(ValueError, match="subgroup"):
+        _g2(_hex_g2(point))
+    assert service.verify_batch([proof], "trapdoor") == [False]
+
+
+def test_g2_accepts_one_coefficient_order(backend, service):
+    proof = _proofs(backend, 1)[0]
+    (x0, x1), (y0, y1) = proof["proof"]["b"]
+    assert _g2([[x0, x1], [y0, y1]])
+    with pytest.raises(ValueError):
+        _g2([[x1, x0], [y1, y0]])
+    swapped = dict(proof, proof=dict(proof["proof"], b=[[x1, x0], [y1, y0]]))
+    assert service.verify_batch([swapped], "trapdoor") == [False]
@@ -0,0 +1,204 @@
+"""
+Batch proof verification with verification keys loaded once.
+
+VerifierService sets every circuit up once (for ZoKrates: the cached
+verification.key), and checks proofs in batches:
+
+  mode="parallel"  backend.verify on a thread pool (one `zokrates verify`
+                   process per proof; HMAC checks for PythonBackend)
+  mode="rlc"       Groth16 random-linear-combination batching in-process with
+                   py_ecc: one multi-pairing of n + 2 Miller loops and a single
+                   final exponentiation for the whole batch, instead of four
+                   pairings per proof; a failing batch is bisected to find the
+                   bad proofs. Needs `pip install py_ecc`, not the toolchain.
+  mode="auto"      rlc for ZoKrates g16 keys whenever py_ecc is importable;
+                   parallel otherwise (other schemes, PythonBackend)
+
+    service = VerifierService(make_backend(), {"cohort_stats": COHORT_CIRCUIT})
+    ok = service.verify_batch(proofs, "cohort_stats")
+"""
+
+import json
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from proving import DEFAULT_CACHE_DIR
+
+try:
+    from py_ecc import optimized_bn128 as bn128
+    from py_ecc.optimized_bn128.optimized_pairing import cast_point_to_fq12, miller_loop, twist
+except ImportError:  # rlc mode unavailable
+    bn128 = None
+
+
+# ---------------- Groth16 over BN254 (py_ecc) ----------------
+
+def _fq(v):
+    n = int(v, 16) if isinstance(v, str) else int(v)
+    if not 0 <= n < bn128.field_modulus:  # no aliases of the same point
+        raise ValueError("coordinate is not a canonical field element")
+    return bn128.FQ(n)
+
+
+def _g1(p):
+    point = (_fq(p[0]), _fq(p[1]), bn128.FQ.one())
+    if not bn128.is_on_curve(point, bn128.b):
+        raise ValueError("G1 point is not on the curve")
+    return point
+
+
+def _g2(p):
+    """G2 point from ZoKrates' [[x.c0, x.c1], [y.c0, y.c1]] (real coefficient
+    first). The twist has a large cofactor, so on-curve is not enough: the
+    point must also be in the prime-order subgroup."""
+    (x0, x1), (y0, y1) = p
+    point = (bn128.FQ2([_fq(x0).n, _fq(x1).n]), bn128.FQ2([_fq(y0).n, _fq(y1).n]), bn128.FQ2.one())
+    if not bn128.is_on_curve(point, bn128.b2):
+        raise ValueError("G2 point is not on the twist curve")
+    if not bn128.is_inf(bn128.multiply(point, bn128.curve_order)):
+        raise ValueError("G2 point is not in the prime-order subgroup")
+    return point
+
+
+def _ml(q, p):
+    return miller_loop(twist(q), cast_point_to_fq12(p), final_exponentiate=False)
+
+
+class Groth16Key:
+    """A parsed ZoKrates g16 verification key, with e(alpha, beta) precomputed."""
+
+    def __init__(self, vk):
+        if vk.get("scheme", "g16") != "g16":
+            raise ValueError(f"rlc batching needs a g16 key, got {vk.get('scheme')}")
+        self.alpha = _g1(vk["alpha"])
+        self.beta = _g2(vk["beta"])
+        self.gamma = _g2(vk["gamma"])
+        self.delta = _g2(vk["delta"])
+        self.ic = [_g1(p) for p in vk["gamma_abc"]]
+        self.alpha_beta = bn128.final_exponentiate(_ml(self.beta, self.alpha))
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def _input_point(self, inputs):
+        if len(inputs) != len(self.ic) - 1:
+            raise ValueError("wrong number of public inputs")
+        acc = self.ic[0]
+        for x, point in zip(inputs, self.ic[1:]):
+            x = int(x, 16) if isinstance(x, str) else int(x)
+            if not 0 <= x < bn128.curve_order:
+                raise ValueError("public input is not a canonical scalar")  # x + r would alias x
+            acc = bn128.add(acc, bn128.multiply(point, x))
+        return acc
+
+    def verify_batch(self, proofs):
+        """True iff every proof is valid (up to 2**-128 soundness error):
+
+            prod e(r_i A_i, B_i) * e(-sum r_i L_i, gamma) * e(-sum r_i C_i, delta)
+                == e(alpha, beta) ** sum r_i
+        """
+        f = bn128.FQ12.one()
+        l_sum, c_sum, r_sum = bn128.Z1, bn128.Z1, 0
+        for proof in proofs:
+            p = proof["proof"]
+            r = secrets.randbits(128) | 1
+            f = f * _ml(_g2(p["b"]), bn128.multiply(_g1(p["a"]), r))
+            l_sum = bn128.add(l_sum, bn128.multiply(self._input_point(proof["inputs"]), r))
+            c_sum = bn128.add(c_sum, bn128.multiply(_g1(p["c"]), r))
+            r_sum += r
+        f = f * _ml(self.gamma, bn128.neg(l_sum)) * _ml(self.delta, bn128.neg(c_sum))
+        return bn128.final_exponentiate(f) == self.alpha_beta ** r_sum
+
+
+# ---------------- service ----------------
+
+class VerifierService:
+    """Verifies proofs of a fixed set of circuits."""
+
+    def __init__(self, backend, circuits, workers=None, mode="auto", cache_dir=DEFAULT_CACHE_DIR):
+        self.backend = backend
+        self.artifacts = {name: backend.setup(path, cache_dir) for name, path in circuits.items()}
+        self.keys = {}
+        if mode == "auto":
+            mode = "parallel"
+            if backend.name == "zokrates" and bn128 is not None:
+                try:
+                    self.keys = {name: Groth16Key.load(a.verification_key) for name, a in self.artifacts.items()}
+                    mode = "rlc"
+                except ValueError:  # not a g16 key (or not one py_ecc can use): one `zokrates verify` per proof
+                    self.keys = {}
+        elif mode == "rlc":
+            if bn128 is None:
+                raise ImportError("rlc batch verification needs `pip install py_ecc`")
+            self.keys = {name: Groth16Key.load(a.verification_key) for name, a in self.artifacts.items()}
+        self.mode = mode
+        self._pool = ThreadPoolExecutor(workers or os.cpu_count() or 1)
+
+    def verify(self, proof, circuit):
+        return self.verify_batch([proof], circuit)[0]
+
+    def verify_batch(self, proofs, circuit):
+        """One bool per proof."""
+        if not proofs:
+            return []
+        if self.mode == "rlc":
+            return self._verify_rlc(self.keys[circuit], list(proofs))
+        artifacts = self.artifacts[circuit]
+        return list(self._pool.map(lambda p: self.backend.verify(artifacts, p), proofs))
+
+    def _verify_rlc(self, key, proofs):
+        try:
+            if key.verify_batch(proofs):
+                return [True] * len(proofs)
+        except (KeyError, ValueError, TypeError):  # malformed proof somewhere in the batch
+            if len(proofs) == 1:
+                return [False]
+        if len(proofs) == 1:
+            return [False]
+        mid = len(proofs) // 2
+        return self._verify_rlc(key, proofs[:mid]) + self._verify_rlc(key, proofs[mid:])
+
+    def close(self):
+        self._pool.shutdown()
+
+
+def benchmark(backend, circuit_path, proofs, modes=("sequential", "parallel", "rlc"), workers=None):
+    """Proofs per second for each available verification mode."""
+    name = os.path.splitext(os.path.basename(circuit_path))[0]
+    report = {}
+    for mode in modes:
+        if mode == "rlc" and (bn128 is None or backend.name != "zokrates"):
+            continue
+        service = VerifierService(backend, {name: circuit_path}, workers=1 if mode == "sequential" else workers,
+                                  mode="parallel" if mode == "sequential" else mode)
+        start = time.perf_counter()
+        ok = service.verify_batch(proofs, name)
+        elapsed = time.perf_counter() - start
+        service.close()
+        report[mode] = {"proofs_per_s": len(proofs) / elapsed, "valid": sum(ok), "seconds": elapsed}
+    print(f"{len(proofs)} proofs of {name} ({backend.name})")
+    for mode, r in report.items():
+        print(f"  {mode:>10}: {r['proofs_per_s']:10.1f} proofs/s  ({r['valid']} valid, {r['seconds']:.3f}s)")
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+    import proving
+    from cohort_proofs import COHORT_CIRCUIT, Claim, chunk_arguments, chunk_size
+
+    parser = argparse.ArgumentParser(description="verification throughput on cohort_stats chunk proofs")
+    parser.add_argument("--backend", default=None, help="zokrates | python (default: ZK_PROVER_BACKEND)")
+    parser.add_argument("--proofs", type=int, default=64)
+    args = parser.parse_args()
+
+    backend = proving.make_backend(args.backend)
+    pipeline = proving.ProvingPipeline(backend, COHORT_CIRCUIT)
+    values = [(7 * i) % 80 + 20 for i in range(args.proofs * chunk_size())]
+    proofs = pipeline.prove_many(chunk_arguments(pipeline, values, 0, 120, 45, 60, Claim(min_mean=40)))
+    pipeline.close()
+    benchmark(backend, COHORT_CIRCUIT, proofs)